@@ -5,48 +5,122 @@ Implements the A2A protocol endpoints:
 GET  /a2a/directory          — Discover all registered agents
 GET  /a2a/{agent_id}/agent.json — Get an agent's A2A card
 POST /a2a/{agent_id}/tasks   — Send a task to an agent
+POST /a2a/skills/{skill}/tasks — Send a task to any healthy agent with a skill
 GET  /a2a/{agent_id}/tasks   — List tasks for an agent
 GET  /a2a/tasks/{task_id}    — Get task status
+GET  /a2a/tasks/{task_id}/subscribe — Stream a task's updates over SSE
+GET  /a2a/{agent_id}/tasks/subscribe — Stream updates for all of an agent's tasks over SSE
+POST /a2a/tasks/{task_id}/cancel — Cancel a queued or running task
+POST /a2a/tasks/{task_id}/webhooks — Register a push-notification webhook for a task
+POST /a2a/{agent_id}/webhooks — Register a push-notification webhook for an agent's tasks
+DELETE /a2a/webhooks/{webhook_id} — Remove a webhook
+GET  /a2a/webhooks/dead-letters — Webhook batches that could not be delivered
+GET  /a2a/metrics            — Per-agent queue and worker metrics
 """
-from fastapi import APIRouter, HTTPException
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Response
+from sse_starlette.sse import EventSourceResponse
+from typing import AsyncIterator, Optional
 
-from app.services.a2a.protocol import a2a_directory, A2ATask
+from app.core.config import settings
+
+from app.services.a2a.balancer import skill_router, NoAgentAvailableError
+from app.services.a2a.engine import a2a_engine, QueueFullError
+from app.services.a2a.events import Subscription
+from app.services.a2a.protocol import a2a_directory, A2ATask, CachedPayload
+from app.services.a2a.push import push_service, PushNotificationConfig
+from app.services.a2a.store import TERMINAL_STATUSES
 
 router = APIRouter(prefix="/a2a", tags=["a2a"])
 
 
 @router.get("/directory")
-async def list_agents(skill: Optional[str] = None):
+async def list_agents(request: Request, skill: Optional[str] = None):
     """
     Discover agents in the A2A directory.
-    Optionally filter by skill name.
+    Optionally filter by skill name. Supports If-None-Match / 304.
     """
-    agents = await a2a_directory.discover_agents(skill_name=skill)
-    return {"agents": [a.model_dump() for a in agents]}
+    payload = await a2a_directory.get_directory_payload(skill_name=skill)
+    return _cached_json(request, payload)
 
 
 @router.get("/{agent_id}/agent.json")
-async def get_agent_card(agent_id: str):
+async def get_agent_card(request: Request, agent_id: str):
     """
     Get an agent's A2A card — the public identity and capabilities.
-    This is the /.well-known/agent.json equivalent.
+    This is the /.well-known/agent.json equivalent. Supports If-None-Match / 304.
     """
+    payload = await a2a_directory.get_card_payload(agent_id)
+    if not payload:
+        raise HTTPException(status_code=404, detail="Agent not found in A2A directory")
+    return _cached_json(request, payload)
+
+
+@router.get("/metrics")
+async def engine_metrics():
+    """Queue depth, throughput and latency per target agent, plus routing health and webhook stats."""
+    return {
+        "agents": a2a_engine.metrics(),
+        "health": skill_router.health(),
+        "push": push_service.metrics(),
+    }
+
+
+@router.get("/webhooks/dead-letters")
+async def list_dead_letters():
+    """Webhook batches that exhausted their retries."""
+    return {"dead_letters": list(push_service.dead_letters)}
+
+
+@router.delete("/webhooks/{webhook_id}")
+async def delete_webhook(webhook_id: str):
+    """Remove a push-notification webhook."""
+    if not push_service.unregister(webhook_id):
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    return {"deleted": webhook_id}
+
+
+@router.post("/{agent_id}/webhooks")
+async def register_agent_webhook(agent_id: str, config: PushNotificationConfig):
+    """Deliver status updates for every task sent to or from an agent to a webhook."""
     card = await a2a_directory.get_agent_card(agent_id)
     if not card:
         raise HTTPException(status_code=404, detail="Agent not found in A2A directory")
-    return card.model_dump()
+    return push_service.register(config, agent_id=agent_id).model_dump()
 
 
 @router.post("/{agent_id}/tasks")
 async def send_task(agent_id: str, task: A2ATask):
-    """Send a task to an agent via A2A protocol."""
+    """
+    Send a task to an agent via A2A protocol.
+    Returns 429 when the agent's queue is full.
+    """
     card = await a2a_directory.get_agent_card(agent_id)
     if not card:
         raise HTTPException(status_code=404, detail="Target agent not found")
 
     task.to_agent = agent_id
-    result = await a2a_directory.send_task(task)
+    try:
+        result = await a2a_engine.submit(task)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    return result.model_dump()
+
+
+@router.post("/skills/{skill}/tasks")
+async def send_task_by_skill(skill: str, task: A2ATask):
+    """
+    Send a task to whichever healthy agent with the skill is least loaded.
+    Returns 404 if no agent has the skill, 429 if all their queues are full,
+    and 503 if all of them are temporarily excluded after failures.
+    """
+    task.skill_id = skill
+    try:
+        result = await skill_router.submit(skill, task)
+    except NoAgentAvailableError as e:
+        if e.reason == "unknown_skill":
+            raise HTTPException(status_code=404, detail=str(e))
+        status = 429 if e.reason == "queues_full" else 503
+        raise HTTPException(status_code=status, detail=str(e), headers={"Retry-After": "1"})
     return result.model_dump()
 
 
@@ -57,6 +131,27 @@ async def list_agent_tasks(agent_id: str):
     return {"tasks": [t.model_dump() for t in tasks]}
 
 
+@router.get("/{agent_id}/tasks/subscribe")
+async def subscribe_agent_tasks(agent_id: str):
+    """Stream status transitions and partial output for every task sent to or from an agent."""
+    sub = a2a_directory.events.subscribe(agent_id=agent_id)
+    return EventSourceResponse(_stream(sub))
+
+
+@router.get("/tasks/{task_id}/subscribe")
+async def subscribe_task(task_id: str):
+    """
+    Stream a task's status transitions and partial output until it finishes.
+    The first event is a snapshot of the task's current state.
+    """
+    sub = a2a_directory.events.subscribe(task_id=task_id)
+    task = await a2a_directory.get_task(task_id)
+    if not task:
+        a2a_directory.events.unsubscribe(sub)
+        raise HTTPException(status_code=404, detail="Task not found")
+    return EventSourceResponse(_stream(sub, snapshot=task))
+
+
 @router.get("/tasks/{task_id}")
 async def get_task(task_id: str):
     """Get status of a specific A2A task."""
@@ -64,3 +159,57 @@ async def get_task(task_id: str):
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task.model_dump()
+
+
+@router.post("/tasks/{task_id}/cancel")
+async def cancel_task(task_id: str):
+    """Cancel a queued or running A2A task."""
+    task = await a2a_directory.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task.status in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Task already {task.status}")
+    task = await a2a_engine.cancel(task_id)
+    return task.model_dump()
+
+
+@router.post("/tasks/{task_id}/webhooks")
+async def register_task_webhook(task_id: str, config: PushNotificationConfig):
+    """Deliver a task's status updates to a webhook until the task finishes."""
+    task = await a2a_directory.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task.status in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Task already {task.status}")
+    return push_service.register(config, task_id=task_id).model_dump()
+
+
+def _cached_json(request: Request, payload: CachedPayload) -> Response:
+    """Serve pre-serialized JSON with a strong ETag, or 304 if the client's copy is current."""
+    headers = {
+        "ETag": payload.etag,
+        "Cache-Control": f"public, max-age={settings.a2a_discovery_max_age_seconds}, must-revalidate",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def _stream(sub: Subscription, snapshot: Optional[A2ATask] = None) -> AsyncIterator[dict]:
+    try:
+        if snapshot:
+            yield {"event": "snapshot", "data": snapshot.model_dump_json()}
+            if snapshot.status in TERMINAL_STATUSES:
+                return
+        async for event in sub.events():
+            yield event.as_sse()
+    finally:
+        a2a_directory.events.unsubscribe(sub)
@@ -1,6 +1,8 @@
-"""Health check endpoint."""
+"""Health check endpoints."""
 from fastapi import APIRouter
 from app.core.config import settings
+from app.services.guardrails.safety import safety_service
+from app.services.memory.cosmos import cosmos_memory
 
 router = APIRouter(tags=["health"])
 
@@ -17,3 +19,15 @@ async def health():
             "content_safety": bool(settings.azure_content_safety_endpoint),
         },
     }
+
+
+@router.get("/health/memory")
+async def memory_health():
+    """Cosmos memory write buffer, compaction, RU and container size metrics."""
+    return cosmos_memory.metrics()
+
+
+@router.get("/health/guardrails")
+async def guardrails_health():
+    """Guardrail verdict cache size and hit rate."""
+    return safety_service.metrics()
@@ -1,6 +1,6 @@
 """Application configuration from environment variables."""
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import Field, model_validator
 from typing import Optional
 
 
@@ -30,12 +30,61 @@ class Settings(BaseSettings):
     cosmos_db_key: Optional[str] = None
     cosmos_db_database: str = "agents-platform"
     cosmos_db_container: str = "agent-memory"
+    cosmos_write_batch_size: int = 100
+    cosmos_write_flush_ms: int = 50
+    cosmos_write_max_pending: int = 10_000
+    memory_redis_url: str = "redis://localhost:6379/0"
+    memory_cache_max_bytes: int = 64 * 1024 * 1024
+    memory_cache_ttl_seconds: float = 300
+    memory_compaction_interval_seconds: float = 60
+    memory_vector_dir: str = "data/vectors"
+    memory_vector_ivf_threshold: int = 50_000
+    memory_vector_nprobe: int = 16
+    memory_embedding_batch_size: int = 256
+    memory_summary_max_tokens: int = 512
 
     # Content Safety
     azure_content_safety_endpoint: Optional[str] = None
     azure_content_safety_key: Optional[str] = None
+    content_safety_max_chars: int = 10_000
+    content_safety_chunk_overlap: int = 200
+    content_safety_max_concurrency: int = 8
+    content_safety_block_severity: int = 4
+    guardrail_cache_max_entries: int = 10_000
+    guardrail_cache_ttl_seconds: float = 600
+
+    # Offline batch evaluation
+    eval_batch_size: int = 64
+    eval_max_concurrency: int = 16
+    eval_requests_per_second: float = 20.0
+    eval_judge_max_attempts: int = 4
+
+    # Shared state (memory:// | sqlite:///path/state.db | redis://host:6379/0)
+    state_backend_url: str = "memory://"
+
+    # A2A
+    a2a_task_retention_seconds: int = 3600
+    a2a_max_finished_tasks: int = 10_000
+    a2a_task_spill_path: Optional[str] = None
+    a2a_agent_concurrency: int = 4
+    a2a_max_queue_depth: int = 1000
+    a2a_task_timeout_seconds: Optional[float] = 300
+    a2a_subscriber_buffer: int = 64
+    a2a_push_batch_size: int = 100
+    a2a_push_max_attempts: int = 5
+    a2a_discovery_max_age_seconds: int = 5
+    a2a_routing_strategy: str = "least_outstanding"  # least_outstanding | ewma_latency
+    a2a_unhealthy_after_failures: int = 3
+    a2a_unhealthy_cooldown_seconds: float = 30.0
 
     model_config = {"env_file": ".env", "extra": "ignore"}
 
+    @model_validator(mode="after")
+    def _check_content_safety_chunks(self):
+        # Each chunk must advance past the previous one, or chunking never ends
+        if not 0 <= self.content_safety_chunk_overlap < self.content_safety_max_chars:
+            raise ValueError("CONTENT_SAFETY_CHUNK_OVERLAP must be at least 0 and less than CONTENT_SAFETY_MAX_CHARS")
+        return self
+
 
 settings = Settings()
@@ -19,19 +19,34 @@ from app.core.logging import logger
 from app.api.routes import agents, a2a, mcp, health
 from app.services.mcp.server import mcp_manager
 from app.services.deployment.foundry import foundry_deployer
+from app.services.evaluation.evaluator import eval_service
+from app.services.guardrails.safety import safety_service
 from app.services.memory.cosmos import cosmos_memory
+from app.services.memory.router import memory_router
+from app.services.a2a.protocol import a2a_directory
+from app.services.a2a.engine import a2a_engine
+from app.services.a2a.push import push_service
+from app.services.state.backend import state_backend
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifecycle — startup and shutdown."""
     logger.info("starting", env=settings.app_env)
+    await state_backend.start()
+    await cosmos_memory.warm()
     yield
     # Graceful shutdown
     logger.info("shutting_down")
+    await a2a_engine.shutdown()
+    await push_service.shutdown()
     await mcp_manager.shutdown()
     await foundry_deployer.shutdown()
-    await cosmos_memory.close()
+    await safety_service.close()
+    await eval_service.close()
+    await memory_router.close()
+    await a2a_directory.close()
+    await state_backend.close()
     logger.info("shutdown_complete")
 
 
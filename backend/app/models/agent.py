@@ -20,6 +20,7 @@ class MemoryType(str, Enum):
     CONVERSATION = "conversation"
     SEMANTIC = "semantic"
     EPISODIC = "episodic"
+    SUMMARY = "summary"
 
 
 class EvalMetric(str, Enum):
@@ -107,6 +108,10 @@ class MemoryConfig(BaseModel):
     max_entries: int = Field(default=1000)
     semantic_search: bool = Field(default=False, description="Enable semantic search over memory")
     embedding_model: str = Field(default="text-embedding-3-large")
+    summary_token_budget: Optional[int] = Field(
+        default=None,
+        description="Roll older conversation turns into a summary once a session exceeds this many tokens, None = never",
+    )
 
 
 class EvalConfig(BaseModel):
@@ -117,6 +122,10 @@ class EvalConfig(BaseModel):
     custom_evaluators: list[CustomEvaluator] = Field(default_factory=list)
     eval_frequency: str = Field(default="per_session", description="per_turn | per_session | on_demand")
     threshold: float = Field(default=0.7, description="Minimum passing score")
+    local_metrics: bool = Field(
+        default=True, description="Compute similarity locally instead of with an LLM judge (f1_score is always local)",
+    )
+    embedding_model: str = Field(default="text-embedding-3-large", description="Embeddings for local similarity")
 
 
 class CustomEvaluator(BaseModel):
@@ -0,0 +1,152 @@
+"""
+Skill-addressed A2A task routing.
+
+Callers send a task to "any agent with skill X"; the router picks a target
+among the agents exposing that skill using live engine state:
+- least_outstanding: fewest queued + running tasks per worker slot
+- ewma_latency: lowest expected completion time, (outstanding + 1) x EWMA run time;
+  agents that have not finished a task yet are assumed to take the mean
+  EWMA of their peers, so a cold agent is not handed every task
+
+Agents that fail several tasks in a row are excluded for a cooldown period,
+then allowed back in; a further failure excludes them again.
+"""
+import random
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.services.a2a.engine import A2ATaskEngine, QueueFullError, a2a_engine
+from app.services.a2a.protocol import A2ADirectory, A2ATask, a2a_directory
+
+STRATEGIES = ("least_outstanding", "ewma_latency")
+
+
+class NoAgentAvailableError(Exception):
+    """Raised when no healthy agent with the requested skill can take the task."""
+
+    REASONS = {
+        "unknown_skill": "no registered agent has this skill",
+        "queues_full": "all queues are full",
+        "unhealthy": "all agents are unhealthy",
+    }
+
+    def __init__(self, skill: str, reason: str):
+        super().__init__(f"No agent available for skill '{skill}': {self.REASONS[reason]}")
+        self.skill = skill
+        self.reason = reason
+
+
+class _Health:
+    __slots__ = ("consecutive_failures", "excluded_until")
+
+    def __init__(self):
+        self.consecutive_failures = 0
+        self.excluded_until = 0.0
+
+
+class SkillRouter:
+    """Picks a target agent for a skill and submits the task to it."""
+
+    def __init__(
+        self,
+        directory: A2ADirectory,
+        engine: A2ATaskEngine,
+        strategy: str = "least_outstanding",
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {STRATEGIES}")
+        self._directory = directory
+        self._engine = engine
+        self._strategy = strategy
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown_seconds
+        self._health: dict[str, _Health] = {}
+        engine.add_finish_listener(self._record_outcome)
+
+    def candidates(self, skill: str) -> list[str]:
+        """Healthy agents exposing `skill`."""
+        now = time.monotonic()
+        return [
+            agent_id for agent_id in self._directory.agents_with_skill(skill)
+            if (h := self._health.get(agent_id)) is None or h.excluded_until <= now
+        ]
+
+    def pick(self, skill: str, exclude: frozenset[str] = frozenset()) -> Optional[str]:
+        """Best candidate for `skill` under the configured strategy, or None."""
+        stats = {
+            agent_id: self._engine.queue_stats(agent_id)
+            for agent_id in self.candidates(skill) if agent_id not in exclude
+        }
+        known = [s["run_ms_ewma"] for s in stats.values() if s is not None and s["run_ms_ewma"]]
+        # Run time assumed for agents without one; with none known, ranks by outstanding tasks
+        prior = sum(known) / len(known) if known else 1.0
+        scored = [(self._score(s, prior), random.random(), agent_id) for agent_id, s in stats.items()]
+        return min(scored)[2] if scored else None
+
+    async def submit(self, skill: str, task: A2ATask) -> A2ATask:
+        """
+        Send a task to the best agent with `skill`, falling back to the next
+        candidate when a queue is full. Raises `NoAgentAvailableError`.
+        """
+        if not self._directory.agents_with_skill(skill):
+            raise NoAgentAvailableError(skill, "unknown_skill")
+
+        tried: set[str] = set()
+        while (agent_id := self.pick(skill, frozenset(tried))) is not None:
+            task.to_agent = agent_id
+            try:
+                result = await self._engine.submit(task)
+            except QueueFullError:
+                tried.add(agent_id)
+                continue
+            logger.info("a2a_task_routed", skill=skill, agent_id=agent_id, strategy=self._strategy)
+            return result
+
+        raise NoAgentAvailableError(skill, "queues_full" if tried else "unhealthy")
+
+    def health(self) -> dict:
+        now = time.monotonic()
+        return {
+            agent_id: {
+                "consecutive_failures": h.consecutive_failures,
+                "excluded_for_seconds": round(max(0.0, h.excluded_until - now), 1),
+            }
+            for agent_id, h in self._health.items()
+        }
+
+    def _score(self, stats: Optional[dict], prior: float) -> float:
+        if stats is None:
+            # Idle agent that has never had a task
+            return prior if self._strategy == "ewma_latency" else 0.0
+        outstanding = stats["queued"] + stats["running"]
+        if self._strategy == "ewma_latency":
+            return (outstanding + 1) * (stats["run_ms_ewma"] or prior)
+        return outstanding / max(stats["concurrency"], 1)
+
+    def _record_outcome(self, agent_id: str, status: str, run_ms: float):
+        if status == "cancelled":
+            return
+        health = self._health.setdefault(agent_id, _Health())
+        if status == "completed":
+            health.consecutive_failures = 0
+            return
+        health.consecutive_failures += 1
+        if health.consecutive_failures >= self._failure_threshold:
+            health.excluded_until = time.monotonic() + self._cooldown
+            # One more failure after the cooldown excludes the agent again
+            health.consecutive_failures = self._failure_threshold - 1
+            logger.warning("a2a_agent_excluded", agent_id=agent_id, cooldown=self._cooldown)
+
+
+# Singleton
+skill_router = SkillRouter(
+    a2a_directory,
+    a2a_engine,
+    strategy=settings.a2a_routing_strategy,
+    failure_threshold=settings.a2a_unhealthy_after_failures,
+    cooldown_seconds=settings.a2a_unhealthy_cooldown_seconds,
+)
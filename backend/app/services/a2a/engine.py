@@ -0,0 +1,318 @@
+"""
+A2A task execution engine.
+
+Moves tasks through pending -> in_progress -> completed | failed | cancelled
+by running the handler registered for the target agent. Every agent gets its
+own priority queue and worker pool:
+- Concurrency: number of workers per agent
+- Priorities: `metadata["priority"]` as high | normal | low or an int (lower runs first)
+- Backpressure: submissions beyond the max queue depth raise `QueueFullError`
+- Cancellation: queued tasks are skipped, running handlers are cancelled
+
+Handlers either return the output text or are async generators yielding
+output chunks, which are published as partial output while the task runs.
+"""
+import asyncio
+import itertools
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.services.a2a.protocol import A2ADirectory, A2ATask, a2a_directory
+
+TaskHandler = Callable[[A2ATask], Union[Awaitable[str], AsyncIterator[str]]]
+# Called with (agent_id, final status, handler run time in ms) after each task
+FinishListener = Callable[[str, str, float], None]
+
+PRIORITY_LEVELS = {"high": 0, "normal": 5, "low": 9}
+DEFAULT_PRIORITY = PRIORITY_LEVELS["normal"]
+
+# Weight of the newest sample in the latency moving averages
+EWMA_ALPHA = 0.2
+
+
+class QueueFullError(Exception):
+    """Raised when an agent's queue is at its maximum depth."""
+
+    def __init__(self, agent_id: str, depth: int):
+        super().__init__(f"A2A queue for agent '{agent_id}' is full ({depth} tasks)")
+        self.agent_id = agent_id
+        self.depth = depth
+
+
+def task_priority(task: A2ATask) -> int:
+    """Priority level from task metadata; unknown values run at normal priority."""
+    value = task.metadata.get("priority") if task.metadata else None
+    if isinstance(value, str):
+        return PRIORITY_LEVELS.get(value.lower(), DEFAULT_PRIORITY)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return DEFAULT_PRIORITY
+
+
+class _AgentQueue:
+    """Queue, workers and counters for a single target agent."""
+
+    def __init__(self, agent_id: str, concurrency: int, max_depth: int):
+        self.agent_id = agent_id
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.workers: set[asyncio.Task] = set()
+        # Workers still to exit after a lowered concurrency
+        self.retire = 0
+        self.running: dict[str, asyncio.Task] = {}
+        self.queued: set[str] = set()
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled_count = 0
+        self.rejected = 0
+        self.wait_ms_ewma = 0.0
+        self.run_ms_ewma = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self.queued)
+
+    @property
+    def outstanding(self) -> int:
+        return len(self.queued) + len(self.running)
+
+    def record_wait(self, ms: float):
+        self.wait_ms_ewma = ms if not self.wait_ms_ewma else (
+            EWMA_ALPHA * ms + (1 - EWMA_ALPHA) * self.wait_ms_ewma
+        )
+
+    def record_run(self, ms: float):
+        self.run_ms_ewma = ms if not self.run_ms_ewma else (
+            EWMA_ALPHA * ms + (1 - EWMA_ALPHA) * self.run_ms_ewma
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "queued": self.depth,
+            "running": len(self.running),
+            "workers": len(self.workers),
+            "concurrency": self.concurrency,
+            "max_queue_depth": self.max_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled_count,
+            "rejected": self.rejected,
+            "wait_ms_ewma": round(self.wait_ms_ewma, 2),
+            "run_ms_ewma": round(self.run_ms_ewma, 2),
+        }
+
+
+class A2ATaskEngine:
+    """Per-agent queued execution of A2A tasks."""
+
+    def __init__(
+        self,
+        directory: A2ADirectory,
+        concurrency: int = 4,
+        max_queue_depth: int = 1000,
+        task_timeout: Optional[float] = None,
+    ):
+        self._directory = directory
+        self._concurrency = concurrency
+        self._max_queue_depth = max_queue_depth
+        self._task_timeout = task_timeout
+        self._handlers: dict[str, TaskHandler] = {}
+        self._resolver: Optional[Callable[[str], Optional[TaskHandler]]] = None
+        self._listeners: list[FinishListener] = []
+        self._queues: dict[str, _AgentQueue] = {}
+        self._task_agents: dict[str, str] = {}
+        self._seq = itertools.count()
+
+    def register_handler(self, agent_id: str, handler: TaskHandler):
+        """Register the coroutine that executes tasks sent to `agent_id`."""
+        self._handlers[agent_id] = handler
+
+    def unregister_handler(self, agent_id: str):
+        self._handlers.pop(agent_id, None)
+
+    def set_handler_resolver(self, resolver: Callable[[str], Optional[TaskHandler]]):
+        """Fallback lookup for agents without a registered handler, e.g. deployed by another worker."""
+        self._resolver = resolver
+
+    def add_finish_listener(self, listener: FinishListener):
+        """Be told the outcome of every executed task, e.g. for health tracking."""
+        self._listeners.append(listener)
+
+    def configure_agent(
+        self, agent_id: str,
+        concurrency: Optional[int] = None,
+        max_queue_depth: Optional[int] = None,
+    ):
+        """Override concurrency or queue depth for one agent."""
+        queue = self._get_queue(agent_id)
+        if concurrency is not None:
+            queue.concurrency = concurrency
+            queue.retire = max(0, len(queue.workers) - concurrency)
+        if max_queue_depth is not None:
+            queue.max_depth = max_queue_depth
+        if queue.workers:
+            self._ensure_workers(queue)
+
+    async def submit(self, task: A2ATask) -> A2ATask:
+        """Store a task and queue it for its target agent, or raise `QueueFullError`."""
+        queue = self._get_queue(task.to_agent)
+        if queue.depth >= queue.max_depth:
+            queue.rejected += 1
+            logger.warning("a2a_queue_full", agent_id=task.to_agent, depth=queue.depth)
+            raise QueueFullError(task.to_agent, queue.depth)
+
+        task = await self._directory.send_task(task)
+        self._task_agents[task.id] = task.to_agent
+        queue.queued.add(task.id)
+        queue.submitted += 1
+        queue.queue.put_nowait((task_priority(task), next(self._seq), task.id, time.monotonic()))
+        self._ensure_workers(queue)
+        return task
+
+    async def cancel(self, task_id: str) -> Optional[A2ATask]:
+        """Cancel a queued or running task. Returns the task, or None if unknown."""
+        agent_id = self._task_agents.get(task_id)
+        queue = self._queues.get(agent_id) if agent_id else None
+        if queue is not None:
+            if task_id in queue.queued:
+                # Skipped by the worker when it reaches the front of the queue
+                queue.queued.discard(task_id)
+                queue.cancelled_count += 1
+                self._task_agents.pop(task_id, None)
+            elif (running := queue.running.get(task_id)) is not None:
+                running.cancel()
+        return await self._directory.cancel_task(task_id)
+
+    def metrics(self) -> dict:
+        """Worker-level metrics per target agent."""
+        return {agent_id: q.snapshot() for agent_id, q in self._queues.items()}
+
+    def queue_stats(self, agent_id: str) -> Optional[dict]:
+        queue = self._queues.get(agent_id)
+        return queue.snapshot() if queue else None
+
+    async def shutdown(self):
+        """Stop all workers; tasks still queued stay pending in the directory."""
+        workers = [w for q in self._queues.values() for w in q.workers]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._queues.clear()
+        self._task_agents.clear()
+
+    def _get_queue(self, agent_id: str) -> _AgentQueue:
+        queue = self._queues.get(agent_id)
+        if queue is None:
+            queue = _AgentQueue(agent_id, self._concurrency, self._max_queue_depth)
+            self._queues[agent_id] = queue
+        return queue
+
+    def _ensure_workers(self, queue: _AgentQueue):
+        while len(queue.workers) < queue.concurrency:
+            worker = asyncio.create_task(self._worker(queue))
+            queue.workers.add(worker)
+            worker.add_done_callback(lambda w: self._worker_done(queue, w))
+
+    def _worker_done(self, queue: _AgentQueue, worker: asyncio.Task):
+        queue.workers.discard(worker)
+        queue.retire = min(queue.retire, max(0, len(queue.workers) - queue.concurrency))
+        # A worker that failed leaves queued tasks behind; cancelled ones are shutting down
+        if not worker.cancelled() and queue.queued and self._queues.get(queue.agent_id) is queue:
+            self._ensure_workers(queue)
+
+    async def _worker(self, queue: _AgentQueue):
+        while True:
+            # Workers above a lowered concurrency exit after their current task, one each
+            if queue.retire:
+                queue.retire -= 1
+                return
+            _, _, task_id, enqueued_at = await queue.queue.get()
+            if task_id not in queue.queued:
+                continue
+            queue.queued.discard(task_id)
+            queue.record_wait((time.monotonic() - enqueued_at) * 1000)
+            await self._execute(queue, task_id)
+
+    async def _execute(self, queue: _AgentQueue, task_id: str):
+        task = await self._directory.start_task(task_id)
+        if task is None:
+            self._task_agents.pop(task_id, None)
+            return
+
+        handler = self._handlers.get(queue.agent_id)
+        if handler is None and self._resolver:
+            handler = self._resolver(queue.agent_id)
+            if handler is not None:
+                self._handlers[queue.agent_id] = handler
+        if handler is None:
+            queue.failed += 1
+            self._task_agents.pop(task_id, None)
+            await self._directory.fail_task(task_id, f"No handler registered for agent '{queue.agent_id}'")
+            self._notify(queue.agent_id, "failed", 0.0)
+            return
+
+        run = asyncio.create_task(
+            asyncio.wait_for(self._run_handler(handler, task), self._task_timeout)
+        )
+        queue.running[task_id] = run
+        started = time.monotonic()
+        status = "cancelled"
+        try:
+            output = await asyncio.shield(run)
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # Worker shutdown — stop the handler and let cancellation propagate
+                run.cancel()
+                raise
+            # Cancelled through `cancel()`, which already updated the directory
+            queue.cancelled_count += 1
+        except Exception as e:
+            status = "failed"
+            queue.failed += 1
+            error = "Task timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            await self._directory.fail_task(task_id, error)
+        else:
+            status = "completed"
+            queue.completed += 1
+            await self._directory.complete_task(task_id, output)
+        finally:
+            run_ms = (time.monotonic() - started) * 1000
+            queue.record_run(run_ms)
+            queue.running.pop(task_id, None)
+            self._task_agents.pop(task_id, None)
+        self._notify(queue.agent_id, status, run_ms)
+
+    def _notify(self, agent_id: str, status: str, run_ms: float):
+        for listener in self._listeners:
+            try:
+                listener(agent_id, status, run_ms)
+            except Exception as e:
+                logger.error("a2a_finish_listener_failed", agent_id=agent_id, error=str(e))
+
+    async def _run_handler(self, handler: TaskHandler, task: A2ATask) -> str:
+        result = handler(task)
+        if not hasattr(result, "__aiter__"):
+            return await result
+
+        events = self._directory.events
+        chunks: list[str] = []
+        async for chunk in result:
+            chunks.append(chunk)
+            if events.active:
+                events.publish_output(task.id, task.from_agent, task.to_agent, chunk)
+        return "".join(chunks)
+
+
+# Singleton
+a2a_engine = A2ATaskEngine(
+    a2a_directory,
+    concurrency=settings.a2a_agent_concurrency,
+    max_queue_depth=settings.a2a_max_queue_depth,
+    task_timeout=settings.a2a_task_timeout_seconds,
+)
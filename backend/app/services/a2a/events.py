@@ -0,0 +1,170 @@
+"""
+In-process pub/sub for A2A task events.
+
+Status transitions and partial output are published once, serialized once,
+and fanned out to subscribers indexed by task id and by agent id. Each
+subscriber has a small bounded buffer; a subscriber that falls behind is
+dropped (and told so) instead of slowing down publishers or growing memory.
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Callable, Optional
+
+from app.core.logging import logger
+from app.services.a2a.store import TERMINAL_STATUSES
+
+
+class TaskEvent:
+    """A published event: SSE event name plus pre-serialized JSON data."""
+
+    __slots__ = ("event", "data", "task_id", "final")
+
+    def __init__(self, event: str, data: str, task_id: str, final: bool = False):
+        self.event = event
+        self.data = data
+        self.task_id = task_id
+        self.final = final
+
+    def as_sse(self) -> dict:
+        return {"event": self.event, "data": self.data}
+
+
+# Sent in place of buffered events when a subscriber is dropped
+DROPPED = TaskEvent("dropped", '{"reason":"slow_consumer"}', task_id="", final=True)
+
+
+class Subscription:
+    """A subscriber's bounded event buffer."""
+
+    __slots__ = ("task_id", "agent_id", "queue", "dropped")
+
+    def __init__(self, task_id: Optional[str], agent_id: Optional[str], buffer_size: int):
+        self.task_id = task_id
+        self.agent_id = agent_id
+        self.queue: asyncio.Queue[TaskEvent] = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = False
+
+    def offer(self, event: TaskEvent) -> bool:
+        """Buffer an event without blocking. Returns False if the buffer is full."""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def drop(self):
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(DROPPED)
+
+    async def events(self) -> AsyncIterator[TaskEvent]:
+        """Yield events until the subscription is dropped or, for a task, it finishes."""
+        while True:
+            event = await self.queue.get()
+            yield event
+            if event is DROPPED or (self.task_id and event.final):
+                return
+
+
+class TaskEventBus:
+    """Fanout of task events to task- and agent-scoped subscribers."""
+
+    def __init__(self, buffer_size: int = 64):
+        self._buffer_size = buffer_size
+        self._by_task: dict[str, set[Subscription]] = {}
+        self._by_agent: dict[str, set[Subscription]] = {}
+        self._listeners: list[Callable[[TaskEvent, str, str], None]] = []
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def active(self) -> bool:
+        """Whether anyone is listening; publishers can skip building events otherwise."""
+        return bool(self._by_task or self._by_agent or self._listeners)
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(s) for s in self._by_task.values()) + sum(
+            len(s) for s in self._by_agent.values()
+        )
+
+    def subscribe(
+        self, task_id: Optional[str] = None, agent_id: Optional[str] = None,
+    ) -> Subscription:
+        """Subscribe to one task's events, or to every task sent to or from an agent."""
+        if bool(task_id) == bool(agent_id):
+            raise ValueError("Subscribe to exactly one of task_id or agent_id")
+        sub = Subscription(task_id, agent_id, self._buffer_size)
+        index, key = (self._by_task, task_id) if task_id else (self._by_agent, agent_id)
+        index.setdefault(key, set()).add(sub)
+        return sub
+
+    def add_listener(self, listener: Callable[[TaskEvent, str, str], None]):
+        """
+        Call `listener(event, from_agent, to_agent)` for every published event.
+        Listeners run inline with the publisher and must not block.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[TaskEvent, str, str], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def unsubscribe(self, sub: Subscription):
+        index, key = (self._by_task, sub.task_id) if sub.task_id else (self._by_agent, sub.agent_id)
+        subs = index.get(key)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del index[key]
+
+    def publish_status(self, fields: dict):
+        """Publish a task's status, given its `A2ATask` field dict."""
+        payload = {
+            "task_id": fields["id"],
+            "from_agent": fields["from_agent"],
+            "to_agent": fields["to_agent"],
+            "status": fields["status"],
+        }
+        if fields.get("output_text") is not None:
+            payload["output_text"] = fields["output_text"]
+        if fields.get("completed_at"):
+            payload["completed_at"] = fields["completed_at"]
+        if fields.get("metadata", {}).get("error"):
+            payload["error"] = fields["metadata"]["error"]
+
+        final = fields["status"] in TERMINAL_STATUSES
+        event = TaskEvent("status", _dumps(payload), fields["id"], final=final)
+        self._fanout(event, fields["from_agent"], fields["to_agent"])
+
+    def publish_output(self, task_id: str, from_agent: str, to_agent: str, delta: str):
+        """Publish a chunk of partial output for a running task."""
+        event = TaskEvent("output", _dumps({"task_id": task_id, "delta": delta}), task_id)
+        self._fanout(event, from_agent, to_agent)
+
+    def _fanout(self, event: TaskEvent, from_agent: str, to_agent: str):
+        self.published += 1
+        for listener in self._listeners:
+            try:
+                listener(event, from_agent, to_agent)
+            except Exception as e:
+                logger.error("a2a_event_listener_failed", event=event.event, error=str(e))
+
+        targets = set(self._by_task.get(event.task_id, ()))
+        targets.update(self._by_agent.get(to_agent, ()))
+        targets.update(self._by_agent.get(from_agent, ()))
+
+        for sub in targets:
+            if not sub.offer(event):
+                self.dropped += 1
+                self.unsubscribe(sub)
+                sub.drop()
+                logger.warning(
+                    "a2a_subscriber_dropped", task_id=sub.task_id, agent_id=sub.agent_id,
+                )
+
+
+def _dumps(payload: dict) -> str:
+    return json.dumps(payload, separators=(",", ":"))
@@ -10,14 +10,22 @@ Implements the Google A2A protocol for inter-agent communication:
 Each deployed agent gets an A2A endpoint that other agents can discover
 and communicate with.
 """
+import asyncio
+import hashlib
 import uuid
 from typing import Optional
 from datetime import datetime, timezone
 
 from pydantic import BaseModel, Field
 
+from app.core.config import settings
 from app.core.logging import logger
 from app.models.agent import A2AAgentCard, AgentNode
+from app.services.a2a.events import TaskEventBus
+from app.services.a2a.store import TERMINAL_STATUSES, CompactTask, TaskStore
+from app.services.state.backend import SharedMap, StateBackend, state_backend
+
+TASKS_NAMESPACE = "a2a:tasks"
 
 
 class A2ATask(BaseModel):
@@ -27,7 +35,7 @@ class A2ATask(BaseModel):
     to_agent: str
     skill_id: str
     input_text: str
-    status: str = "pending"  # pending | in_progress | completed | failed
+    status: str = "pending"  # pending | in_progress | completed | failed | cancelled
     output_text: Optional[str] = None
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     completed_at: Optional[str] = None
@@ -41,25 +49,71 @@ class A2AMessage(BaseModel):
     timestamp: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 
+class CachedPayload:
+    """Pre-serialized JSON response body with its strong ETag."""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
 class A2ADirectory:
     """
     Agent directory for A2A discovery.
 
     Maintains a registry of all deployed agents and their capabilities.
     Agents can query the directory to find other agents with specific skills.
+    Tasks are kept in a compact, bounded `TaskStore`; every status change is
+    published on `events` for streaming subscribers. Serialized cards and
+    directory listings are cached until the next register/unregister.
+
+    Cards and tasks are mirrored to the shared state backend, so every
+    worker and replica sees the same directory.
     """
 
-    def __init__(self):
-        self._agents: dict[str, A2AAgentCard] = {}
-        self._tasks: dict[str, A2ATask] = {}
+    def __init__(
+        self,
+        task_store: Optional[TaskStore] = None,
+        events: Optional[TaskEventBus] = None,
+        state: Optional[StateBackend] = None,
+    ):
+        self._state = state or state_backend
+        self._agents: SharedMap[A2AAgentCard] = SharedMap(
+            self._state, "a2a:agents",
+            encode=lambda card: card.model_dump_json(),
+            decode=A2AAgentCard.model_validate_json,
+            on_change=lambda agent_id, _: self._agent_changed(agent_id),
+        )
+        # Skill id or name -> agent ids (dict as an insertion-ordered set)
+        self._skill_index: dict[str, dict[str, None]] = {}
+        self._agent_skills: dict[str, set[str]] = {}
+        self._card_payloads: dict[str, CachedPayload] = {}
+        self._directory_payloads: dict[Optional[str], CachedPayload] = {}
+        if task_store is None:
+            task_store = TaskStore(
+                max_age_seconds=settings.a2a_task_retention_seconds,
+                max_finished=settings.a2a_max_finished_tasks,
+                spill_path=settings.a2a_task_spill_path,
+            )
+        self._tasks = task_store
+        self.events = events or TaskEventBus(settings.a2a_subscriber_buffer)
+        self._background: set[asyncio.Task] = set()
+        if self._state.shared:
+            self._tasks.on_evict = self._forget_tasks
+            self._state.watch(TASKS_NAMESPACE, self._apply_remote_task)
+            self._state.on_start(self._load_tasks)
 
     async def register_agent(self, agent_id: str, card: A2AAgentCard):
         """Register an agent in the A2A directory."""
-        self._agents[agent_id] = card
+        await self._agents.set(agent_id, card)
+        self._agent_changed(agent_id)
         logger.info("a2a_agent_registered", agent_id=agent_id, skills=len(card.skills))
 
     async def unregister_agent(self, agent_id: str):
-        self._agents.pop(agent_id, None)
+        await self._agents.delete(agent_id)
+        self._agent_changed(agent_id)
 
     async def get_agent_card(self, agent_id: str) -> Optional[A2AAgentCard]:
         """Get an agent's A2A card (the /.well-known/agent.json equivalent)."""
@@ -70,13 +124,51 @@ class A2ADirectory:
         if not skill_name:
             return list(self._agents.values())
         return [
-            card for card in self._agents.values()
+            card for card in map(self._agents.get, self._skill_index.get(skill_name, ()))
             if any(s.name == skill_name for s in card.skills)
         ]
 
+    def agents_with_skill(self, skill: str) -> list[str]:
+        """Ids of agents exposing a skill, matched by skill id or name."""
+        return list(self._skill_index.get(skill, ()))
+
+    async def get_card_payload(self, agent_id: str) -> Optional[CachedPayload]:
+        """An agent's card as cached JSON bytes, or None if it is not registered."""
+        payload = self._card_payloads.get(agent_id)
+        if payload is None:
+            card = self._agents.get(agent_id)
+            if card is None:
+                return None
+            payload = CachedPayload(card.model_dump_json().encode())
+            self._card_payloads[agent_id] = payload
+        return payload
+
+    async def get_directory_payload(self, skill_name: Optional[str] = None) -> CachedPayload:
+        """The `{"agents": [...]}` discovery listing as cached JSON bytes."""
+        payload = self._directory_payloads.get(skill_name)
+        if payload is not None:
+            return payload
+
+        if skill_name:
+            agent_ids = [
+                agent_id for agent_id in self._skill_index.get(skill_name, ())
+                if any(s.name == skill_name for s in self._agents.get(agent_id).skills)
+            ]
+        else:
+            agent_ids = list(self._agents.keys())
+        bodies = [(await self.get_card_payload(agent_id)).body for agent_id in agent_ids]
+        payload = CachedPayload(b'{"agents":[' + b",".join(bodies) + b"]}")
+        # Only cache listings for skills that exist, so arbitrary queries can't grow the cache
+        if skill_name is None or agent_ids:
+            self._directory_payloads[skill_name] = payload
+        return payload
+
     async def send_task(self, task: A2ATask) -> A2ATask:
         """Send a task from one agent to another."""
-        self._tasks[task.id] = task
+        record = CompactTask.from_task(task)
+        self._tasks.put(record)
+        await self._save(record)
+        self._publish(record)
         logger.info(
             "a2a_task_sent",
             task_id=task.id,
@@ -87,27 +179,125 @@ class A2ADirectory:
         return task
 
     async def get_task(self, task_id: str) -> Optional[A2ATask]:
-        return self._tasks.get(task_id)
+        record = await self._get_record(task_id)
+        return self._to_model(record) if record else None
+
+    async def start_task(self, task_id: str) -> Optional[A2ATask]:
+        """Move a pending task to in_progress. Returns None if it is not pending."""
+        record = await self._get_record(task_id)
+        if not record or record.status != "pending":
+            return None
+        record = self._tasks.update(task_id, status="in_progress")
+        await self._save(record)
+        self._publish(record)
+        return self._to_model(record) if record else None
+
+    async def cancel_task(self, task_id: str) -> Optional[A2ATask]:
+        """Mark an unfinished A2A task as cancelled."""
+        record = await self._get_record(task_id)
+        if record and record.status not in TERMINAL_STATUSES:
+            record = self._tasks.update(task_id, status="cancelled")
+            await self._save(record)
+            self._publish(record)
+            logger.info("a2a_task_cancelled", task_id=task_id)
+        return self._to_model(record) if record else None
 
     async def complete_task(self, task_id: str, output: str) -> Optional[A2ATask]:
-        """Mark an A2A task as completed with output."""
-        task = self._tasks.get(task_id)
-        if task:
-            task.status = "completed"
-            task.output_text = output
-            task.completed_at = datetime.now(timezone.utc).isoformat()
+        """Mark an A2A task as completed with output. Finished tasks are left as they are."""
+        record = await self._get_record(task_id)
+        if not record:
+            return None
+        if record.status not in TERMINAL_STATUSES:
+            record = self._tasks.update(task_id, status="completed", output_text=output)
+            await self._save(record)
+            self._publish(record)
             logger.info("a2a_task_completed", task_id=task_id)
-        return task
+        return self._to_model(record)
+
+    async def fail_task(self, task_id: str, error: str) -> Optional[A2ATask]:
+        """Mark an A2A task as failed, recording the error in its metadata."""
+        record = await self._get_record(task_id)
+        if not record:
+            return None
+        if record.status not in TERMINAL_STATUSES:
+            metadata = {**(record.metadata or {}), "error": error}
+            record = self._tasks.update(task_id, status="failed", metadata=metadata)
+            await self._save(record)
+            self._publish(record)
+            logger.warning("a2a_task_failed", task_id=task_id, error=error)
+        return self._to_model(record)
 
     async def list_tasks(self, agent_id: Optional[str] = None) -> list[A2ATask]:
-        """List all tasks, optionally filtered by agent."""
-        if not agent_id:
-            return list(self._tasks.values())
+        """List in-memory tasks, optionally filtered by agent."""
         return [
-            t for t in self._tasks.values()
-            if t.from_agent == agent_id or t.to_agent == agent_id
+            self._to_model(t) for t in self._tasks.values()
+            if not agent_id or t.from_agent == agent_id or t.to_agent == agent_id
         ]
 
+    async def close(self):
+        self._tasks.close()
+
+    async def _get_record(self, task_id: str) -> Optional[CompactTask]:
+        record = self._tasks.get(task_id)
+        if record is None and self._state.shared:
+            # Sent through another worker and not yet seen here
+            raw = await self._state.get(TASKS_NAMESPACE, task_id)
+            if raw is not None:
+                record = CompactTask.from_json(raw)
+                self._tasks.put(record)
+        return record
+
+    async def _save(self, record: Optional[CompactTask]):
+        if record and self._state.shared:
+            await self._state.set(TASKS_NAMESPACE, record.id, record.to_json())
+
+    async def _load_tasks(self):
+        for raw in (await self._state.items(TASKS_NAMESPACE)).values():
+            self._tasks.put(CompactTask.from_json(raw))
+
+    async def _apply_remote_task(self, task_id: str):
+        raw = await self._state.get(TASKS_NAMESPACE, task_id)
+        # Deletions are another worker's retention; local retention runs on its own
+        if raw is not None:
+            record = CompactTask.from_json(raw)
+            self._tasks.put(record)
+            self._publish(record)
+
+    def _forget_tasks(self, evicted: list[CompactTask]):
+        async def forget():
+            for task in evicted:
+                await self._state.delete(TASKS_NAMESPACE, task.id)
+
+        task = asyncio.get_running_loop().create_task(forget())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _agent_changed(self, agent_id: str):
+        """Refresh the skill index and drop cached payloads after a card changes."""
+        for key in self._agent_skills.pop(agent_id, ()):
+            agents = self._skill_index.get(key)
+            if agents is not None:
+                agents.pop(agent_id, None)
+                if not agents:
+                    del self._skill_index[key]
+        card = self._agents.get(agent_id)
+        if card is not None:
+            keys = {s.id for s in card.skills} | {s.name for s in card.skills}
+            self._agent_skills[agent_id] = keys
+            for key in keys:
+                self._skill_index.setdefault(key, {})[agent_id] = None
+
+        self._card_payloads.pop(agent_id, None)
+        self._directory_payloads.clear()
+
+    def _publish(self, record: Optional[CompactTask]):
+        if record and self.events.active:
+            self.events.publish_status(record.as_fields())
+
+    @staticmethod
+    def _to_model(record: CompactTask) -> A2ATask:
+        return A2ATask.model_construct(**record.as_fields())
+
 
 # Singleton
 a2a_directory = A2ADirectory()
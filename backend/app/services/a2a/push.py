@@ -0,0 +1,281 @@
+"""
+A2A push notifications via webhooks.
+
+Clients register a webhook for a single task or for every task of an agent.
+Status events are picked up from the directory's event bus without blocking
+the publisher, coalesced per endpoint, and POSTed in batches:
+
+    {"events": [{"task_id": ..., "status": ..., ...}, ...]}
+
+Delivery uses one shared, pooled `httpx.AsyncClient`. Failed batches are
+retried with exponential backoff and jitter, then moved to a bounded
+dead-letter queue.
+"""
+import asyncio
+import random
+import time
+import uuid
+from collections import deque
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+from pydantic import BaseModel, Field, field_validator
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.services.a2a.events import TaskEvent, TaskEventBus
+from app.services.a2a.protocol import a2a_directory
+
+TOKEN_HEADER = "X-A2A-Notification-Token"
+
+# Statuses worth retrying; other 4xx responses are treated as permanent failures
+RETRYABLE_STATUS = frozenset({408, 425, 429})
+
+
+class PushNotificationConfig(BaseModel):
+    """Webhook an A2A client wants task updates delivered to."""
+    url: str
+    token: Optional[str] = Field(default=None, description="Sent back in the X-A2A-Notification-Token header")
+
+    @field_validator("url")
+    @classmethod
+    def _http_url(cls, url: str) -> str:
+        # Rejected at registration rather than retried into the dead letters
+        try:
+            parts = urlsplit(url)
+            parts.port  # raises for a malformed port
+        except ValueError:
+            raise ValueError("Webhook URL is malformed")
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError("Webhook URL must be an absolute http(s) URL")
+        return url
+
+
+class Webhook(BaseModel):
+    """A registered webhook."""
+    id: str = Field(default_factory=lambda: f"hook-{uuid.uuid4().hex[:12]}")
+    url: str
+    token: Optional[str] = None
+    task_id: Optional[str] = None
+    agent_id: Optional[str] = None
+
+
+class _Endpoint:
+    """Pending events and delivery loop for one (url, token) pair."""
+
+    def __init__(self, url: str, token: Optional[str], max_pending: int):
+        self.url = url
+        self.token = token
+        self.pending: deque[str] = deque(maxlen=max_pending)
+        self.wake = asyncio.Event()
+        self.worker: Optional[asyncio.Task] = None
+        self.refs = 0
+
+        self.delivered = 0
+        self.batches = 0
+        self.retries = 0
+        self.overflowed = 0
+        self.dead_lettered = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "retries": self.retries,
+            "overflowed": self.overflowed,
+            "dead_lettered": self.dead_lettered,
+        }
+
+
+class PushNotificationService:
+    """Batched, retried webhook delivery of A2A task status events."""
+
+    def __init__(
+        self,
+        events: TaskEventBus,
+        batch_size: int = 100,
+        linger: float = 0.05,
+        max_attempts: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        max_pending: int = 10_000,
+        dead_letter_size: int = 1000,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self._events = events
+        self._batch_size = batch_size
+        self._linger = linger
+        self._max_attempts = max_attempts
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._max_pending = max_pending
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self._webhooks: dict[str, Webhook] = {}
+        self._by_task: dict[str, set[str]] = {}
+        self._by_agent: dict[str, set[str]] = {}
+        self._endpoints: dict[tuple[str, Optional[str]], _Endpoint] = {}
+        self.dead_letters: deque[dict] = deque(maxlen=dead_letter_size)
+
+    def register(
+        self, config: PushNotificationConfig,
+        task_id: Optional[str] = None, agent_id: Optional[str] = None,
+    ) -> Webhook:
+        """Register a webhook for one task, or for every task sent to or from an agent."""
+        if bool(task_id) == bool(agent_id):
+            raise ValueError("Register a webhook for exactly one of task_id or agent_id")
+        hook = Webhook(url=config.url, token=config.token, task_id=task_id, agent_id=agent_id)
+        self._webhooks[hook.id] = hook
+        index, key = (self._by_task, task_id) if task_id else (self._by_agent, agent_id)
+        index.setdefault(key, set()).add(hook.id)
+        self._endpoint(hook).refs += 1
+        self._events.add_listener(self._on_event)
+        logger.info("a2a_webhook_registered", webhook_id=hook.id, task_id=task_id, agent_id=agent_id)
+        return hook
+
+    def unregister(self, webhook_id: str) -> bool:
+        hook = self._webhooks.pop(webhook_id, None)
+        if not hook:
+            return False
+        index, key = (self._by_task, hook.task_id) if hook.task_id else (self._by_agent, hook.agent_id)
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(webhook_id)
+            if not ids:
+                del index[key]
+        endpoint = self._endpoints.get((hook.url, hook.token))
+        if endpoint:
+            endpoint.refs -= 1
+            endpoint.wake.set()  # lets an idle, unreferenced endpoint retire
+        if not self._webhooks:
+            self._events.remove_listener(self._on_event)
+        return True
+
+    def metrics(self) -> dict:
+        return {
+            "webhooks": len(self._webhooks),
+            "dead_letters": len(self.dead_letters),
+            "endpoints": {url: e.snapshot() for (url, _), e in self._endpoints.items()},
+        }
+
+    async def shutdown(self, timeout: float = 5.0):
+        """Give endpoints `timeout` seconds to drain, then stop and close the client."""
+        workers = [e.worker for e in self._endpoints.values() if e.worker]
+        for endpoint in self._endpoints.values():
+            endpoint.refs = 0
+            endpoint.wake.set()
+        if workers:
+            _, still_running = await asyncio.wait(workers, timeout=timeout)
+            for worker in still_running:
+                worker.cancel()
+            await asyncio.gather(*still_running, return_exceptions=True)
+        self._endpoints.clear()
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def _on_event(self, event: TaskEvent, from_agent: str, to_agent: str):
+        # Runs inline with the publisher (e.g. complete_task): only enqueue here
+        if event.event != "status":
+            return
+        hook_ids = set(self._by_task.get(event.task_id, ()))
+        hook_ids.update(self._by_agent.get(to_agent, ()))
+        hook_ids.update(self._by_agent.get(from_agent, ()))
+
+        endpoints: dict[tuple[str, Optional[str]], _Endpoint] = {}
+        for hook_id in hook_ids:
+            hook = self._webhooks[hook_id]
+            endpoints[(hook.url, hook.token)] = self._endpoint(hook)
+
+        for endpoint in endpoints.values():
+            if len(endpoint.pending) == endpoint.pending.maxlen:
+                endpoint.overflowed += 1
+            endpoint.pending.append(event.data)
+            endpoint.wake.set()
+            if endpoint.worker is None or endpoint.worker.done():
+                endpoint.worker = asyncio.create_task(self._deliver_loop(endpoint))
+
+        if event.final:
+            for hook_id in list(self._by_task.get(event.task_id, ())):
+                self.unregister(hook_id)
+
+    def _endpoint(self, hook: Webhook) -> _Endpoint:
+        key = (hook.url, hook.token)
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            endpoint = _Endpoint(hook.url, hook.token, self._max_pending)
+            self._endpoints[key] = endpoint
+        return endpoint
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=httpx.Timeout(10.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+        return self._client
+
+    async def _deliver_loop(self, endpoint: _Endpoint):
+        while True:
+            if not endpoint.pending:
+                if endpoint.refs <= 0:
+                    self._endpoints.pop((endpoint.url, endpoint.token), None)
+                    return
+                endpoint.wake.clear()
+                await endpoint.wake.wait()
+                continue
+
+            # Let a burst of events accumulate into one request
+            if len(endpoint.pending) < self._batch_size and self._linger:
+                await asyncio.sleep(self._linger)
+            batch = [
+                endpoint.pending.popleft()
+                for _ in range(min(self._batch_size, len(endpoint.pending)))
+            ]
+            await self._send(endpoint, batch)
+
+    async def _send(self, endpoint: _Endpoint, batch: list[str]):
+        body = ('{"events":[' + ",".join(batch) + "]}").encode()
+        headers = {"Content-Type": "application/json"}
+        if endpoint.token:
+            headers[TOKEN_HEADER] = endpoint.token
+
+        error = None
+        for attempt in range(self._max_attempts):
+            if attempt:
+                endpoint.retries += 1
+                delay = min(self._backoff_max, self._backoff_base * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+            try:
+                response = await self._get_client().post(endpoint.url, content=body, headers=headers)
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+                continue
+            if response.is_success:
+                endpoint.delivered += len(batch)
+                endpoint.batches += 1
+                return
+            error = f"HTTP {response.status_code}"
+            if response.status_code < 500 and response.status_code not in RETRYABLE_STATUS:
+                break
+
+        endpoint.dead_lettered += len(batch)
+        self.dead_letters.append({
+            "url": endpoint.url,
+            "events": batch,
+            "error": error,
+            "failed_at": time.time(),
+        })
+        logger.warning("a2a_webhook_dead_lettered", url=endpoint.url, events=len(batch), error=error)
+
+
+# Singleton
+push_service = PushNotificationService(
+    a2a_directory.events,
+    batch_size=settings.a2a_push_batch_size,
+    max_attempts=settings.a2a_push_max_attempts,
+)
@@ -0,0 +1,291 @@
+"""
+Compact A2A task store.
+
+Tasks are held as slotted records with integer epoch-millisecond timestamps
+and interned agent/skill ids instead of full pydantic models. Finished tasks
+(completed, failed or cancelled) are retained by age and by count; evicted
+tasks can optionally be spilled to an on-disk SQLite store, which stays
+readable through `TaskStore.get`.
+
+Eviction happens on the event loop at task transitions, so spilling only
+queues the tasks: a writer thread commits whatever has queued up in one
+transaction, and queued tasks are served from memory until then.
+"""
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterator, Optional
+
+from app.core.logging import logger
+
+TERMINAL_STATUSES = frozenset({"completed", "failed", "cancelled"})
+
+
+def now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def iso_to_ms(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def ms_to_iso(value: Optional[int]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc).isoformat()
+
+
+class CompactTask:
+    """Slotted, pydantic-free representation of an `A2ATask`."""
+
+    __slots__ = (
+        "id", "from_agent", "to_agent", "skill_id", "input_text", "status",
+        "output_text", "created_at", "completed_at", "metadata",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        from_agent: str,
+        to_agent: str,
+        skill_id: str,
+        input_text: str,
+        status: str = "pending",
+        output_text: Optional[str] = None,
+        created_at: Optional[int] = None,
+        completed_at: Optional[int] = None,
+        metadata: Optional[dict] = None,
+    ):
+        self.id = id
+        self.from_agent = sys.intern(from_agent)
+        self.to_agent = sys.intern(to_agent)
+        self.skill_id = sys.intern(skill_id)
+        self.input_text = input_text
+        self.status = sys.intern(status)
+        self.output_text = output_text
+        self.created_at = created_at if created_at is not None else now_ms()
+        self.completed_at = completed_at
+        # Most tasks carry no metadata; don't pay for an empty dict per task
+        self.metadata = metadata or None
+
+    @classmethod
+    def from_task(cls, task: Any) -> "CompactTask":
+        """Build a compact record from an `A2ATask` (or anything shaped like one)."""
+        return cls(
+            id=task.id,
+            from_agent=task.from_agent,
+            to_agent=task.to_agent,
+            skill_id=task.skill_id,
+            input_text=task.input_text,
+            status=task.status,
+            output_text=task.output_text,
+            created_at=iso_to_ms(task.created_at),
+            completed_at=iso_to_ms(task.completed_at),
+            metadata=dict(task.metadata) if task.metadata else None,
+        )
+
+    def as_fields(self) -> dict:
+        """Field dict matching `A2ATask`, with ISO-string timestamps."""
+        return {
+            "id": self.id,
+            "from_agent": self.from_agent,
+            "to_agent": self.to_agent,
+            "skill_id": self.skill_id,
+            "input_text": self.input_text,
+            "status": self.status,
+            "output_text": self.output_text,
+            "created_at": ms_to_iso(self.created_at),
+            "completed_at": ms_to_iso(self.completed_at),
+            "metadata": dict(self.metadata) if self.metadata else {},
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(
+            [getattr(self, name) for name in self.__slots__], separators=(",", ":")
+        )
+
+    @classmethod
+    def from_json(cls, data: str) -> "CompactTask":
+        return cls(*json.loads(data))
+
+
+class _SpillStore:
+    """Append-mostly SQLite file holding tasks evicted from memory, written by a background thread."""
+
+    def __init__(self, path: str):
+        self._writer_conn = self._connect(path)
+        self._writer_conn.execute(
+            "CREATE TABLE IF NOT EXISTS a2a_tasks (id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._writer_conn.commit()
+        # Separate connection for reads: WAL readers don't wait for the writer's commits
+        self._conn = self._connect(path)
+        # Spilled but not yet committed, by id
+        self._queued: dict[str, CompactTask] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="a2a-task-spill", daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def put_many(self, tasks: list[CompactTask]):
+        """Queue tasks for the writer thread; never touches the disk."""
+        with self._lock:
+            for task in tasks:
+                self._queued[task.id] = task
+        self._wake.set()
+
+    def get(self, task_id: str) -> Optional[CompactTask]:
+        with self._lock:
+            task = self._queued.get(task_id)
+        if task is not None:
+            return task
+        row = self._conn.execute(
+            "SELECT data FROM a2a_tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        return CompactTask.from_json(row[0]) if row else None
+
+    def flush(self):
+        """Commit every queued task now."""
+        with self._write_lock:
+            with self._lock:
+                batch = list(self._queued.values())
+            if not batch:
+                return
+            self._writer_conn.executemany(
+                "INSERT OR REPLACE INTO a2a_tasks (id, data) VALUES (?, ?)",
+                [(t.id, t.to_json()) for t in batch],
+            )
+            self._writer_conn.commit()
+            with self._lock:
+                for task in batch:
+                    if self._queued.get(task.id) is task:
+                        del self._queued[task.id]
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                # Tasks stay queued (and readable) for the next attempt
+                logger.error("a2a_spill_failed", error=str(e))
+                time.sleep(1)
+                self._wake.set()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        self._writer_conn.close()
+        self._conn.close()
+
+
+class TaskStore:
+    """
+    In-memory task table with retention for finished tasks.
+
+    Finished tasks are kept in completion order, so age- and count-based
+    eviction only ever pops from the front — O(1) amortized per transition.
+    Pending and in-progress tasks are never evicted. `on_evict`, if set, is
+    called with each batch of evicted tasks.
+    """
+
+    def __init__(
+        self,
+        max_age_seconds: Optional[int] = 3600,
+        max_finished: Optional[int] = 10_000,
+        spill_path: Optional[str] = None,
+    ):
+        self._tasks: dict[str, CompactTask] = {}
+        self._finished: OrderedDict[str, int] = OrderedDict()
+        self._max_age_ms = max_age_seconds * 1000 if max_age_seconds else None
+        self._max_finished = max_finished
+        self._spill = _SpillStore(spill_path) if spill_path else None
+        self.on_evict: Optional[Callable[[list[CompactTask]], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def put(self, task: CompactTask):
+        self._tasks[task.id] = task
+        if task.status in TERMINAL_STATUSES:
+            self._mark_finished(task)
+        self.evict()
+
+    def get(self, task_id: str) -> Optional[CompactTask]:
+        task = self._tasks.get(task_id)
+        if task is None and self._spill:
+            task = self._spill.get(task_id)
+        return task
+
+    def update(self, task_id: str, **changes) -> Optional[CompactTask]:
+        """Apply field changes to an in-memory task; sets `completed_at` on finish."""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None
+        for name, value in changes.items():
+            setattr(task, name, sys.intern(value) if name == "status" else value)
+        if task.status in TERMINAL_STATUSES and task.id not in self._finished:
+            self._mark_finished(task)
+            self.evict()
+        return task
+
+    def values(self) -> Iterator[CompactTask]:
+        """Iterate in-memory tasks. Spilled tasks are only reachable via `get`."""
+        self.evict()
+        return iter(list(self._tasks.values()))
+
+    def evict(self) -> int:
+        """Drop finished tasks past the age or count limits. Returns the number evicted."""
+        cutoff = now_ms() - self._max_age_ms if self._max_age_ms else None
+        evicted: list[CompactTask] = []
+        while self._finished:
+            task_id, finished_at = next(iter(self._finished.items()))
+            over_count = self._max_finished is not None and len(self._finished) > self._max_finished
+            expired = cutoff is not None and finished_at < cutoff
+            if not (over_count or expired):
+                break
+            self._finished.popitem(last=False)
+            task = self._tasks.pop(task_id, None)
+            if task is not None:
+                evicted.append(task)
+
+        if evicted:
+            if self._spill:
+                self._spill.put_many(evicted)
+            if self.on_evict:
+                self.on_evict(evicted)
+            logger.debug("a2a_tasks_evicted", count=len(evicted), spilled=bool(self._spill))
+        return len(evicted)
+
+    def close(self):
+        if self._spill:
+            self._spill.close()
+
+    def _mark_finished(self, task: CompactTask):
+        if task.completed_at is None:
+            task.completed_at = now_ms()
+        self._finished[task.id] = task.completed_at
@@ -5,7 +5,7 @@ Handles the actual deployment of agent graphs to Azure AI Foundry:
 1. Creates AI Project if not exists
 2. Provisions agent instances via Azure AI Agent Service
 3. Configures tool connections
-4. Sets up Cosmos DB memory containers
+4. Sets up agent memory (Cosmos DB containers, in-memory or Redis)
 5. Registers Content Safety filters
 6. Creates eval pipeline via Azure AI Evaluation
 7. Registers A2A agent cards
@@ -30,18 +30,29 @@ from app.models.agent import (
     DeployedAgent, DeploymentStatus,
 )
 from app.services.mcp.server import mcp_manager
-from app.services.a2a.protocol import a2a_directory
-from app.services.memory.cosmos import cosmos_memory
+from app.services.a2a.protocol import a2a_directory, A2ATask
+from app.services.a2a.engine import a2a_engine
+from app.services.memory.router import memory_router
 from app.services.evaluation.evaluator import eval_service
 from app.services.guardrails.safety import safety_service
+from app.services.state.backend import SharedMap, StateBackend, state_backend
 
 
 class FoundryDeploymentService:
     """Deploys agent systems to Azure AI Foundry."""
 
-    def __init__(self):
+    def __init__(self, state: Optional[StateBackend] = None):
         self._client: Optional[AIProjectClient] = None
-        self._deployments: dict[str, DeployResponse] = {}
+        state = state or state_backend
+        self._deployments: SharedMap[DeployResponse] = SharedMap(
+            state, "deployments",
+            encode=lambda d: d.model_dump_json(),
+            decode=DeployResponse.model_validate_json,
+        )
+        # Platform agent id -> Agent Service agent id, so any worker can run A2A tasks
+        self._foundry_agents: SharedMap[str] = SharedMap(
+            state, "foundry:agents", encode=str, decode=str,
+        )
 
     async def _get_client(self) -> AIProjectClient:
         """Get or create the Azure AI Project client."""
@@ -88,11 +99,13 @@ class FoundryDeploymentService:
             client = await self._get_client()
 
             # Step 1: Set up memory
-            await cosmos_memory.ensure_container(graph.id)
+            for agent_node in graph.agents:
+                memory_router.configure(graph.id, agent_node.id, agent_node.memory or graph.global_memory)
+            await memory_router.ensure_container(graph.id)
             logger.info("memory_provisioned", graph_id=graph.id)
 
             # Step 2: Configure guardrails
-            await safety_service.configure(graph.global_guardrails)
+            await safety_service.register_graph(graph)
             logger.info("guardrails_configured", graph_id=graph.id)
 
             # Step 3: Deploy each agent
@@ -120,7 +133,7 @@ class FoundryDeploymentService:
                 agents_deployed=deployed_agents,
             )
 
-            self._deployments[deployment_id] = response
+            await self._deployments.set(deployment_id, response)
             logger.info("deployment_completed", deployment_id=deployment_id)
             return response
 
@@ -158,6 +171,8 @@ class FoundryDeploymentService:
             a2a_url = None
             if agent.a2a_card:
                 await a2a_directory.register_agent(agent.id, agent.a2a_card)
+                await self._foundry_agents.set(agent.id, ai_agent.id)
+                a2a_engine.register_handler(agent.id, self._a2a_handler(ai_agent.id))
                 a2a_url = f"/a2a/{agent.id}/agent.json"
 
             logger.info(
@@ -186,6 +201,31 @@ class FoundryDeploymentService:
                 status=DeploymentStatus.FAILED,
             )
 
+    def resolve_a2a_handler(self, agent_id: str):
+        """A2A handler for an agent deployed by any worker, or None if unknown."""
+        foundry_agent_id = self._foundry_agents.get(agent_id)
+        return self._a2a_handler(foundry_agent_id) if foundry_agent_id else None
+
+    def _a2a_handler(self, foundry_agent_id: str):
+        """Build an A2A task handler that runs the task on a fresh Agent Service thread."""
+        async def handle(task: A2ATask) -> str:
+            client = await self._get_client()
+            thread: AgentThread = await client.agents.create_thread()
+            await client.agents.create_message(
+                thread_id=thread.id, role=MessageRole.USER, content=task.input_text,
+            )
+            run = await client.agents.create_and_process_run(
+                thread_id=thread.id, agent_id=foundry_agent_id,
+            )
+            if run.status == "failed":
+                raise RuntimeError(f"Agent run failed: {run.last_error}")
+
+            messages = await client.agents.list_messages(thread_id=thread.id)
+            reply = messages.get_last_text_message_by_role(MessageRole.AGENT)
+            return reply.text.value if reply else ""
+
+        return handle
+
     async def get_deployment(self, deployment_id: str) -> Optional[DeployResponse]:
         return self._deployments.get(deployment_id)
 
@@ -199,3 +239,4 @@ class FoundryDeploymentService:
 
 # Singleton
 foundry_deployer = FoundryDeploymentService()
+a2a_engine.set_handler_resolver(foundry_deployer.resolve_a2a_handler)
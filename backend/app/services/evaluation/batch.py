@@ -0,0 +1,366 @@
+"""
+Offline batch evaluation over JSONL datasets.
+
+Each input line is a JSON object with `query`, `response` and optionally
+`context`, `ground_truth` and `id`. Lines are streamed from disk in batches
+of `batch_size`, and the next batch is read while the current one is being
+scored, so the judge calls never wait on a batch boundary.
+
+- LLM-judged evaluators (`JudgeFn`) make one call per row and metric. At
+  most `concurrency` calls are in flight, they are started at no more than
+  `requests_per_second`, and a failed call is retried with exponential
+  backoff. A row whose call still fails gets no score for that metric and
+  its error in the result.
+- Local evaluators (`LocalFn`, see `local.py`) score a whole batch per
+  call, as an array, alongside the judge calls.
+
+Results are appended to the output file one line per row, in input order.
+After each batch is written the run checkpoints the input and output byte
+offsets and running totals next to the output (`<output>.checkpoint`). A
+restarted run resumes from there: the output is truncated to the last
+checkpoint, so every row appears exactly once; a checkpoint ahead of the
+output on disk (the output was replaced or cut short) is ignored and the
+run starts over. All file I/O (reading batches, writes, fsyncs and
+checkpoints) runs in worker threads, off the event loop. Memory use is bounded by two batches however large the
+dataset.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+from openai import AsyncAzureOpenAI
+
+from app.core.config import settings
+from app.core.logging import logger
+
+# (metric, evaluator config, row) -> score in [0, 1]
+JudgeFn = Callable[[str, dict, dict], Awaitable[float]]
+# rows -> one score in [0, 1] per row
+LocalFn = Callable[[list[dict]], Awaitable[np.ndarray]]
+
+_BATCHES_IN_FLIGHT = 2
+
+_CRITERIA = {
+    "azure_ai_groundedness": "Is every claim in the response supported by the context?",
+    "azure_ai_relevance": "Does the response address the query?",
+    "azure_ai_coherence": "Is the response logically organized and consistent?",
+    "azure_ai_fluency": "Is the response grammatical and natural to read?",
+    "azure_ai_similarity": "How close in meaning is the response to the ground truth?",
+}
+_SCALE = re.compile(r"(\d+)\s*-\s*(\d+)")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def scoring_scale(scoring: str) -> tuple[int, int]:
+    """(low, high) of a custom evaluator's "N-M" scoring scale."""
+    match = _SCALE.search(scoring)
+    if match is None or int(match.group(1)) >= int(match.group(2)):
+        raise ValueError(f"Scoring scale must look like '1-5', got '{scoring}'")
+    return int(match.group(1)), int(match.group(2))
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return ""
+
+
+class RateLimiter:
+    """Spaces acquisitions at least 1 / `rate` seconds apart."""
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate
+        self._next = 0.0
+
+    async def acquire(self):
+        now = asyncio.get_running_loop().time()
+        start = max(self._next, now)
+        # Reserved before sleeping, so concurrent callers queue up behind each other
+        self._next = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class AzureOpenAIJudge:
+    """Scores rows with the Azure OpenAI chat deployment, normalized to [0, 1]."""
+
+    def __init__(self):
+        self._client: Optional[AsyncAzureOpenAI] = None
+
+    def _get_client(self) -> AsyncAzureOpenAI:
+        if self._client is None:
+            self._client = AsyncAzureOpenAI(
+                azure_endpoint=settings.azure_openai_endpoint,
+                api_key=settings.azure_openai_api_key,
+                api_version=settings.azure_openai_api_version,
+            )
+        return self._client
+
+    async def __call__(self, metric: str, config: dict, row: dict) -> float:
+        fields = _Fields({k: v if isinstance(v, str) else json.dumps(v) for k, v in row.items()})
+        if config["type"] == "custom":
+            prompt = config["prompt_template"].format_map(fields)
+            low, high = scoring_scale(config.get("scoring", "1-5"))
+        else:
+            low, high = 1, 5
+            prompt = (
+                f"{_CRITERIA.get(config['evaluator'], metric)}\n\n"
+                f"Query:\n{fields['query']}\n\nContext:\n{fields['context']}\n\n"
+                f"Ground truth:\n{fields['ground_truth']}\n\nResponse:\n{fields['response']}"
+            )
+        response = await self._get_client().chat.completions.create(
+            model=config.get("model", settings.azure_openai_deployment),
+            messages=[
+                {"role": "system", "content": f"You grade AI responses. Reply with one integer from {low} to {high}."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.0,
+            max_tokens=5,
+        )
+        match = _NUMBER.search(response.choices[0].message.content or "")
+        if match is None:
+            raise ValueError(f"unparseable {metric} score")
+        return min(1.0, max(0.0, (float(match.group()) - low) / (high - low)))
+
+    async def close(self):
+        if self._client:
+            await self._client.close()
+
+
+class BatchEvaluator:
+    """Runs judged and local evaluators over a JSONL file with checkpointed, incremental output."""
+
+    def __init__(
+        self,
+        judged: dict[str, dict],
+        judge: Optional[JudgeFn] = None,
+        local: Optional[dict[str, LocalFn]] = None,
+        threshold: float = 0.7,
+        batch_size: int = settings.eval_batch_size,
+        concurrency: int = settings.eval_max_concurrency,
+        requests_per_second: float = settings.eval_requests_per_second,
+        max_attempts: int = settings.eval_judge_max_attempts,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+    ):
+        if judged and judge is None:
+            raise ValueError("judged evaluators need a judge")
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+        for config in judged.values():
+            if config["type"] == "custom":
+                scoring_scale(config.get("scoring", "1-5"))
+        self._judged = judged
+        self._judge = judge
+        self._local = local or {}
+        self._metrics = list(self._judged) + [m for m in self._local if m not in self._judged]
+        self._threshold = threshold
+        self._batch_size = batch_size
+        self._slots = asyncio.Semaphore(concurrency)
+        self._limiter = RateLimiter(requests_per_second) if requests_per_second > 0 else None
+        self._max_attempts = max_attempts
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+
+    async def run(self, input_path: str, output_path: str, resume: bool = True) -> dict:
+        """Evaluate every row of `input_path` into `output_path`; returns the summary."""
+        checkpoint_path = f"{output_path}.checkpoint"
+        state = None
+        if resume:
+            state = await asyncio.to_thread(self._load_checkpoint, checkpoint_path, input_path, output_path)
+        if state is None:
+            state = {
+                "input_path": os.path.abspath(input_path),
+                "input_offset": 0,
+                "output_offset": 0,
+                "rows": 0,
+                "errors": 0,
+                "totals": {metric: [0.0, 0, 0] for metric in self._metrics},
+            }
+        elif state["rows"]:
+            logger.info("eval_batch_resumed", input_path=input_path, rows=state["rows"])
+
+        pending: deque = deque()
+        source, sink = await asyncio.to_thread(_open, input_path, output_path, state)
+        with source, sink:
+            index = state["rows"]
+            at_end = False
+            try:
+                while True:
+                    rows: list = []
+                    # Once at the end of the input, only the pending batches are left
+                    if not at_end:
+                        rows, offset = await asyncio.to_thread(_read_rows, source, self._batch_size)
+                        at_end = not rows
+                    if rows:
+                        pending.append((index, rows, offset, asyncio.ensure_future(self._score(rows))))
+                        index += len(rows)
+                    if pending and (len(pending) >= _BATCHES_IN_FLIGHT or not rows):
+                        first, batch, input_offset, task = pending[0]
+                        scored = await task
+                        await asyncio.to_thread(
+                            self._commit, state, sink, checkpoint_path, first, batch, input_offset, scored,
+                        )
+                        pending.popleft()
+                    elif not rows:
+                        break
+            finally:
+                for *_, task in pending:
+                    task.cancel()
+
+        summary = self._summary(state)
+        logger.info("eval_batch_completed", input_path=input_path, rows=state["rows"], errors=state["errors"])
+        return summary
+
+    async def score_row(self, row: dict) -> dict[str, Optional[float]]:
+        """Score a single row with every evaluator; metrics left unscored or failing are None."""
+        scores, errors = await self._score([row])
+        if errors[0]:
+            logger.warning("eval_row_failed", errors=errors[0])
+        return {metric: None if np.isnan(s[0]) else round(float(s[0]), 4) for metric, s in scores.items()}
+
+    async def _score(self, rows: list[Optional[dict]]) -> tuple[dict[str, np.ndarray], list[dict]]:
+        scores = {metric: np.full(len(rows), np.nan) for metric in self._metrics}
+        errors: list[dict] = [{} if row is not None else {"row": "invalid JSON object"} for row in rows]
+        valid = [i for i, row in enumerate(rows) if row is not None]
+        if not valid:
+            return scores, errors
+
+        async def local(metric: str, score: LocalFn):
+            try:
+                values = await score([rows[i] for i in valid])
+            except Exception as e:
+                for i in valid:
+                    errors[i][metric] = str(e) or type(e).__name__
+                return
+            scores[metric][valid] = np.clip(np.asarray(values, dtype=np.float64), 0.0, 1.0)
+
+        async def judge(metric: str, i: int):
+            try:
+                scores[metric][i] = await self._call(metric, rows[i])
+            except Exception as e:
+                errors[i][metric] = str(e) or type(e).__name__
+
+        await asyncio.gather(
+            *(local(metric, score) for metric, score in self._local.items()),
+            *(judge(metric, i) for metric in self._judged for i in valid),
+        )
+        return scores, errors
+
+    async def _call(self, metric: str, row: dict) -> float:
+        for attempt in range(self._max_attempts):
+            if attempt:
+                delay = min(self._backoff_max, self._backoff_base * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+            async with self._slots:
+                if self._limiter is not None:
+                    await self._limiter.acquire()
+                try:
+                    return await self._judge(metric, self._judged[metric], row)
+                except Exception as e:
+                    error = e
+                    logger.warning("eval_judge_failed", metric=metric, attempt=attempt + 1, error=str(e))
+        raise error
+
+    def _commit(self, state: dict, sink, checkpoint_path: str, index: int, rows: list, input_offset: int, scored):
+        scores, errors = scored
+        lines = []
+        for i, row in enumerate(rows):
+            result = {
+                "row": index + i,
+                "id": row.get("id") if row is not None else None,
+                "scores": {m: None if np.isnan(s[i]) else round(float(s[i]), 4) for m, s in scores.items()},
+            }
+            if errors[i]:
+                result["errors"] = errors[i]
+            lines.append(json.dumps(result))
+        sink.write(("\n".join(lines) + "\n").encode())
+        sink.flush()
+        os.fsync(sink.fileno())
+
+        for metric, values in scores.items():
+            scored_rows = values[~np.isnan(values)]
+            totals = state["totals"][metric]
+            totals[0] += float(scored_rows.sum())
+            totals[1] += int(scored_rows.size)
+            totals[2] += int(np.count_nonzero(scored_rows >= self._threshold))
+        state["rows"] = index + len(rows)
+        state["errors"] += sum(1 for e in errors if e)
+        state["input_offset"] = input_offset
+        state["output_offset"] = sink.tell()
+
+        temporary = f"{checkpoint_path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+        os.replace(temporary, checkpoint_path)
+
+    def _load_checkpoint(self, checkpoint_path: str, input_path: str, output_path: str) -> Optional[dict]:
+        try:
+            with open(checkpoint_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        if (
+            state["input_path"] != os.path.abspath(input_path)
+            or set(state["totals"]) != set(self._metrics)
+            or state["input_offset"] > os.path.getsize(input_path)
+            # Truncating a shorter output would pad it with NULs
+            or not os.path.exists(output_path)
+            or state["output_offset"] > os.path.getsize(output_path)
+        ):
+            logger.warning("eval_checkpoint_ignored", checkpoint=checkpoint_path)
+            return None
+        return state
+
+    def _summary(self, state: dict) -> dict:
+        metrics = {}
+        for metric, (total, count, passed) in state["totals"].items():
+            metrics[metric] = {
+                "mean": round(total / count, 4) if count else None,
+                "scored": count,
+                "pass_rate": round(passed / count, 4) if count else None,
+            }
+        return {
+            "rows": state["rows"],
+            "errors": state["errors"],
+            "threshold": self._threshold,
+            "metrics": metrics,
+            "passed": all(m["mean"] is not None and m["mean"] >= self._threshold for m in metrics.values()),
+        }
+
+
+def _open(input_path: str, output_path: str, state: dict):
+    """The input positioned and the output truncated at the checkpoint's offsets."""
+    source = open(input_path, "rb")
+    try:
+        source.seek(state["input_offset"])
+        sink = open(output_path, "ab")
+        sink.truncate(state["output_offset"])
+    except BaseException:
+        source.close()
+        raise
+    return source, sink
+
+
+def _read_rows(source, count: int) -> tuple[list[Optional[dict]], int]:
+    """
+    Up to `count` rows from the next non-blank lines (None for a line that
+    is not a JSON object), and the input offset after them.
+    """
+    rows = []
+    while len(rows) < count:
+        line = source.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        rows.append(row if isinstance(row, dict) else None)
+    return rows, source.tell()
@@ -6,23 +6,40 @@ Provides built-in and custom evaluation metrics:
 - Relevance: Is the response relevant to the user's query?
 - Coherence: Is the response logically coherent?
 - Fluency: Is the response fluent and natural?
+- F1 score: Token overlap of the response with the ground truth, always
+  computed locally (see `local.py`)
+- Similarity: Does the response mean the same as the ground truth? Embedding
+  cosine computed locally unless `EvalConfig.local_metrics` is off, in which
+  case it is LLM-judged
 - Custom: User-defined eval prompts scored by LLM
 
-Runs evaluations per-turn, per-session, or on-demand.
+Runs evaluations per-turn, per-session, or on-demand, and offline over
+JSONL datasets with `run_batch` (see `batch.py`).
 """
+import json
 import uuid
 from typing import Optional
 
 from app.core.config import settings
 from app.core.logging import logger
 from app.models.agent import EvalConfig, EvalMetric
+from app.services.evaluation.batch import AzureOpenAIJudge, BatchEvaluator, JudgeFn
+from app.services.evaluation.local import local_evaluators
+from app.services.memory.embeddings import AzureOpenAIEmbedder, EmbedFn
+from app.services.state.backend import SharedMap, StateBackend, state_backend
 
 
 class EvaluationService:
     """Azure AI Evaluation SDK integration."""
 
-    def __init__(self):
-        self._pipelines: dict[str, dict] = {}
+    def __init__(
+        self, state: Optional[StateBackend] = None, judge: Optional[JudgeFn] = None, embed: Optional[EmbedFn] = None,
+    ):
+        self._judge = judge or AzureOpenAIJudge()
+        self._embed = embed or AzureOpenAIEmbedder()
+        self._pipelines: SharedMap[dict] = SharedMap(
+            state or state_backend, "eval:pipelines", encode=json.dumps, decode=json.loads,
+        )
 
     async def create_pipeline(self, graph_id: str, eval_config: EvalConfig) -> str:
         """
@@ -45,9 +62,18 @@ class EvaluationService:
             EvalMetric.FLUENCY: "azure_ai_fluency",
             EvalMetric.SIMILARITY: "azure_ai_similarity",
         }
+        local_map = {
+            EvalMetric.SIMILARITY: {
+                "type": "local", "evaluator": "embedding_cosine", "model": eval_config.embedding_model,
+            },
+            EvalMetric.F1_SCORE: {"type": "local", "evaluator": "token_f1"},
+        }
 
         for metric in eval_config.metrics:
-            if metric in metric_map:
+            # F1 is deterministic; only similarity can be handed to the judge
+            if metric == EvalMetric.F1_SCORE or (eval_config.local_metrics and metric in local_map):
+                evaluator_config[metric.value] = local_map[metric]
+            elif metric in metric_map:
                 evaluator_config[metric.value] = {
                     "type": "builtin",
                     "evaluator": metric_map[metric],
@@ -63,12 +89,12 @@ class EvaluationService:
                 "model": settings.azure_openai_deployment,
             }
 
-        self._pipelines[pipeline_id] = {
+        await self._pipelines.set(pipeline_id, {
             "graph_id": graph_id,
             "evaluators": evaluator_config,
             "frequency": eval_config.eval_frequency,
             "threshold": eval_config.threshold,
-        }
+        })
 
         logger.info(
             "eval_pipeline_created",
@@ -85,36 +111,60 @@ class EvaluationService:
         query: str,
         response: str,
         context: Optional[str] = None,
-    ) -> dict[str, float]:
+        ground_truth: Optional[str | list[str]] = None,
+    ) -> dict[str, Optional[float]]:
         """
         Run evaluation on a single query-response pair.
 
-        In production, this calls:
-            from azure.ai.evaluation import evaluate
-            result = evaluate(
-                data={"query": query, "response": response, "context": context},
-                evaluators=self._get_evaluators(pipeline_id),
-                azure_ai_project=settings.azure_ai_foundry_project_connection_string,
-            )
+        Judged metrics go to the LLM judge; f1_score and similarity are
+        computed locally against `ground_truth` (a string, or a list of
+        acceptable answers) and are None without one.
 
-        Returns dict of metric_name -> score (0.0 - 1.0)
+        Returns dict of metric_name -> score (0.0 - 1.0), None where unscored
         """
         pipeline = self._pipelines.get(pipeline_id)
         if not pipeline:
             return {}
 
-        # In production: call Azure AI Evaluation SDK
-        # For now, return pipeline config for verification
         logger.info("eval_run", pipeline_id=pipeline_id, query=query[:100])
-
-        return {
-            metric: 0.0  # Placeholder — real scores come from Azure AI Evaluation
-            for metric in pipeline["evaluators"]
-        }
+        row = {"query": query, "response": response, "context": context or ""}
+        if ground_truth is not None:
+            row["ground_truth"] = ground_truth
+        return await self._evaluator(pipeline).score_row(row)
+
+    async def run_batch(
+        self, pipeline_id: str, input_path: str, output_path: str, resume: bool = True,
+    ) -> Optional[dict]:
+        """
+        Evaluate a JSONL dataset with a pipeline's evaluators, one result line
+        per row in `output_path`. An interrupted run picks up from its last
+        checkpoint unless `resume` is false. Returns the summary (per-metric
+        mean and pass rate), or None for an unknown pipeline.
+        """
+        pipeline = self._pipelines.get(pipeline_id)
+        if not pipeline:
+            return None
+        logger.info("eval_batch_started", pipeline_id=pipeline_id, input_path=input_path)
+        return await self._evaluator(pipeline).run(input_path, output_path, resume=resume)
+
+    def _evaluator(self, pipeline: dict) -> BatchEvaluator:
+        evaluators = pipeline["evaluators"]
+        return BatchEvaluator(
+            {metric: config for metric, config in evaluators.items() if config["type"] != "local"},
+            self._judge,
+            local=local_evaluators(evaluators, self._embed),
+            threshold=pipeline["threshold"],
+        )
 
     async def get_pipeline(self, pipeline_id: str) -> Optional[dict]:
         return self._pipelines.get(pipeline_id)
 
+    async def close(self):
+        if isinstance(self._judge, AzureOpenAIJudge):
+            await self._judge.close()
+        if isinstance(self._embed, AzureOpenAIEmbedder):
+            await self._embed.close()
+
 
 # Singleton
 eval_service = EvaluationService()
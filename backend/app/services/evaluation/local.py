@@ -0,0 +1,126 @@
+"""
+Local evaluators for F1 score and similarity.
+
+Both compare a row's `response` with its `ground_truth` — a string, or a
+list of acceptable answers of which the best match counts — and score a
+whole batch per call (`LocalFn`), with no LLM judge call per row. Rows
+without a ground truth are left unscored.
+
+- Token F1: overlap of the normalized tokens (lowercase, punctuation and
+  articles removed, as in SQuAD). Token counts are cached per text in one
+  process-wide LRU, shared by every pipeline and run: reference answers
+  and stock responses repeat across rows.
+- Similarity: the distinct texts of a batch are embedded in one `EmbedFn`
+  call and normalized; the cosine of every (response, reference) pair is
+  one row-wise dot product, and each row keeps its best reference.
+  Negative cosines score 0.
+"""
+import re
+import string
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from app.services.evaluation.batch import LocalFn
+from app.services.memory.embeddings import EmbedFn
+
+_TOKEN_CACHE_SIZE = 1 << 16
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+_ARTICLES = re.compile(r"\b(?:a|an|the)\b")
+
+
+@lru_cache(maxsize=_TOKEN_CACHE_SIZE)
+def normalize_tokens(text: str) -> tuple[str, ...]:
+    return tuple(_ARTICLES.sub(" ", text.lower().translate(_PUNCTUATION)).split())
+
+
+@lru_cache(maxsize=_TOKEN_CACHE_SIZE)
+def _token_counts(text: str) -> tuple[Counter, int]:
+    tokens = normalize_tokens(text)
+    return Counter(tokens), len(tokens)
+
+
+def token_f1(response: str, reference: str) -> float:
+    response_counts, response_total = _token_counts(response)
+    reference_counts, reference_total = _token_counts(reference)
+    if not response_total or not reference_total:
+        return float(response_total == reference_total)
+    common = sum((response_counts & reference_counts).values())
+    if not common:
+        return 0.0
+    precision = common / response_total
+    recall = common / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+
+def _references(row: dict) -> list[str]:
+    truth = row.get("ground_truth")
+    if isinstance(truth, str):
+        return [truth]
+    if isinstance(truth, list):
+        return [t for t in truth if isinstance(t, str)]
+    return []
+
+
+async def token_f1_scores(rows: list[dict]) -> np.ndarray:
+    scores = np.full(len(rows), np.nan)
+    for i, row in enumerate(rows):
+        references = _references(row)
+        if references:
+            response = row.get("response") or ""
+            scores[i] = max(token_f1(response, reference) for reference in references)
+    return scores
+
+
+class EmbeddingSimilarity:
+    """Best cosine similarity between each response and its references."""
+
+    def __init__(self, embed: EmbedFn, model: str):
+        self._embed = embed
+        self._model = model
+
+    async def __call__(self, rows: list[dict]) -> np.ndarray:
+        scores = np.full(len(rows), np.nan)
+        texts: dict[str, int] = {}
+        pairs: list[tuple[int, int, int]] = []  # (row, response text, reference text)
+        for i, row in enumerate(rows):
+            references = [r for r in _references(row) if r.strip()]
+            if not references:
+                continue
+            response = row.get("response") or ""
+            if not response.strip():
+                # Empty inputs cannot be embedded, and match nothing
+                scores[i] = 0.0
+                continue
+            index = texts.setdefault(response, len(texts))
+            pairs.extend((i, index, texts.setdefault(r, len(texts))) for r in references)
+        if not pairs:
+            return scores
+
+        vectors = np.asarray(await self._embed(self._model, list(texts)), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        row_index, response_index, reference_index = np.array(pairs).T
+        cosines = np.einsum("ij,ij->i", vectors[response_index], vectors[reference_index])
+
+        best = np.full(len(rows), -np.inf)
+        np.maximum.at(best, row_index, cosines)
+        scored = np.isfinite(best)
+        scores[scored] = np.clip(best[scored], 0.0, 1.0)
+        return scores
+
+
+def local_evaluators(configs: dict[str, dict], embed: EmbedFn) -> dict[str, LocalFn]:
+    """The `LocalFn` of every evaluator of type "local" in a pipeline's config."""
+    evaluators: dict[str, LocalFn] = {}
+    for metric, config in configs.items():
+        if config["type"] != "local":
+            continue
+        if config["evaluator"] == "token_f1":
+            evaluators[metric] = token_f1_scores
+        elif config["evaluator"] == "embedding_cosine":
+            evaluators[metric] = EmbeddingSimilarity(embed, config["model"])
+        else:
+            raise ValueError(f"Unknown local evaluator '{config['evaluator']}'")
+    return evaluators
@@ -0,0 +1,97 @@
+"""
+Cache of remote guardrail verdicts.
+
+System prompts, templated inputs and repeated tool outputs are checked on
+every turn with the same result. `VerdictCache` keeps verdicts keyed by
+(check, config hash, text hash) — the text itself is never stored — in a
+bounded LRU whose entries expire after `ttl`.
+
+Concurrent checks of the same key share one call (single-flight): the first
+caller starts it, later ones wait for its result. The call is only
+cancelled once every caller waiting on it has been cancelled. Failures are
+not cached.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+VerdictKey = tuple[str, str, bytes]  # (check, config hash, text digest)
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class VerdictCache:
+    """Bounded, TTL'd LRU of verdicts with single-flight misses."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        # key -> (expires_at, verdict)
+        self._entries: OrderedDict[VerdictKey, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[VerdictKey, _Flight] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get(self, key: VerdictKey, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """The cached verdict for `key`, else the result of `compute()` (shared by concurrent callers)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.misses += 1
+            flight = self._inflight[key] = _Flight(asyncio.ensure_future(compute()))
+            flight.task.add_done_callback(lambda task: self._landed(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def _landed(self, key: VerdictKey, flight: _Flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if flight.task.cancelled() or flight.task.exception() is not None:
+            return
+        self._entries[key] = (time.monotonic() + self._ttl, flight.task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,139 @@
+"""
+Multi-pattern substring matcher for guardrail term lists.
+
+`PatternMatcher` compiles terms into an Aho–Corasick automaton (a trie of
+the lowercased terms with failure links), so one pass over the text finds
+every occurrence of every term: O(len(text) + matches) regardless of how
+many terms there are. Matching is case-insensitive and reports spans in
+the original text. Up to `SMALL_TERM_LIST` terms are found with `str.find`
+instead: a few C-level scans beat one pure-Python pass.
+
+`compile_terms` caches matchers by their term tuple, so deployments with the
+same blocklist share one automaton.
+"""
+from collections import deque
+from functools import lru_cache
+from typing import Sequence
+
+SMALL_TERM_LIST = 16
+
+
+class Match:
+    """`terms[term]` occurs at text[start:end]."""
+
+    __slots__ = ("term", "start", "end")
+
+    def __init__(self, term: int, start: int, end: int):
+        self.term = term
+        self.start = start
+        self.end = end
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Match) and (self.term, self.start, self.end) == (other.term, other.start, other.end)
+
+    def __repr__(self) -> str:
+        return f"Match(term={self.term}, start={self.start}, end={self.end})"
+
+
+class PatternMatcher:
+    """Aho–Corasick automaton over case-insensitive terms."""
+
+    def __init__(self, terms: Sequence[str]):
+        self.terms = list(terms)
+        # Node 0 is the root; per node: transitions, failure link, terms ending here
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[int, ...]] = [()]
+        self._lengths: list[int] = []
+        self._lowered: list[str] = []
+        for index, term in enumerate(self.terms):
+            lowered = term.lower()
+            self._lengths.append(len(lowered))
+            self._lowered.append(lowered)
+            if lowered and len(self.terms) > SMALL_TERM_LIST:
+                self._insert(lowered, index)
+        self._link()
+        # Characters of the longest lowercased term
+        self.longest = max(self._lengths, default=0)
+
+    def finditer(self, text: str) -> list[Match]:
+        """Every occurrence of every term, overlapping ones included, ordered by end offset."""
+        if not any(self._lengths):
+            return []
+        lowered = text.lower()
+        spans = self._find(lowered) if len(self.terms) <= SMALL_TERM_LIST else self._scan(lowered)
+        if len(lowered) == len(text):
+            return [Match(term, start, end) for term, start, end in spans]
+        # lower() lengthened a character ("İ" -> "i̇"); map offsets back
+        origin = _origins(text)
+        return [Match(term, origin[start], origin[end - 1] + 1) for term, start, end in spans]
+
+    def search(self, text: str) -> set[int]:
+        """Indices of the terms that occur in `text`."""
+        return {match.term for match in self.finditer(text)}
+
+    def _scan(self, lowered: str) -> list[tuple[int, int, int]]:
+        goto, fail, out, lengths = self._goto, self._fail, self._out, self._lengths
+        spans = []
+        state = 0
+        for position, char in enumerate(lowered):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                end = position + 1
+                spans.extend((term, end - lengths[term], end) for term in out[state])
+        return spans
+
+    def _find(self, lowered: str) -> list[tuple[int, int, int]]:
+        spans = []
+        for index, term in enumerate(self._lowered):
+            if not term:
+                continue
+            start = lowered.find(term)
+            while start != -1:
+                spans.append((index, start, start + len(term)))
+                start = lowered.find(term, start + 1)
+        # Same order as the automaton: by end, longer terms first
+        spans.sort(key=lambda span: (span[2], span[1]))
+        return spans
+
+    def _insert(self, term: str, index: int):
+        state = 0
+        for char in term:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = self._goto[state][char] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += (index,)
+
+    def _link(self):
+        # Breadth-first, so a node's failure target is linked before the node
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] += self._out[self._fail[child]]
+
+
+def _origins(text: str) -> list[int]:
+    """Offset in `text` of each character of `text.lower()`."""
+    origin = []
+    for offset, char in enumerate(text):
+        origin.extend([offset] * len(char.lower()))
+    return origin
+
+
+@lru_cache(maxsize=128)
+def compile_terms(terms: tuple[str, ...]) -> PatternMatcher:
+    """Shared matcher for a term tuple."""
+    return PatternMatcher(terms)
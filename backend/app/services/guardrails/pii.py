@@ -0,0 +1,203 @@
+"""
+Local PII detection and redaction.
+
+Precompiled patterns cover email, IBAN, US SSN, credit card, phone number,
+IPv6 and IPv4 addresses. A text is scanned once, left to right: a
+character-class search jumps to the next character an entity can start
+with (digit, uppercase letter, "+", "(") or must contain ("@", ":"), and
+only there are the category patterns tried, so plain prose is skipped at C
+speed. Candidates are then validated: card numbers by the
+Luhn checksum, IBANs by their mod-97 check digits, SSNs by the reserved
+area/group/serial ranges, IP addresses by parsing them.
+
+Some candidates are too ambiguous to call from their shape alone (bare
+9-digit numbers that could be SSNs, bare 10-digit numbers that could be
+phone numbers). They count as PII unless a `RemoteFn` — e.g. Azure AI
+Language — is configured, in which case only those spans are sent to it
+for a verdict.
+
+Large inputs are scanned in `chunk_size` windows overlapping by more than
+the longest possible match, off the event loop, so a multi-megabyte
+message neither blocks other requests nor loses entities at chunk edges.
+"""
+import asyncio
+import ipaddress
+import re
+from typing import Awaitable, Callable, Iterator, Optional
+
+# Characters scanned per window; inputs larger than this are scanned in a thread
+CHUNK_SIZE = 1 << 20
+
+# Longer than any match the patterns below can produce
+_OVERLAP = 512
+
+# Every entity starts at, or (emails, IPv6) contains, one of these characters.
+# A single character class lets `re` skip ahead in C between candidates.
+_ANCHOR = re.compile(r"[0-9A-Z+(@:]")
+
+_EMAIL_LOCAL = re.compile(r"[A-Za-z0-9._%+-]{1,64}\Z")
+_EMAIL_DOMAIN = re.compile(r"(?:[A-Za-z0-9-]{1,63}\.){1,4}[A-Za-z]{2,24}(?![\w-])")
+_HEX_TAIL = re.compile(r"[0-9A-Fa-f]{0,4}\Z")
+_IPV6 = re.compile(r"(?<![\w:.])(?:[0-9A-Fa-f]{0,4}:){2,7}[0-9A-Fa-f]{0,4}(?![\w:])")
+_IBAN = re.compile(r"(?<![A-Za-z0-9])[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,3})?(?![A-Za-z0-9])")
+_DIGIT_RUN = re.compile(r"\d+")
+
+# Tried in order at a digit, "+" or "(" anchor; the first that matches wins
+_NUMERIC = (
+    ("ssn", re.compile(r"(?<![\d-])(?!000|666|9)\d{3}(-?)(?!00)\d{2}\1(?!0000)\d{4}(?![\d-])")),
+    ("credit_card", re.compile(r"(?<![\d-])(?:\d[ -]?){12,18}\d(?![\d-])")),
+    ("phone", re.compile(r"(?<![\w+])(?:\+\d{1,3}[ .-]?)?(?:\(\d{3}\) ?|\d{3}[ .-]?)\d{3}[ .-]?\d{4}(?!\d)")),
+    ("ip_address", re.compile(
+        r"(?<![\w.])(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?![\w]|\.\d)"
+    )),
+)
+_LOCAL_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._%+-")
+
+
+class PIIEntity:
+    """A PII span in the scanned text."""
+
+    __slots__ = ("category", "start", "end", "text", "ambiguous")
+
+    def __init__(self, category: str, start: int, end: int, text: str, ambiguous: bool = False):
+        self.category = category
+        self.start = start
+        self.end = end
+        self.text = text
+        self.ambiguous = ambiguous
+
+    def to_dict(self) -> dict:
+        return {"category": self.category, "start": self.start, "end": self.end}
+
+
+# (text, ambiguous entities) -> whether each one is PII
+RemoteFn = Callable[[str, list[PIIEntity]], Awaitable[list[bool]]]
+
+
+def luhn_valid(digits: str) -> bool:
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        digit = int(char)
+        if position % 2:
+            digit = digit * 2 - 9 if digit > 4 else digit * 2
+        total += digit
+    return total % 10 == 0
+
+
+def iban_valid(iban: str) -> bool:
+    iban = iban.replace(" ", "")
+    if not 15 <= len(iban) <= 34:
+        return False
+    rearranged = iban[4:] + iban[:4]
+    return int("".join(str(int(char, 36)) for char in rearranged)) % 97 == 1
+
+
+def _classify(category: str, text: str) -> Optional[bool]:
+    """None if the candidate is not PII, else whether it is ambiguous."""
+    if category == "credit_card":
+        digits = text.replace(" ", "").replace("-", "")
+        return False if 13 <= len(digits) <= 19 and luhn_valid(digits) else None
+    if category == "iban":
+        return False if iban_valid(text) else None
+    if category == "ssn":
+        return "-" not in text
+    if category == "phone":
+        return text.isdigit()
+    if category == "ip_address":
+        try:
+            ipaddress.ip_address(text)
+        except ValueError:
+            return None
+    return False
+
+
+class PIIDetector:
+    """Precompiled, chunked PII scanner with an optional remote check for ambiguous spans."""
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, remote: Optional[RemoteFn] = None):
+        self._chunk_size = chunk_size
+        self._remote = remote
+
+    def scan(self, text: str) -> list[PIIEntity]:
+        """Validated entities found locally, in text order; ambiguous ones are marked."""
+        entities: list[PIIEntity] = []
+        for category, start, end in self._candidates(text):
+            ambiguous = _classify(category, text[start:end])
+            if ambiguous is None:
+                continue
+            # An email wins over the numbers in its local part, as the leftmost match
+            while entities and entities[-1].end > start:
+                entities.pop()
+            entities.append(PIIEntity(category, start, end, text[start:end], ambiguous))
+        return entities
+
+    async def detect(self, text: str) -> list[PIIEntity]:
+        """`scan`, off the event loop for large texts, with ambiguous spans settled remotely."""
+        if len(text) > self._chunk_size:
+            entities = await asyncio.to_thread(self.scan, text)
+        else:
+            entities = self.scan(text)
+        ambiguous = [entity for entity in entities if entity.ambiguous]
+        if not ambiguous or self._remote is None:
+            return entities
+        verdicts = dict(zip(map(id, ambiguous), await self._remote(text, ambiguous)))
+        return [entity for entity in entities if verdicts.get(id(entity), True)]
+
+    def _candidates(self, text: str) -> Iterator[tuple[str, int, int]]:
+        """(category, start, end) of pattern matches, window by window."""
+        position, last_end = 0, 0
+        while position < len(text):
+            end = min(len(text), position + self._chunk_size)
+            # endpos (not slicing) keeps lookbehinds working across window starts
+            endpos = min(len(text), end + _OVERLAP)
+            cursor = max(position, last_end)
+            while True:
+                anchor = _ANCHOR.search(text, cursor, endpos)
+                if anchor is None or anchor.start() >= end:
+                    break
+                at = anchor.start()
+                found = _match_at(text, at, endpos)
+                if found is not None and found[2] > at and (found[1] >= last_end or found[0] == "email"):
+                    last_end = found[2]
+                    cursor = found[2]
+                    yield found
+                elif text[at].isdigit():
+                    # Numbers never start inside a run of digits
+                    cursor = _DIGIT_RUN.match(text, at, endpos).end()
+                else:
+                    cursor = at + 1
+            position = end
+
+
+def _match_at(text: str, at: int, endpos: int) -> Optional[tuple[str, int, int]]:
+    char = text[at]
+    if char == "@":
+        local = _EMAIL_LOCAL.search(text, max(0, at - 64), at)
+        if local is None or (local.start() and text[local.start() - 1] in _LOCAL_CHARS):
+            return None
+        domain = _EMAIL_DOMAIN.match(text, at + 1, endpos)
+        return ("email", local.start(), domain.end()) if domain else None
+    if char == ":":
+        start = _HEX_TAIL.search(text, max(0, at - 4), at).start()
+        match = _IPV6.match(text, start, endpos)
+        return ("ip_address", start, match.end()) if match else None
+    if "A" <= char <= "Z":
+        match = _IBAN.match(text, at, endpos)
+        return ("iban", at, match.end()) if match else None
+    for category, pattern in _NUMERIC:
+        match = pattern.match(text, at, endpos)
+        if match:
+            return category, at, match.end()
+    return None
+
+
+def redact(text: str, entities: list[PIIEntity]) -> str:
+    """Replace each entity span with its category in brackets, e.g. "[EMAIL]"."""
+    parts = []
+    position = 0
+    for entity in entities:
+        parts.append(text[position:entity.start])
+        parts.append(f"[{entity.category.upper()}]")
+        position = entity.end
+    parts.append(text[position:])
+    return "".join(parts)
@@ -0,0 +1,101 @@
+"""
+Compiled guardrail policies per deployed agent.
+
+Deploy registers every graph: each agent's policy is the graph's
+`global_guardrails` merged with the agent's own `AgentNode.guardrails`,
+compiled once (config hash, term matcher) so checks only do a dict
+lookup. Agents without their own guardrails share the graph's policy.
+
+Merging never loosens the global config: a check enabled on either side is
+on, blocklists and blocked topics are combined, allowed topics narrow, and
+the smaller output token limit applies.
+"""
+import hashlib
+from typing import Optional
+
+from app.models.agent import AgentGraph, GuardrailConfig
+from app.services.guardrails.matcher import Match, compile_terms
+
+PolicyKey = tuple[str, str]  # (graph_id, agent_id)
+
+JAILBREAK_INDICATORS = (
+    "ignore previous instructions",
+    "you are now",
+    "disregard your rules",
+    "pretend you",
+)
+
+
+def merge_configs(base: GuardrailConfig, agent: Optional[GuardrailConfig]) -> GuardrailConfig:
+    """`base` tightened by an agent's own guardrails."""
+    if agent is None:
+        return base
+    if base.allowed_topics and agent.allowed_topics:
+        allowed = [t for t in base.allowed_topics if t in agent.allowed_topics]
+    else:
+        allowed = base.allowed_topics or agent.allowed_topics
+    return GuardrailConfig(
+        content_safety=base.content_safety or agent.content_safety,
+        pii_detection=base.pii_detection or agent.pii_detection,
+        jailbreak_protection=base.jailbreak_protection or agent.jailbreak_protection,
+        custom_blocklist=list(dict.fromkeys(base.custom_blocklist + agent.custom_blocklist)),
+        max_output_tokens=min(base.max_output_tokens, agent.max_output_tokens),
+        allowed_topics=allowed,
+        blocked_topics=list(dict.fromkeys(base.blocked_topics + agent.blocked_topics)),
+    )
+
+
+class GuardrailPolicy:
+    """A guardrail config with its jailbreak + blocklist matcher compiled."""
+
+    __slots__ = ("config", "config_hash", "matcher", "jailbreak_terms")
+
+    def __init__(self, config: GuardrailConfig):
+        self.config = config
+        self.config_hash = hashlib.blake2b(config.model_dump_json().encode(), digest_size=8).hexdigest()
+        jailbreak = JAILBREAK_INDICATORS if config.jailbreak_protection else ()
+        self.jailbreak_terms = len(jailbreak)
+        self.matcher = compile_terms(jailbreak + tuple(config.custom_blocklist))
+
+    def is_jailbreak(self, match: Match) -> bool:
+        return match.term < self.jailbreak_terms
+
+    def blocklist_flags(self, matches: list[Match]) -> list[str]:
+        found = {m.term - self.jailbreak_terms for m in matches}
+        return [f"blocklist:{term}" for index, term in enumerate(self.config.custom_blocklist) if index in found]
+
+    def describe(self, match: Match) -> dict:
+        return {
+            "kind": "jailbreak" if self.is_jailbreak(match) else "blocklist",
+            "term": self.matcher.terms[match.term],
+            "start": match.start,
+            "end": match.end,
+        }
+
+
+class PolicyRegistry:
+    """Compiled policies by (graph_id, agent_id), with the graph's policy as fallback."""
+
+    def __init__(self):
+        self._policies: dict[tuple[str, Optional[str]], GuardrailPolicy] = {}
+
+    def register_graph(self, graph: AgentGraph) -> list[GuardrailPolicy]:
+        """Compile (or recompile, on redeploy) the policies of a graph's agents."""
+        self.remove_graph(graph.id)
+        graph_policy = self._policies[(graph.id, None)] = GuardrailPolicy(graph.global_guardrails)
+        for agent in graph.agents:
+            self._policies[(graph.id, agent.id)] = (
+                GuardrailPolicy(merge_configs(graph.global_guardrails, agent.guardrails))
+                if agent.guardrails else graph_policy
+            )
+        return list({id(p): p for k, p in self._policies.items() if k[0] == graph.id}.values())
+
+    def get(self, key: PolicyKey) -> Optional[GuardrailPolicy]:
+        policy = self._policies.get(key)
+        if policy is None:
+            policy = self._policies.get((key[0], None))
+        return policy
+
+    def remove_graph(self, graph_id: str):
+        for key in [k for k in self._policies if k[0] == graph_id]:
+            del self._policies[key]
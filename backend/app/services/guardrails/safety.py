@@ -3,115 +3,287 @@ Content Safety & Guardrails Service.
 
 Integrates Azure AI Content Safety for:
 - Text content classification (hate, violence, self-harm, sexual)
-- PII detection and redaction
+- PII detection and redaction (local, see `pii.py`)
 - Jailbreak attack detection
 - Custom blocklist enforcement
 - Topic restrictions
 
 Every agent interaction passes through guardrails before and after LLM calls.
+
+Deploy registers each graph's compiled per-agent policies (see `policy.py`);
+checks name theirs with a (graph_id, agent_id) key. Unknown agents get
+their graph's global policy; checks without a key, or for a graph that was
+never deployed, get the default policy (every check on) rather than some
+other graph's, which may be looser. Jailbreak indicators
+and the custom blocklist are compiled into one `PatternMatcher` per policy,
+so each text is scanned once however many terms there are; match spans are
+returned with the result.
+
+The checks of `check_input` are independent (in production each is a call
+to an Azure service), so they run concurrently: latency is the slowest
+check rather than their sum, and once one returns a blocking verdict the
+others are cancelled. Flags are still merged in the fixed check order.
+
+Content Safety accepts at most `CONTENT_SAFETY_MAX_CHARS` per request, so
+longer texts are split into chunks overlapping by `CONTENT_SAFETY_CHUNK_OVERLAP`
+characters and analyzed concurrently over the one client, at most
+`CONTENT_SAFETY_MAX_CONCURRENCY` requests in flight per process. The verdict
+takes each category's highest severity over all chunks.
+
+Content classification and jailbreak verdicts are cached per (config,
+text) in a `VerdictCache`, so repeated texts cost no further calls.
+
+Streamed responses go through `stream_output`, which applies the local
+checks chunk by chunk (see `streaming.py`).
 """
-from typing import Optional
+import asyncio
+import time
+from typing import Awaitable, Optional
+
+from azure.ai.contentsafety.aio import ContentSafetyClient
+from azure.ai.contentsafety.models import AnalyzeTextOptions
+from azure.core.credentials import AzureKeyCredential
+from azure.identity.aio import DefaultAzureCredential
 
 from app.core.config import settings
 from app.core.logging import logger
-from app.models.agent import GuardrailConfig
+from app.models.agent import AgentGraph, GuardrailConfig
+from app.services.guardrails.cache import VerdictCache, text_digest
+from app.services.guardrails.matcher import Match
+from app.services.guardrails.pii import PIIDetector, redact
+from app.services.guardrails.policy import GuardrailPolicy, PolicyKey, PolicyRegistry
+from app.services.guardrails.streaming import StreamGuard
 
 
 class SafetyService:
     """Azure Content Safety integration for agent guardrails."""
 
     def __init__(self):
-        self._config: Optional[GuardrailConfig] = None
+        # Checks without a registered policy key; deploys never change it
+        self._default = GuardrailPolicy(GuardrailConfig())
+        self._policies = PolicyRegistry()
         self._client = None
+        # In production, remote= settles ambiguous spans with Azure AI Language PII detection
+        self._pii = PIIDetector()
+        self._analyze_slots = asyncio.Semaphore(settings.content_safety_max_concurrency)
+        self._verdicts = VerdictCache(settings.guardrail_cache_max_entries, settings.guardrail_cache_ttl_seconds)
 
     async def configure(self, config: GuardrailConfig):
-        """Configure guardrails for a deployment."""
-        self._config = config
-
-        if config.content_safety and settings.azure_content_safety_endpoint:
-            # In production:
-            # from azure.ai.contentsafety.aio import ContentSafetyClient
-            # from azure.core.credentials import AzureKeyCredential
-            # self._client = ContentSafetyClient(
-            #     endpoint=settings.azure_content_safety_endpoint,
-            #     credential=AzureKeyCredential(settings.azure_content_safety_key),
-            # )
-            logger.info("content_safety_configured")
-        else:
+        """Set the default policy, used by checks whose key names no deployed graph."""
+        self._default = GuardrailPolicy(config)
+        self._ensure_client([self._default])
+
+    async def register_graph(self, graph: AgentGraph):
+        """Compile the policy of every agent in a deployed graph."""
+        policies = self._policies.register_graph(graph)
+        self._ensure_client(policies)
+        logger.info("guardrail_policies_compiled", graph_id=graph.id, policies=len(policies))
+
+    def _ensure_client(self, policies: list[GuardrailPolicy]):
+        if not any(p.config.content_safety for p in policies) or not settings.azure_content_safety_endpoint:
             logger.info("content_safety_skipped", reason="not configured or disabled")
+            return
+        if self._client is None:
+            key = settings.azure_content_safety_key
+            self._client = ContentSafetyClient(
+                endpoint=settings.azure_content_safety_endpoint,
+                credential=AzureKeyCredential(key) if key else DefaultAzureCredential(),
+            )
+            logger.info("content_safety_configured")
 
-    async def check_input(self, text: str) -> dict:
-        """
-        Check user input before it reaches an agent.
+    def policy(self, key: Optional[PolicyKey] = None) -> GuardrailPolicy:
+        """Compiled policy of (graph_id, agent_id), its graph's for other agents, else the default."""
+        if key is None:
+            return self._default
+        policy = self._policies.get(key)
+        return policy if policy is not None else self._default
 
-        Returns: {"safe": bool, "flags": [...], "redacted_text": str}
+    async def check_input(self, text: str, policy: Optional[PolicyKey] = None) -> dict:
         """
-        result = {"safe": True, "flags": [], "redacted_text": text}
+        Check user input before it reaches an agent, under the policy of
+        `policy` = (graph_id, agent_id).
 
-        if not self._config:
-            return result
+        Returns: {"safe": bool, "flags": [...], "redacted_text": str, "matches": [...],
+        "pii": [...], "timings_ms": {check: ms}} where each match is
+        {"kind": "jailbreak" | "blocklist", "term", "start", "end"} and each
+        PII entity {"category", "start", "end"}. Checks cancelled after
+        another blocked the text have no timing.
+        """
+        result = {"safe": True, "flags": [], "redacted_text": text, "matches": [], "pii": [], "timings_ms": {}}
 
-        # Jailbreak detection
-        if self._config.jailbreak_protection:
-            if await self._detect_jailbreak(text):
-                result["safe"] = False
-                result["flags"].append("jailbreak_detected")
-
-        # PII detection
-        if self._config.pii_detection:
-            pii_result = await self._detect_pii(text)
-            if pii_result["found"]:
-                result["redacted_text"] = pii_result["redacted"]
-                result["flags"].append("pii_detected")
-
-        # Content safety classification
-        if self._config.content_safety and self._client:
-            safety_result = await self._classify_content(text)
-            if not safety_result["safe"]:
-                result["safe"] = False
-                result["flags"].extend(safety_result["categories"])
+        compiled = self.policy(policy)
+        config = compiled.config
 
-        # Custom blocklist
-        if self._config.custom_blocklist:
-            for term in self._config.custom_blocklist:
-                if term.lower() in text.lower():
-                    result["safe"] = False
-                    result["flags"].append(f"blocklist:{term}")
+        # One pass over the text for jailbreak indicators and blocklist terms
+        matches = compiled.matcher.finditer(text)
+        result["matches"] = [compiled.describe(m) for m in matches]
 
-        # Topic restrictions
-        if self._config.blocked_topics:
-            # In production: use LLM to classify topic
-            pass
+        checks: dict[str, Awaitable[dict]] = {}
+        if config.jailbreak_protection:
+            checks["jailbreak"] = self._check_jailbreak(text, matches, compiled)
+        if config.pii_detection:
+            checks["pii"] = self._check_pii(text)
+        if config.content_safety and self._client:
+            checks["content_safety"] = self._check_content(text, compiled)
+        if config.custom_blocklist:
+            checks["blocklist"] = self._check_blocklist(matches, compiled)
+        # Topic restrictions: in production, an LLM topic classifier joins the checks
 
+        verdicts, timings = await _run_checks(checks)
+        result["timings_ms"] = {name: timings[name] for name in checks if name in timings}
+        for name in checks:
+            verdict = verdicts.get(name)
+            if verdict is None:
+                continue
+            if verdict["block"]:
+                result["safe"] = False
+            result["flags"].extend(verdict["flags"])
+            if "redacted_text" in verdict:
+                result["redacted_text"] = verdict["redacted_text"]
+                result["pii"] = verdict["entities"]
         return result
 
-    async def check_output(self, text: str) -> dict:
+    async def check_output(self, text: str, policy: Optional[PolicyKey] = None) -> dict:
         """Check agent output before it reaches the user."""
-        return await self.check_input(text)  # Same checks apply
+        return await self.check_input(text, policy)  # Same checks apply
+
+    def stream_output(self, policy: Optional[PolicyKey] = None) -> StreamGuard:
+        """
+        Guard for one streamed agent response: feed it token chunks and send
+        what it releases. Blocklist and jailbreak terms stop the stream, PII
+        is redacted in flight.
+        """
+        compiled = self.policy(policy)
+        return StreamGuard(
+            compiled.matcher, compiled.jailbreak_terms, self._pii if compiled.config.pii_detection else None,
+        )
+
+    def metrics(self) -> dict:
+        return {"verdict_cache": self._verdicts.metrics()}
+
+    async def _check_jailbreak(self, text: str, matches: list[Match], policy: GuardrailPolicy) -> dict:
+        detected = await self._verdicts.get(
+            ("jailbreak", policy.config_hash, text_digest(text)),
+            lambda: self._detect_jailbreak(text, matches, policy),
+        )
+        return {"block": detected, "flags": ["jailbreak_detected"] if detected else []}
+
+    async def _check_pii(self, text: str) -> dict:
+        pii_result = await self._detect_pii(text)
+        if not pii_result["found"]:
+            return {"block": False, "flags": []}
+        return {
+            "block": False, "flags": ["pii_detected"],
+            "redacted_text": pii_result["redacted"], "entities": pii_result["entities"],
+        }
+
+    async def _check_content(self, text: str, policy: GuardrailPolicy) -> dict:
+        safety_result = await self._verdicts.get(
+            ("content_safety", policy.config_hash, text_digest(text)), lambda: self._classify_content(text),
+        )
+        return {"block": not safety_result["safe"], "flags": list(safety_result["categories"])}
 
-    async def _detect_jailbreak(self, text: str) -> bool:
+    async def _check_blocklist(self, matches: list[Match], policy: GuardrailPolicy) -> dict:
+        flags = policy.blocklist_flags(matches)
+        return {"block": bool(flags), "flags": flags}
+
+    async def _detect_jailbreak(self, text: str, matches: list[Match], policy: GuardrailPolicy) -> bool:
         """Detect jailbreak attempts using Azure Content Safety."""
         # In production: use Content Safety Jailbreak API
-        jailbreak_indicators = [
-            "ignore previous instructions",
-            "you are now",
-            "disregard your rules",
-            "pretend you",
-        ]
-        text_lower = text.lower()
-        return any(indicator in text_lower for indicator in jailbreak_indicators)
+        return any(policy.is_jailbreak(m) for m in matches)
 
     async def _detect_pii(self, text: str) -> dict:
         """Detect and redact PII."""
-        # In production: use Azure AI Language PII detection
-        return {"found": False, "redacted": text}
+        entities = await self._pii.detect(text)
+        return {
+            "found": bool(entities),
+            "redacted": redact(text, entities) if entities else text,
+            "entities": [entity.to_dict() for entity in entities],
+        }
 
     async def _classify_content(self, text: str) -> dict:
-        """Classify content using Azure Content Safety."""
-        # In production:
-        # from azure.ai.contentsafety.models import AnalyzeTextOptions
-        # response = await self._client.analyze_text(AnalyzeTextOptions(text=text))
-        return {"safe": True, "categories": []}
+        """
+        Classify content using Azure Content Safety, in concurrent chunks if
+        it is too long for one request. Returns {"safe", "categories" (those
+        at or above the block severity), "severity": {category: max}}.
+        """
+        chunks = chunk_text(text, settings.content_safety_max_chars, settings.content_safety_chunk_overlap)
+        results = await asyncio.gather(*(self._analyze_chunk(chunk) for chunk in chunks))
+
+        severity: dict[str, int] = {}
+        for result in results:
+            for category, level in result.items():
+                severity[category] = max(level, severity.get(category, 0))
+        categories = [c for c, level in severity.items() if level >= settings.content_safety_block_severity]
+        return {"safe": not categories, "categories": categories, "severity": severity}
+
+    async def _analyze_chunk(self, text: str) -> dict[str, int]:
+        async with self._analyze_slots:
+            return await self._analyze(text)
+
+    async def _analyze(self, text: str) -> dict[str, int]:
+        """Severity per category for one request-sized text; none without a client."""
+        if self._client is None:
+            return {}
+        response = await self._client.analyze_text(AnalyzeTextOptions(text=text))
+        return {c.category: c.severity or 0 for c in response.categories_analysis}
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+def chunk_text(text: str, size: int, overlap: int) -> list[str]:
+    """
+    Split `text` into chunks of at most `size` characters, each starting
+    `overlap` characters before the previous one ended. Chunks end at
+    whitespace where there is some in their last `overlap` characters.
+    """
+    if not 0 <= overlap < size:
+        raise ValueError(f"Chunk overlap must be at least 0 and less than the chunk size ({size}), got {overlap}")
+    if len(text) <= size:
+        return [text]
+    chunks = []
+    start = 0
+    while True:
+        end = start + size
+        if end >= len(text):
+            chunks.append(text[start:])
+            return chunks
+        space = max(text.rfind(" ", end - overlap, end), text.rfind("\n", end - overlap, end))
+        if space > start + overlap:
+            end = space + 1
+        chunks.append(text[start:end])
+        start = end - overlap
+
+
+async def _run_checks(checks: dict[str, Awaitable[dict]]) -> tuple[dict[str, dict], dict[str, float]]:
+    """
+    Run checks concurrently until all finish or one blocks; returns the
+    verdicts and timings of the checks that finished.
+    """
+    async def timed(check: Awaitable[dict]) -> tuple[dict, float]:
+        start = time.perf_counter()
+        verdict = await check
+        return verdict, round((time.perf_counter() - start) * 1000, 3)
+
+    tasks = {asyncio.ensure_future(timed(check)): name for name, check in checks.items()}
+    verdicts: dict[str, dict] = {}
+    timings: dict[str, float] = {}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                verdicts[tasks[task]], timings[tasks[task]] = task.result()
+            if any(verdict["block"] for verdict in verdicts.values()):
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return verdicts, timings
 
 
 # Singleton
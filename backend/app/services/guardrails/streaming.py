@@ -0,0 +1,124 @@
+"""
+Incremental guardrails for streamed agent output.
+
+`StreamGuard` sits between a model's token stream and the client. Each
+chunk is appended to a buffer that is scanned with the same matcher and
+PII detector as `check_output`, and everything except the last `hold`
+characters is released at once. `hold` is one less than the longest
+blocked term (a term can only complete inside the held-back tail) or
+`PII_WINDOW` when PII detection is on, so time to first token stays close
+to the model's own.
+
+- A jailbreak indicator or blocklist term stops the stream: the text
+  before it is released, nothing after.
+- PII is redacted in flight. An entity reaching into the held-back tail is
+  held until it is complete, then released as "[CATEGORY]".
+
+Ambiguous PII spans count as PII: there is no remote round trip per chunk.
+"""
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from app.services.guardrails.matcher import PatternMatcher
+from app.services.guardrails.pii import PIIDetector
+
+# Held-back characters for PII; longer entities (very long emails) may be split
+PII_WINDOW = 128
+
+# Released characters kept as context for patterns with lookbehinds
+_CONTEXT = 64
+
+
+class StreamGuard:
+    """Checks a text stream chunk by chunk, releasing what is known to be safe."""
+
+    def __init__(
+        self, matcher: Optional[PatternMatcher] = None, jailbreak_terms: int = 0,
+        pii: Optional[PIIDetector] = None,
+    ):
+        self._matcher = matcher
+        self._jailbreak_terms = jailbreak_terms
+        self._pii = pii
+        longest = matcher.longest if matcher is not None else 0
+        self._hold = max(longest - 1, PII_WINDOW if pii is not None else 0, 0)
+        self._buffer = ""
+        self._context = ""
+        # Stream offset of the buffer's first character
+        self._offset = 0
+
+        self.stopped = False
+        self.flags: list[str] = []
+        self.pii: list[dict] = []
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk; returns the text that can be sent now (possibly empty)."""
+        if self.stopped:
+            return ""
+        self._buffer += chunk
+        return self._release(final=False)
+
+    def finish(self) -> str:
+        """End of stream: returns the rest of the checked text."""
+        if self.stopped:
+            return ""
+        return self._release(final=True)
+
+    async def filter(self, chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+        """Guard an async stream of chunks, yielding non-empty safe text."""
+        async for chunk in chunks:
+            text = self.feed(chunk)
+            if text:
+                yield text
+            if self.stopped:
+                return
+        text = self.finish()
+        if text:
+            yield text
+
+    def _release(self, final: bool) -> str:
+        text = self._context + self._buffer
+        base = len(self._context)
+        cut = len(text) if final else max(base, len(text) - self._hold)
+
+        if self._matcher is not None:
+            blocked = [m for m in self._matcher.finditer(text) if m.end > base]
+            if blocked:
+                # Nothing after the violation will be sent, so everything before it is final
+                cut = max(base, min(m.start for m in blocked))
+                self._stop(blocked)
+
+        parts = []
+        position = base
+        if self._pii is not None:
+            for entity in self._pii.scan(text):
+                if entity.end <= base:
+                    continue
+                if entity.end > cut or entity.start < base:
+                    # Still growing, or cut by a violation: release nothing of it
+                    if entity.start >= base:
+                        cut = min(cut, entity.start)
+                    continue
+                parts.append(text[position:entity.start])
+                parts.append(f"[{entity.category.upper()}]")
+                position = entity.end
+                self.pii.append({
+                    "category": entity.category,
+                    "start": self._offset + entity.start - base,
+                    "end": self._offset + entity.end - base,
+                })
+                if "pii_detected" not in self.flags:
+                    self.flags.append("pii_detected")
+        parts.append(text[position:max(position, cut)])
+
+        released = cut - base
+        self._context = text[max(0, cut - _CONTEXT):cut]
+        self._buffer = text[cut:]
+        self._offset += released
+        return "".join(parts)
+
+    def _stop(self, matches):
+        self.stopped = True
+        terms = {m.term for m in matches}
+        if any(term < self._jailbreak_terms for term in terms):
+            self.flags.append("jailbreak_detected")
+        for term in sorted(t for t in terms if t >= self._jailbreak_terms):
+            self.flags.append(f"blocklist:{self._matcher.terms[term]}")
@@ -6,26 +6,48 @@ Each agent can have one or more MCP servers exposing tools that
 other agents (or external MCP clients) can discover and invoke.
 
 Supports transports: stdio, SSE, and Streamable HTTP.
+
+Server configs are mirrored to the shared state backend; every worker
+builds its own `Server` instance from them.
 """
 import importlib
-from typing import Any, Callable
+from typing import Any, Callable, Optional
 
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
 from app.core.logging import logger
 from app.models.agent import MCPServerConfig, MCPTool
+from app.services.state.backend import SharedMap, StateBackend, state_backend
 
 
 class MCPServerManager:
     """Manages MCP server instances for deployed agents."""
 
-    def __init__(self):
+    def __init__(self, state: Optional[StateBackend] = None):
         self._servers: dict[str, Server] = {}
         self._tool_handlers: dict[str, Callable] = {}
+        self._configs: SharedMap[MCPServerConfig] = SharedMap(
+            state or state_backend, "mcp:servers",
+            encode=lambda config: config.model_dump_json(),
+            decode=MCPServerConfig.model_validate_json,
+            on_change=self._on_config_change,
+        )
 
     async def create_server(self, config: MCPServerConfig) -> Server:
         """Create an MCP server from config, registering all tools."""
+        server = self._build_server(config)
+        await self._configs.set(config.name, config)
+        return server
+
+    def _on_config_change(self, name: str, config: Optional[MCPServerConfig]):
+        # Registered through another worker: build a local instance
+        if config is None:
+            self._servers.pop(name, None)
+        else:
+            self._build_server(config)
+
+    def _build_server(self, config: MCPServerConfig) -> Server:
         server = Server(config.name)
 
         # Register tool list handler
@@ -78,10 +100,10 @@ class MCPServerManager:
         return self._servers.get(name)
 
     async def list_servers(self) -> list[str]:
-        return list(self._servers.keys())
+        return list(self._configs.keys())
 
     async def shutdown(self):
-        """Gracefully shut down all MCP servers."""
+        """Gracefully shut down this worker's MCP servers; shared configs are kept."""
         for name, server in self._servers.items():
             logger.info("mcp_server_shutdown", name=name)
         self._servers.clear()
@@ -0,0 +1,356 @@
+"""
+Pluggable memory providers.
+
+`MemoryConfig.provider` selects where an agent's memory lives:
+- cosmos_db   CosmosMemoryService (durable, semantic search)
+- in_memory   InMemoryMemoryBackend, a per-agent ring buffer in this process
+- redis       RedisMemoryBackend, capped lists on any Redis-protocol server
+
+All providers store the same entry shape — id, agent_id, session_id, type,
+content, created_at — and return entries newest first. Ids are monotonic ULIDs, so
+id order is time order: "newest N" and "older than X" reads compare ids.
+Cosmos containers can also hold entries written before ULIDs (ids like
+"<agent>-<timestamp>", which sort above every ULID), so Cosmos orders by
+`created_at` instead; it is strictly increasing within a process too.
+`pages` walks a long history with continuation tokens (the last id seen;
+Cosmos adds its `created_at`).
+
+`query(..., max_tokens=N)` returns a session's context window. Cosmos
+writes rolling summaries and includes the latest (see `cosmos.py`); the
+other providers keep no summaries, so theirs is the newest conversation
+turns that fit in the budget.
+"""
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.models.agent import MemoryConfig, MemoryType
+from app.services.memory.summarizer import estimate_tokens
+
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+class _ULIDGenerator:
+    """
+    26-character ULIDs: 48-bit millisecond timestamp + 80 random bits in
+    Crockford base32. Within one millisecond (or if the clock steps back)
+    the random part is incremented, so ids from a process strictly increase.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_random = 0
+
+    def __call__(self) -> str:
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms <= self._last_ms:
+                ms = self._last_ms
+                self._last_random += 1
+            else:
+                self._last_ms = ms
+                self._last_random = int.from_bytes(os.urandom(10), "big")
+            value = (ms << 80) | self._last_random
+        chars = []
+        for _ in range(26):
+            chars.append(_CROCKFORD[value & 31])
+            value >>= 5
+        return "".join(reversed(chars))
+
+
+new_id = _ULIDGenerator()
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class _Clock:
+    """UTC timestamps with microsecond precision that strictly increase within a process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_us = 0
+
+    def __call__(self) -> str:
+        with self._lock:
+            us = max(time.time_ns() // 1000, self._last_us + 1)
+            self._last_us = us
+        return (_EPOCH + timedelta(microseconds=us)).isoformat(timespec="microseconds")
+
+
+created_now = _Clock()
+
+# Session of entries stored without one
+DEFAULT_SESSION = "default"
+
+
+def new_entry(agent_id: str, memory_type: str, content: dict, session_id: Optional[str] = None) -> dict:
+    return {
+        "id": new_id(),
+        "agent_id": agent_id,
+        "session_id": session_id or DEFAULT_SESSION,
+        "type": memory_type,
+        "content": content,
+        "created_at": created_now(),
+    }
+
+
+class MemoryPage:
+    """One page of entries; pass `continuation` back to get the next, None at the end."""
+
+    __slots__ = ("items", "continuation")
+
+    def __init__(self, items: list[dict], continuation: Optional[str]):
+        self.items = items
+        self.continuation = continuation
+
+
+class MemoryBackend(ABC):
+    """Where an agent's memory entries are stored."""
+
+    def configure(self, graph_id: str, agent_id: str, config: MemoryConfig):
+        """Apply an agent's memory options; called on deploy."""
+
+    async def ensure_container(self, graph_id: str):
+        """Provision storage for a graph, if the provider needs any."""
+
+    @abstractmethod
+    async def store(
+        self, graph_id: str, agent_id: str, memory_type: str, content: dict,
+        session_id: Optional[str] = None,
+    ): ...
+
+    @abstractmethod
+    async def query(
+        self, graph_id: str, agent_id: str,
+        memory_type: Optional[str] = None, limit: int = 50,
+        before: Optional[str] = None, session_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> list[dict]:
+        """
+        Newest `limit` entries, only those older than the entry with id
+        `before` and in `session_id` if given. With `max_tokens`, the
+        session's context window instead (see `_context_window`).
+        """
+
+    async def pages(
+        self, graph_id: str, agent_id: str,
+        memory_type: Optional[str] = None, page_size: int = 100,
+        continuation: Optional[str] = None, session_id: Optional[str] = None,
+    ) -> AsyncIterator[MemoryPage]:
+        """Page through an agent's history newest first, resuming after `continuation`."""
+        while True:
+            items = await self.query(
+                graph_id, agent_id, memory_type, page_size, before=continuation, session_id=session_id,
+            )
+            continuation = self._continuation(items[-1]) if len(items) == page_size else None
+            yield MemoryPage(items, continuation)
+            if continuation is None:
+                return
+
+    def _continuation(self, entry: dict) -> str:
+        """Token that resumes a read after `entry`, passed back as `before`."""
+        return entry["id"]
+
+    async def _context_window(
+        self, graph_id: str, agent_id: str, session_id: str, limit: int, max_tokens: int,
+    ) -> list[dict]:
+        """Up to `limit` of the session's newest conversation turns, within `max_tokens` estimated tokens."""
+        window = []
+        for turn in await self.query(graph_id, agent_id, MemoryType.CONVERSATION, limit, session_id=session_id):
+            tokens = estimate_tokens(turn)
+            if tokens > max_tokens:
+                break
+            max_tokens -= tokens
+            window.append(turn)
+        return window
+
+    async def search(self, graph_id: str, agent_id: str, text: str, k: int = 5) -> list[dict]:
+        """Semantic search; providers without it return nothing."""
+        return []
+
+    async def close(self):
+        pass
+
+
+class _Ring:
+    """Bounded, time-ordered entries of one agent."""
+
+    __slots__ = ("entries", "ttl")
+
+    def __init__(self, max_entries: int, ttl: Optional[float]):
+        # (expires_at, entry); appends evict the oldest entry once full
+        self.entries: deque[tuple[float, dict]] = deque(maxlen=max_entries)
+        self.ttl = ttl
+
+    def expire(self, now: float):
+        # Entries share one TTL, so the oldest expire first
+        while self.entries and self.entries[0][0] <= now:
+            self.entries.popleft()
+
+
+class InMemoryMemoryBackend(MemoryBackend):
+    """
+    Process-local ring buffer per (graph, agent). Appends, `max_entries`
+    eviction and `ttl_hours` expiry are O(1) per entry; nothing survives a
+    restart or is shared between workers.
+    """
+
+    def __init__(self):
+        self._configs: dict[tuple[str, str], MemoryConfig] = {}
+        self._rings: dict[tuple[str, str], _Ring] = {}
+
+    def configure(self, graph_id: str, agent_id: str, config: MemoryConfig):
+        self._configs[(graph_id, agent_id)] = config
+        self._rings.pop((graph_id, agent_id), None)
+
+    async def store(
+        self, graph_id: str, agent_id: str, memory_type: str, content: dict,
+        session_id: Optional[str] = None,
+    ):
+        ring = self._ring(graph_id, agent_id)
+        now = time.monotonic()
+        ring.expire(now)
+        expires_at = now + ring.ttl if ring.ttl is not None else float("inf")
+        ring.entries.append((expires_at, new_entry(agent_id, memory_type, content, session_id)))
+
+    async def query(
+        self, graph_id: str, agent_id: str,
+        memory_type: Optional[str] = None, limit: int = 50,
+        before: Optional[str] = None, session_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> list[dict]:
+        if max_tokens is not None:
+            return await self._context_window(graph_id, agent_id, session_id or DEFAULT_SESSION, limit, max_tokens)
+        ring = self._rings.get((graph_id, agent_id))
+        if ring is None:
+            return []
+        ring.expire(time.monotonic())
+        items = []
+        for _, entry in reversed(ring.entries):
+            if (
+                (before and entry["id"] >= before)
+                or (memory_type and entry["type"] != memory_type)
+                or (session_id and entry["session_id"] != session_id)
+            ):
+                continue
+            items.append(entry)
+            if len(items) == limit:
+                break
+        return items
+
+    def _ring(self, graph_id: str, agent_id: str) -> _Ring:
+        ring = self._rings.get((graph_id, agent_id))
+        if ring is None:
+            config = self._configs.get((graph_id, agent_id)) or MemoryConfig()
+            ttl = config.ttl_hours * 3600 if config.ttl_hours else None
+            ring = self._rings[(graph_id, agent_id)] = _Ring(config.max_entries, ttl)
+        return ring
+
+
+class RedisMemoryBackend(MemoryBackend):
+    """
+    Capped sorted sets on a Redis-protocol server, shared by every worker.
+
+    Each entry is added to the agent's set, its per-type set and its
+    per-session set as "<id>|<json>" with score 0, so members sort by id and
+    reads are ZREVRANGEBYLEX range scans. The sets are trimmed to
+    `max_entries` in the same pipeline. With `ttl_hours` the sets expire after that long
+    without writes, and reads skip entries older than the TTL.
+    """
+
+    def __init__(
+        self, url: Optional[str] = None, client: Optional[redis.Redis] = None,
+        prefix: str = "agents-platform:memory",
+    ):
+        self._url = url or settings.memory_redis_url
+        self._client = client
+        self._prefix = prefix
+        self._configs: dict[tuple[str, str], MemoryConfig] = {}
+
+    def configure(self, graph_id: str, agent_id: str, config: MemoryConfig):
+        self._configs[(graph_id, agent_id)] = config
+
+    async def store(
+        self, graph_id: str, agent_id: str, memory_type: str, content: dict,
+        session_id: Optional[str] = None,
+    ):
+        config = self._configs.get((graph_id, agent_id)) or MemoryConfig()
+        entry = new_entry(agent_id, memory_type, content, session_id)
+        member = f"{entry['id']}|{json.dumps(entry, separators=(',', ':'))}"
+        keys = (
+            self._key(graph_id, agent_id),
+            self._key(graph_id, agent_id, memory_type),
+            self._key(graph_id, agent_id, session_id=entry["session_id"]),
+        )
+        async with self._get_client().pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.zadd(key, {member: 0})
+                pipe.zremrangebyrank(key, 0, -config.max_entries - 1)
+                if config.ttl_hours:
+                    pipe.expire(key, config.ttl_hours * 3600)
+            await pipe.execute()
+
+    async def query(
+        self, graph_id: str, agent_id: str,
+        memory_type: Optional[str] = None, limit: int = 50,
+        before: Optional[str] = None, session_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> list[dict]:
+        if max_tokens is not None:
+            return await self._context_window(graph_id, agent_id, session_id or DEFAULT_SESSION, limit, max_tokens)
+        if session_id:
+            key = self._key(graph_id, agent_id, session_id=session_id)
+        else:
+            key = self._key(graph_id, agent_id, memory_type or None)
+        # A session + type read filters the session's set, scanning further as needed
+        items: list[dict] = []
+        while len(items) < limit:
+            members = await self._get_client().zrevrangebylex(
+                key, f"({before}" if before else "+", "-", start=0, num=limit,
+            )
+            batch = [json.loads(_member_json(m)) for m in members]
+            items.extend(i for i in batch if not (session_id and memory_type) or i["type"] == memory_type)
+            if len(members) < limit:
+                break
+            before = batch[-1]["id"]
+        items = items[:limit]
+        config = self._configs.get((graph_id, agent_id))
+        if config and config.ttl_hours:
+            cutoff = datetime.now(timezone.utc).timestamp() - config.ttl_hours * 3600
+            items = [i for i in items if datetime.fromisoformat(i["created_at"]).timestamp() > cutoff]
+        return items
+
+    async def close(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(self._url)
+        return self._client
+
+    def _key(
+        self, graph_id: str, agent_id: str,
+        memory_type: Optional[str] = None, session_id: Optional[str] = None,
+    ) -> str:
+        key = f"{self._prefix}:{graph_id}:{agent_id}"
+        if session_id:
+            return f"{key}:session:{session_id}"
+        return f"{key}:{memory_type}" if memory_type else key
+
+
+def _member_json(member) -> str:
+    if isinstance(member, bytes):
+        member = member.decode()
+    return member.split("|", 1)[1]
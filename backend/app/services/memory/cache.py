@@ -0,0 +1,133 @@
+"""
+In-process LRU cache of recent memory entries.
+
+Keyed by (graph_id, agent_id, memory_type, session_id) — None for
+memory_type or session_id means all types or all sessions. Each entry holds the newest items of that key in
+id (creation) order, newest first, exactly as `query` returns them:
+- filled by reads (read-through),
+- updated in place by writes (new items are prepended),
+- bounded by the approximate JSON size of everything cached.
+
+Other workers' writes are not seen, so entries also expire after `ttl`.
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Optional
+
+CacheKey = tuple[str, str, Optional[str], Optional[str]]
+
+
+class _Entry:
+    __slots__ = ("items", "sizes", "nbytes", "complete", "capacity", "loaded_at")
+
+    def __init__(self, items: list[dict], complete: bool, capacity: int):
+        self.items = items
+        self.sizes = [_size(item) for item in items]
+        self.nbytes = sum(self.sizes)
+        # True when `items` is everything stored under the key
+        self.complete = complete
+        self.capacity = capacity
+        self.loaded_at = time.monotonic()
+
+
+def _size(item: dict) -> int:
+    return len(json.dumps(item, separators=(",", ":"), default=str))
+
+
+class MemoryCache:
+    """Byte-bounded LRU of recent memory entries per (graph, agent, type, session)."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._bytes = 0
+        # Writes seen per (graph, agent); a read that raced a write is not cached
+        self._writes: dict[tuple[str, str], int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: CacheKey, limit: int) -> Optional[list[dict]]:
+        """The newest `limit` items for `key`, or None if they are not all cached."""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.loaded_at > self._ttl:
+            self._remove(key)
+            entry = None
+        if entry is None or (len(entry.items) < limit and not entry.complete):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.items[:limit]
+
+    def writes(self, graph_id: str, agent_id: str) -> int:
+        return self._writes.get((graph_id, agent_id), 0)
+
+    def fill(self, key: CacheKey, items: list[dict], limit: int, writes: int):
+        """Cache the result of a query for `limit` items started after `writes` writes."""
+        if self.writes(key[0], key[1]) != writes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(items, complete=len(items) < limit, capacity=limit)
+        if entry.nbytes > self._max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        self._evict()
+
+    def add(self, graph_id: str, agent_id: str, item: dict):
+        """Prepend a newly written item to the entries it belongs to."""
+        self._writes[(graph_id, agent_id)] = self.writes(graph_id, agent_id) + 1
+        size = None
+        memory_type, session_id = item.get("type"), item.get("session_id")
+        for key in (
+            (graph_id, agent_id, memory_type, session_id), (graph_id, agent_id, None, session_id),
+            (graph_id, agent_id, memory_type, None), (graph_id, agent_id, None, None),
+        ):
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            size = size if size is not None else _size(item)
+            entry.items.insert(0, item)
+            entry.sizes.insert(0, size)
+            entry.nbytes += size
+            self._bytes += size
+            if len(entry.items) > entry.capacity:
+                entry.items.pop()
+                dropped = entry.sizes.pop()
+                entry.nbytes -= dropped
+                self._bytes -= dropped
+                entry.complete = False
+        self._evict()
+
+    def invalidate(self, graph_id: str, agent_id: Optional[str] = None):
+        """Drop cached entries for a graph, or for one agent in it."""
+        for key in [k for k in self._entries if k[0] == graph_id and agent_id in (None, k[1])]:
+            self._remove(key)
+        for writer in self._writes:
+            if writer[0] == graph_id and agent_id in (None, writer[1]):
+                self._writes[writer] += 1
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: CacheKey):
+        self._bytes -= self._entries.pop(key).nbytes
+
+    def _evict(self):
+        while self._bytes > self._max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
@@ -6,24 +6,181 @@ Provides persistent memory for deployed agents:
 - Semantic memory (searchable knowledge base)
 - Episodic memory (long-term event storage)
 
-Each agent graph gets its own container with partitioning by agent_id.
+Each agent graph gets its own container with hierarchical partition keys
+(agent_id, session_id), so one busy agent's history is spread over its
+sessions and session-scoped reads stay in a single logical partition.
+Agent-wide reads use the agent_id prefix. Containers created before
+sessions existed are partitioned on /agent_id alone; they keep working
+(sessions become a filter) until `migrate_container` copies them into a
+hierarchical `memory-<graph>-v2` container.
+
+Writes are buffered (write-behind): `store` appends to a per-(graph, agent)
+buffer and returns; a background flusher writes each buffer as a
+transactional batch once it reaches `batch_size` entries or has waited
+`flush_interval` seconds. `store` blocks while `max_pending` entries are
+unflushed, `query` flushes the agent's buffer first so reads see earlier
+writes, and `close` flushes everything before the client is closed.
+
+Recent entries are also kept in a byte-bounded LRU (`MemoryCache`): `query`
+reads through it and `store` prepends to it, so repeated history loads
+skip Cosmos entirely.
+
+Container clients are resolved once per graph and containers known to
+exist are remembered, so hot paths never rebuild handles and deploys only
+call the control plane for new graphs. `warm` pre-fills both from the
+database's container list at startup.
+
+Agents configured with `MemoryConfig.semantic_search` also get their
+semantic entries embedded — one embeddings call per flushed batch — into a
+memory-mapped per-graph `VectorIndex`, searched with `search`. Entries
+deleted by compaction are removed from the index, and so are hits that
+`search` finds expired by TTL (it over-fetches to make up for them); the
+compactor rebuilds an index once half of its rows are removed.
+
+Retention follows each agent's `MemoryConfig`: entries carry a per-item
+`ttl` from `ttl_hours` (the container's `default_ttl=-1` enables item TTLs
+without expiring anything else), and a background compactor trims every
+(agent, type) written to since its last pass down to `max_entries`,
+deleting at most `COMPACTION_BATCH` entries per key per pass. Request
+charges (RU) are tallied per operation kind and the last known container
+size is reported by `metrics`.
+
+Agents with `MemoryConfig.summary_token_budget` get rolling summaries: when
+a session's conversation turns not yet covered by a summary pass the budget,
+the compactor folds the oldest of them (all but the newest half-budget)
+into a new `summary` entry that supersedes the previous one. The turns
+themselves are kept. `query(..., max_tokens=N)` returns that context
+window: the latest summary plus the newest turns it does not cover.
+
+Entries are ordered by `created_at`, not by id: containers from before
+ULID ids hold ids like "<agent>-<timestamp>", which sort above every ULID.
+Entries from different workers can share a timestamp, so ties are ordered
+by id, backed by a (created_at, id) composite index that `warm` and
+`ensure_container` add to containers created without it. Continuation
+tokens from `pages` are "<created_at>|<id>", so a page needs no lookup of
+the entry it resumes after; a bare id still works as `before`.
 """
+import asyncio
+import os
+import time
 from typing import Optional
-from datetime import datetime, timezone
 
-from azure.cosmos.aio import CosmosClient
+from azure.cosmos.aio import ContainerProxy, CosmosClient
 from azure.cosmos import PartitionKey
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
 
 from app.core.config import settings
 from app.core.logging import logger
+from app.models.agent import MemoryConfig, MemoryType
+from app.services.memory.backend import DEFAULT_SESSION, MemoryBackend, new_entry
+from app.services.memory.cache import MemoryCache
+from app.services.memory.embeddings import AzureOpenAIEmbedder, EmbedFn
+from app.services.memory.summarizer import AzureOpenAISummarizer, SummarizeFn, content_text, estimate_tokens
+from app.services.memory.vectors import VectorIndex
 
 
-class CosmosMemoryService:
-    """Cosmos DB-backed memory for agent systems."""
+# Transactional batches are limited to 100 operations per partition key
+MAX_BATCH_OPERATIONS = 100
+
+# Entries deleted per (graph, agent, type) in one compaction pass
+COMPACTION_BATCH = 100
+
+_DEFAULT_CONFIG = MemoryConfig()
+
+SESSION_PARTITION_KEY = PartitionKey(path=["/agent_id", "/session_id"], kind="MultiHash")
+
+# Serves ORDER BY c.created_at DESC, c.id DESC (and its reverse)
+ORDER_INDEX = [{"path": "/created_at", "order": "descending"}, {"path": "/id", "order": "descending"}]
+INDEXING_POLICY = {"indexingMode": "consistent", "includedPaths": [{"path": "/*"}], "compositeIndexes": [ORDER_INDEX]}
+
+# Index hits fetched per result wanted, to absorb entries expired since indexing
+_SEARCH_OVERFETCH = 2
+
+# Upserts in flight while copying a container
+_MIGRATION_CONCURRENCY = 50
+
+BufferKey = tuple[str, str, str]  # (graph_id, agent_id, session_id)
+
+
+class _PendingWrites:
+    """Unflushed documents for one (graph, agent, session) partition."""
+
+    __slots__ = ("docs", "since")
 
     def __init__(self):
+        self.docs: list[dict] = []
+        self.since = time.monotonic()
+
+
+class _FlushLock:
+    """Per-partition flush lock, dropped once no flush holds or awaits it."""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class CosmosMemoryService(MemoryBackend):
+    """Cosmos DB-backed memory for agent systems."""
+
+    def __init__(
+        self,
+        batch_size: int = settings.cosmos_write_batch_size,
+        flush_interval: float = settings.cosmos_write_flush_ms / 1000,
+        max_pending: int = settings.cosmos_write_max_pending,
+        max_attempts: int = 3,
+        cache_max_bytes: int = settings.memory_cache_max_bytes,
+        cache_ttl: float = settings.memory_cache_ttl_seconds,
+        vector_dir: str = settings.memory_vector_dir,
+        embed: Optional[EmbedFn] = None,
+        compaction_interval: float = settings.memory_compaction_interval_seconds,
+        summarize: Optional[SummarizeFn] = None,
+    ):
         self._client: Optional[CosmosClient] = None
         self._database = None
+        self._containers: dict[str, ContainerProxy] = {}
+        self._provisioned: set[str] = set()
+        # Container name -> partitioned on (agent_id, session_id)?
+        self._hierarchical: dict[str, bool] = {}
+        # Graph -> container name in use (differs from memory-<graph> once migrated)
+        self._active: dict[str, str] = {}
+        self._batch_size = max(1, min(batch_size, MAX_BATCH_OPERATIONS))
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._max_attempts = max_attempts
+        self._buffers: dict[BufferKey, _PendingWrites] = {}
+        # Serialises flushes per partition so batches land in order; only
+        # partitions with a flush in progress have an entry
+        self._flush_locks: dict[BufferKey, _FlushLock] = {}
+        self._pending = 0
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        # Set by close: the flusher finishes the writes it started, then exits
+        self._closing = False
+        self._cache = MemoryCache(cache_max_bytes, cache_ttl)
+        self._configs: dict[tuple[str, str], MemoryConfig] = {}
+        self._vector_dir = vector_dir
+        self._indexes: dict[str, VectorIndex] = {}
+        self._embed = embed if embed is not None else AzureOpenAIEmbedder()
+        self._summarize = summarize if summarize is not None else AzureOpenAISummarizer()
+
+        self._compaction_interval = compaction_interval
+        self._compactor: Optional[asyncio.Task] = None
+        # (graph, agent, type) written to since their last compaction pass
+        self._dirty: set[tuple[str, str, str]] = set()
+        # Sessions with conversation turns since their last summarization check
+        self._unsummarized: set[BufferKey] = set()
+        self._usage: dict[str, dict[str, int]] = {}
+        self._request_charge: dict[str, float] = {"write": 0.0, "query": 0.0, "compaction": 0.0}
+
+        self.flushed = 0
+        self.batches = 0
+        self.dropped = 0
+        self.compacted = 0
+        self.summarized = 0
 
     async def _get_client(self):
         if self._client is None:
@@ -37,6 +194,51 @@ class CosmosMemoryService:
             self._database = self._client.get_database_client(settings.cosmos_db_database)
         return self._client
 
+    async def warm(self):
+        """Register every existing container so it is never re-provisioned or re-resolved."""
+        client = await self._get_client()
+        if not client:
+            return
+        try:
+            async for properties in self._database.list_containers():
+                name = properties["id"]
+                self._provisioned.add(name)
+                self._hierarchical[name] = _is_hierarchical(properties)
+                self._containers.setdefault(name, self._database.get_container_client(name))
+                if name.startswith("memory-"):
+                    await self._ensure_order_index(properties)
+            logger.info("cosmos_containers_warmed", containers=len(self._provisioned))
+        except Exception as e:
+            logger.error("cosmos_warm_failed", error=str(e))
+
+    def container(self, graph_id: str) -> ContainerProxy:
+        """Cached container client for a graph's memory container."""
+        name = self._container_name(graph_id)
+        container = self._containers.get(name)
+        if container is None:
+            container = self._containers[name] = self._database.get_container_client(name)
+        return container
+
+    def _container_name(self, graph_id: str) -> str:
+        name = self._active.get(graph_id)
+        if name is None:
+            migrated = f"memory-{graph_id}-v2"
+            name = self._active[graph_id] = migrated if migrated in self._provisioned else f"memory-{graph_id}"
+        return name
+
+    async def _resolve(self, graph_id: str) -> tuple[ContainerProxy, bool]:
+        """A graph's container and whether it is partitioned on (agent_id, session_id)."""
+        container = self.container(graph_id)
+        name = self._container_name(graph_id)
+        hierarchical = self._hierarchical.get(name)
+        if hierarchical is None:
+            try:
+                hierarchical = self._hierarchical[name] = _is_hierarchical(await container.read())
+            except Exception as e:
+                logger.warning("cosmos_layout_unknown", graph_id=graph_id, error=str(e))
+                hierarchical = True
+        return container, hierarchical
+
     async def ensure_container(self, graph_id: str):
         """Create or get a Cosmos DB container for an agent graph."""
         client = await self._get_client()
@@ -44,61 +246,570 @@ class CosmosMemoryService:
             logger.info("cosmos_skipped_no_config", graph_id=graph_id)
             return
 
+        name = self._container_name(graph_id)
+        if name in self._provisioned:
+            return
         try:
-            await self._database.create_container_if_not_exists(
-                id=f"memory-{graph_id}",
-                partition_key=PartitionKey(path="/agent_id"),
+            # An existing legacy container is returned as is
+            container = self._containers[name] = await self._database.create_container_if_not_exists(
+                id=name,
+                partition_key=SESSION_PARTITION_KEY,
+                indexing_policy=INDEXING_POLICY,
                 default_ttl=-1,  # No expiration by default
             )
+            properties = await container.read()
+            self._hierarchical[name] = _is_hierarchical(properties)
+            await self._ensure_order_index(properties)
+            self._provisioned.add(name)
             logger.info("cosmos_container_ready", graph_id=graph_id)
         except Exception as e:
             logger.error("cosmos_container_failed", graph_id=graph_id, error=str(e))
 
-    async def store(self, graph_id: str, agent_id: str, memory_type: str, content: dict):
-        """Store a memory entry."""
+    async def _ensure_order_index(self, properties: dict):
+        """Add the (created_at, id) composite index to a container that lacks it."""
+        policy = properties.get("indexingPolicy") or {}
+        composites = policy.get("compositeIndexes") or []
+        if ORDER_INDEX in composites:
+            return
+        key = properties["partitionKey"]
+        paths = key["paths"]
+        try:
+            await self._database.replace_container(
+                properties["id"],
+                partition_key=PartitionKey(path=paths if len(paths) > 1 else paths[0], kind=key.get("kind", "Hash")),
+                indexing_policy={**INDEXING_POLICY, **policy, "compositeIndexes": composites + [ORDER_INDEX]},
+                default_ttl=properties.get("defaultTtl"),
+            )
+            logger.info("cosmos_order_index_added", container=properties["id"])
+        except Exception as e:
+            logger.error("cosmos_order_index_failed", container=properties["id"], error=str(e))
+
+    def configure(self, graph_id: str, agent_id: str, config: MemoryConfig):
+        """Set an agent's memory options (semantic search, embedding model)."""
+        self._configs[(graph_id, agent_id)] = config
+
+    async def store(
+        self, graph_id: str, agent_id: str, memory_type: str, content: dict,
+        session_id: Optional[str] = None,
+    ):
+        """Buffer a memory entry for the next batched write."""
         client = await self._get_client()
         if not client:
             return
 
-        container = self._database.get_container_client(f"memory-{graph_id}")
-        doc = {
-            "id": f"{agent_id}-{datetime.now(timezone.utc).timestamp()}",
-            "agent_id": agent_id,
-            "type": memory_type,
-            "content": content,
-            "created_at": datetime.now(timezone.utc).isoformat(),
+        while self._pending >= self._max_pending:
+            self._space.clear()
+            self._wake.set()
+            await self._space.wait()
+
+        doc = new_entry(agent_id, memory_type, content, session_id)
+        config = self._configs.get((graph_id, agent_id), _DEFAULT_CONFIG)
+        if config.ttl_hours:
+            doc["ttl"] = config.ttl_hours * 3600
+        self._dirty.add((graph_id, agent_id, memory_type))
+        key = (graph_id, agent_id, doc["session_id"])
+        if memory_type == MemoryType.CONVERSATION and config.summary_token_budget:
+            self._unsummarized.add(key)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = _PendingWrites()
+        buffer.docs.append(doc)
+        self._cache.add(graph_id, agent_id, doc)
+        self._pending += 1
+        if len(buffer.docs) >= self._batch_size:
+            self._wake.set()
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+        if self._compactor is None:
+            self._compactor = asyncio.create_task(self._compaction_loop())
+
+    async def flush(self, graph_id: Optional[str] = None, agent_id: Optional[str] = None):
+        """Write buffered entries now, optionally only those of one graph or agent (all sessions)."""
+        # Partitions being flushed are included so their writes have landed on return
+        keys = [
+            key for key in set(self._buffers) | set(self._flush_locks)
+            if graph_id in (None, key[0]) and agent_id in (None, key[1])
+        ]
+        await asyncio.gather(*(self._flush_partition(key) for key in keys))
+
+    def metrics(self) -> dict:
+        return {
+            "pending": self._pending,
+            "partitions": len(self._buffers),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "compacted": self.compacted,
+            "summarized": self.summarized,
+            "request_charge": {kind: round(ru, 2) for kind, ru in self._request_charge.items()},
+            "containers": self._usage,
+            "cache": self._cache.metrics(),
         }
-        await container.create_item(body=doc)
+
+    async def compact(self):
+        """
+        Run one compaction pass: trim each dirty (agent, type) to its
+        `max_entries`, summarize sessions over their token budget, then
+        refresh the size of the containers touched.
+        """
+        dirty, self._dirty = self._dirty, set()
+        for graph_id, agent_id, memory_type in dirty:
+            try:
+                if await self._compact_key(graph_id, agent_id, memory_type):
+                    self._dirty.add((graph_id, agent_id, memory_type))  # more to trim next pass
+            except Exception as e:
+                self._dirty.add((graph_id, agent_id, memory_type))
+                logger.error(
+                    "memory_compaction_failed", graph_id=graph_id, agent_id=agent_id,
+                    memory_type=memory_type, error=str(e),
+                )
+        sessions, self._unsummarized = self._unsummarized, set()
+        for graph_id, agent_id, session_id in sessions:
+            try:
+                await self._summarize_session(graph_id, agent_id, session_id)
+            except Exception as e:
+                self._unsummarized.add((graph_id, agent_id, session_id))
+                logger.error(
+                    "memory_summarization_failed", graph_id=graph_id, agent_id=agent_id,
+                    session_id=session_id, error=str(e),
+                )
+        for graph_id in {key[0] for key in dirty}:
+            await self._refresh_usage(graph_id)
+        for graph_id, index in list(self._indexes.items()):
+            if index.needs_rebuild():
+                await asyncio.to_thread(index.rebuild)
+                logger.info("memory_vector_index_rebuilt", graph_id=graph_id, rows=index.size)
+
+    async def _compaction_loop(self):
+        while True:
+            await asyncio.sleep(self._compaction_interval)
+            await self.compact()
+
+    async def _compact_key(self, graph_id: str, agent_id: str, memory_type: str) -> bool:
+        """Delete up to COMPACTION_BATCH entries beyond max_entries; True if some may remain."""
+        max_entries = self._configs.get((graph_id, agent_id), _DEFAULT_CONFIG).max_entries
+        await self.flush(graph_id, agent_id)
+        container, hierarchical = await self._resolve(graph_id)
+        stale = [
+            item async for item in container.query_items(
+                query=(
+                    "SELECT c.id, c.session_id FROM c WHERE c.agent_id = @agent_id AND c.type = @type "
+                    "ORDER BY c.created_at DESC, c.id DESC OFFSET @offset LIMIT @limit"
+                ),
+                parameters=[
+                    {"name": "@agent_id", "value": agent_id},
+                    {"name": "@type", "value": memory_type},
+                    {"name": "@offset", "value": max_entries},
+                    {"name": "@limit", "value": COMPACTION_BATCH},
+                ],
+                partition_key=_partition_key(hierarchical, agent_id),
+                response_hook=self._charge("compaction"),
+            )
+        ]
+        if not stale:
+            return False
+        await asyncio.gather(*(
+            self._delete(container, item["id"], _partition_key(hierarchical, agent_id, item.get("session_id")))
+            for item in stale
+        ))
+        self.compacted += len(stale)
+        self._cache.invalidate(graph_id, agent_id)
+        if memory_type == MemoryType.SEMANTIC and graph_id in self._indexes:
+            await asyncio.to_thread(self._indexes[graph_id].remove, [item["id"] for item in stale])
+        logger.info("memory_compacted", graph_id=graph_id, agent_id=agent_id, memory_type=memory_type, deleted=len(stale))
+        return len(stale) == COMPACTION_BATCH
+
+    async def _summarize_session(self, graph_id: str, agent_id: str, session_id: str):
+        """Fold the session's oldest unsummarized turns into a new summary if over budget."""
+        budget = self._configs.get((graph_id, agent_id), _DEFAULT_CONFIG).summary_token_budget
+        if not budget:
+            return
+        summary = await self._latest_summary(graph_id, agent_id, session_id)
+        covered = _covered_until(summary)
+        turns: list[dict] = []
+        async for page in self.pages(graph_id, agent_id, MemoryType.CONVERSATION, session_id=session_id):
+            fresh = [t for t in page.items if t["created_at"] > covered]
+            turns.extend(fresh)
+            if len(fresh) < len(page.items):
+                break
+        tokens = [estimate_tokens(t) for t in turns]
+        if sum(tokens) <= budget:
+            return
+
+        # Keep the newest half of the budget verbatim, summarize the rest
+        keep, kept = 0, 0
+        while keep < len(turns) and kept + tokens[keep] <= budget // 2:
+            kept += tokens[keep]
+            keep += 1
+        rolled = turns[keep:][::-1]
+        text = await self._summarize(summary["content"]["text"] if summary else None, rolled)
+        await self.store(graph_id, agent_id, MemoryType.SUMMARY, {
+            "text": text,
+            "covers_from": summary["content"]["covers_from"] if summary else rolled[0]["id"],
+            "covers_until": rolled[-1]["id"],
+            "covers_until_at": rolled[-1]["created_at"],
+            "turns": (summary["content"]["turns"] if summary else 0) + len(rolled),
+        }, session_id)
+        self.summarized += len(rolled)
+        logger.info(
+            "memory_summarized", graph_id=graph_id, agent_id=agent_id, session_id=session_id, turns=len(rolled),
+        )
+
+    async def _latest_summary(self, graph_id: str, agent_id: str, session_id: str) -> Optional[dict]:
+        summaries = await self.query(graph_id, agent_id, MemoryType.SUMMARY, 1, session_id=session_id)
+        return summaries[0] if summaries else None
+
+    async def _delete(self, container, item_id: str, partition_key):
+        try:
+            await container.delete_item(
+                item=item_id, partition_key=partition_key, response_hook=self._charge("compaction"),
+            )
+        except CosmosResourceNotFoundError:
+            pass  # already expired via TTL
+
+    async def _refresh_usage(self, graph_id: str):
+        """Record documentsSize/documentsCount from the container's quota headers."""
+        usage: dict[str, int] = {}
+
+        def capture(headers, _):
+            for part in headers.get("x-ms-resource-usage", "").split(";"):
+                name, _, value = part.partition("=")
+                if name in ("documentsSize", "documentsCount") and value.isdigit():
+                    usage[name] = int(value)
+
+        try:
+            await self.container(graph_id).read(populate_quota_info=True, response_hook=capture)
+        except Exception as e:
+            logger.warning("memory_usage_unavailable", graph_id=graph_id, error=str(e))
+            return
+        self._usage[graph_id] = usage
+
+    def _charge(self, kind: str):
+        """Response hook adding the request charge (RU) to the `kind` tally."""
+        def hook(headers, _):
+            self._request_charge[kind] += float(headers.get("x-ms-request-charge", 0) or 0)
+        return hook
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._closing:
+                return
+            cutoff = time.monotonic() - self._flush_interval
+            due = [
+                key for key, buffer in self._buffers.items()
+                if len(buffer.docs) >= self._batch_size or buffer.since <= cutoff
+                or self._pending >= self._max_pending
+            ]
+            await asyncio.gather(*(self._flush_partition(key) for key in due))
+
+    async def _flush_partition(self, key: BufferKey):
+        flush_lock = self._flush_locks.get(key)
+        if flush_lock is None:
+            flush_lock = self._flush_locks[key] = _FlushLock()
+        flush_lock.users += 1
+        try:
+            async with flush_lock.lock:
+                await self._write_partition(key)
+        finally:
+            flush_lock.users -= 1
+            if not flush_lock.users and self._flush_locks.get(key) is flush_lock:
+                del self._flush_locks[key]
+
+    async def _write_partition(self, key: BufferKey):
+        buffer = self._buffers.pop(key, None)
+        if buffer is None:
+            return
+        graph_id, agent_id, session_id = key
+        container, hierarchical = await self._resolve(graph_id)
+        partition_key = _partition_key(hierarchical, agent_id, session_id)
+        docs = buffer.docs
+        for start in range(0, len(docs), self._batch_size):
+            chunk = docs[start:start + self._batch_size]
+            written = await self._write_batch(container, graph_id, agent_id, partition_key, chunk)
+            self._pending -= len(chunk)
+            self._space.set()
+            if written:
+                await self._index_semantic(graph_id, agent_id, chunk)
+
+    async def _write_batch(
+        self, container, graph_id: str, agent_id: str, partition_key, docs: list[dict],
+    ) -> bool:
+        operations = [("create", (doc,)) for doc in docs]
+        for attempt in range(1, self._max_attempts + 1):
+            try:
+                await container.execute_item_batch(
+                    batch_operations=operations, partition_key=partition_key,
+                    response_hook=self._charge("write"),
+                )
+                self.flushed += len(docs)
+                self.batches += 1
+                return True
+            except Exception as e:
+                if attempt == self._max_attempts:
+                    self.dropped += len(docs)
+                    self._cache.invalidate(graph_id, agent_id)
+                    logger.error(
+                        "cosmos_batch_failed", graph_id=graph_id, agent_id=agent_id,
+                        entries=len(docs), error=str(e),
+                    )
+                    return False
+                await asyncio.sleep(0.1 * 2 ** (attempt - 1))
+
+    async def _index_semantic(self, graph_id: str, agent_id: str, docs: list[dict]):
+        config = self._configs.get((graph_id, agent_id))
+        if config is None or not config.semantic_search:
+            return
+        docs = [doc for doc in docs if doc["type"] == MemoryType.SEMANTIC]
+        if not docs:
+            return
+        try:
+            vectors = await self._embed(config.embedding_model, [content_text(d["content"]) for d in docs])
+            await asyncio.to_thread(
+                self._index(graph_id).add, [d["id"] for d in docs], [agent_id] * len(docs), vectors,
+            )
+        except Exception as e:
+            logger.error("memory_embedding_failed", graph_id=graph_id, agent_id=agent_id, error=str(e))
+
+    def _index(self, graph_id: str) -> VectorIndex:
+        index = self._indexes.get(graph_id)
+        if index is None:
+            index = self._indexes[graph_id] = VectorIndex(
+                os.path.join(self._vector_dir, graph_id),
+                ivf_threshold=settings.memory_vector_ivf_threshold,
+                nprobe=settings.memory_vector_nprobe,
+            )
+        return index
+
+    async def search(self, graph_id: str, agent_id: str, text: str, k: int = 5) -> list[dict]:
+        """
+        Semantic memory entries most similar to `text`, best first, each with
+        a cosine `score`. Empty unless the agent has semantic search enabled.
+        """
+        config = self._configs.get((graph_id, agent_id))
+        client = await self._get_client()
+        if not client or config is None or not config.semantic_search:
+            return []
+
+        await self.flush(graph_id, agent_id)
+        query_vector = (await self._embed(config.embedding_model, [text]))[0]
+        index = self._index(graph_id)
+        container, hierarchical = await self._resolve(graph_id)
+        fetch = k * _SEARCH_OVERFETCH
+        while True:
+            hits = await asyncio.to_thread(index.search, query_vector, fetch, agent_id)
+            if not hits:
+                return []
+
+            scores = dict(hits)
+            items = []
+            async for item in container.query_items(
+                query="SELECT * FROM c WHERE c.agent_id = @agent_id AND ARRAY_CONTAINS(@ids, c.id)",
+                parameters=[
+                    {"name": "@agent_id", "value": agent_id},
+                    {"name": "@ids", "value": list(scores)},
+                ],
+                partition_key=_partition_key(hierarchical, agent_id),
+                response_hook=self._charge("query"),
+            ):
+                items.append({**item, "score": scores.pop(item["id"])})
+            # Hits left over were deleted (TTL expiry) since they were indexed
+            if scores:
+                await asyncio.to_thread(index.remove, list(scores))
+            # Short of k only because of them: search again over the live rows
+            if len(items) >= k or len(hits) < fetch or not scores:
+                break
+        items.sort(key=lambda item: item["score"], reverse=True)
+        return items[:k]
 
     async def query(
         self, graph_id: str, agent_id: str,
         memory_type: Optional[str] = None, limit: int = 50,
+        before: Optional[str] = None, session_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
     ) -> list[dict]:
-        """Query memory entries for an agent."""
+        """
+        Query memory entries for an agent, newest first. With `before` (a
+        continuation token or an entry id), only entries created before
+        that entry; see `pages` for paging.
+        With `session_id`, only that session — a single-partition read.
+
+        With `max_tokens`, the session's context window instead: up to
+        `limit` of the newest conversation turns not yet summarized, then
+        the latest summary, together within `max_tokens` estimated tokens.
+        """
         client = await self._get_client()
         if not client:
             return []
+        if max_tokens is not None:
+            return await self._context_window(graph_id, agent_id, session_id or DEFAULT_SESSION, limit, max_tokens)
+
+        key = (graph_id, agent_id, memory_type or None, session_id)
+        if before is None:
+            cached = self._cache.get(key, limit)
+            if cached is not None:
+                return cached
 
-        container = self._database.get_container_client(f"memory-{graph_id}")
-        query = "SELECT * FROM c WHERE c.agent_id = @agent_id"
-        params = [{"name": "@agent_id", "value": agent_id}]
+        writes = self._cache.writes(graph_id, agent_id)
+        await self.flush(graph_id, agent_id)
+        container, hierarchical = await self._resolve(graph_id)
+        query = "SELECT TOP @limit * FROM c WHERE c.agent_id = @agent_id"
+        params = [{"name": "@limit", "value": limit}, {"name": "@agent_id", "value": agent_id}]
 
         if memory_type:
             query += " AND c.type = @type"
             params.append({"name": "@type", "value": memory_type})
+        if before:
+            before_at, _, before_id = before.partition("|")
+            if before_id:
+                before = before_id
+            else:
+                before_at = await self._created_at(container, hierarchical, agent_id, before)
+                if before_at is None:
+                    return []
+            query += " AND (c.created_at < @before_at OR (c.created_at = @before_at AND c.id < @before))"
+            params.append({"name": "@before_at", "value": before_at})
+            params.append({"name": "@before", "value": before})
+        if session_id:
+            query += " AND c.session_id = @session_id"
+            params.append({"name": "@session_id", "value": session_id})
 
-        query += " ORDER BY c.created_at DESC OFFSET 0 LIMIT @limit"
-        params.append({"name": "@limit", "value": limit})
+        query += " ORDER BY c.created_at DESC, c.id DESC"
 
         items = []
-        async for item in container.query_items(query=query, parameters=params):
+        async for item in container.query_items(
+            query=query, parameters=params,
+            partition_key=_partition_key(hierarchical, agent_id, session_id),
+            max_item_count=limit, response_hook=self._charge("query"),
+        ):
             items.append(item)
-        return items
+        if before is None:
+            self._cache.fill(key, items, limit, writes)
+        return items[:]
+
+    def _continuation(self, entry: dict) -> str:
+        return f"{entry['created_at']}|{entry['id']}"
+
+    async def _created_at(self, container, hierarchical: bool, agent_id: str, item_id: str) -> Optional[str]:
+        """`created_at` of an agent's entry (an id passed as `before`), None if it is gone."""
+        async for created_at in container.query_items(
+            query="SELECT VALUE c.created_at FROM c WHERE c.agent_id = @agent_id AND c.id = @id",
+            parameters=[{"name": "@agent_id", "value": agent_id}, {"name": "@id", "value": item_id}],
+            partition_key=_partition_key(hierarchical, agent_id), response_hook=self._charge("query"),
+        ):
+            return created_at
+        return None
+
+    async def _context_window(
+        self, graph_id: str, agent_id: str, session_id: str, limit: int, max_tokens: int,
+    ) -> list[dict]:
+        summary = await self._latest_summary(graph_id, agent_id, session_id)
+        budget = max_tokens - (estimate_tokens(summary) if summary else 0)
+        if budget < 0:
+            summary, budget = None, max_tokens
+        covered = _covered_until(summary)
+        window = []
+        for turn in await self.query(graph_id, agent_id, MemoryType.CONVERSATION, limit, session_id=session_id):
+            tokens = estimate_tokens(turn)
+            if turn["created_at"] <= covered or tokens > budget:
+                break
+            budget -= tokens
+            window.append(turn)
+        return window + [summary] if summary else window
+
+    async def migrate_container(self, graph_id: str, delete_legacy: bool = False) -> int:
+        """
+        Move a graph from a legacy /agent_id container to a hierarchical
+        `memory-<graph>-v2` container and return the number of entries copied.
+
+        New writes and reads switch to the new container first, then old
+        entries are upserted in the background of this call (ids are kept,
+        so re-running is safe). Other workers pick the new container up on
+        their next start, via `warm`; restart them once this returns.
+        """
+        client = await self._get_client()
+        if not client:
+            return 0
+        legacy, hierarchical = await self._resolve(graph_id)
+        if hierarchical:
+            return 0
+
+        await self.flush(graph_id)
+        name = f"memory-{graph_id}-v2"
+        target = await self._database.create_container_if_not_exists(
+            id=name, partition_key=SESSION_PARTITION_KEY, indexing_policy=INDEXING_POLICY, default_ttl=-1,
+        )
+        self._containers[name] = target
+        self._provisioned.add(name)
+        self._hierarchical[name] = True
+        self._active[graph_id] = name
+        self._cache.invalidate(graph_id)
+        logger.info("memory_migration_started", graph_id=graph_id, target=name)
+
+        copied = 0
+        batch: list[dict] = []
+        async for item in legacy.read_all_items(max_item_count=1000):
+            doc = {k: v for k, v in item.items() if not k.startswith("_")}
+            doc.setdefault("session_id", DEFAULT_SESSION)
+            batch.append(doc)
+            if len(batch) == _MIGRATION_CONCURRENCY:
+                await asyncio.gather(*(target.upsert_item(body=d) for d in batch))
+                copied += len(batch)
+                batch = []
+        await asyncio.gather(*(target.upsert_item(body=d) for d in batch))
+        copied += len(batch)
+
+        if delete_legacy:
+            legacy_name = f"memory-{graph_id}"
+            await self._database.delete_container(legacy_name)
+            self._provisioned.discard(legacy_name)
+            self._containers.pop(legacy_name, None)
+        logger.info("memory_migration_completed", graph_id=graph_id, copied=copied)
+        return copied
 
     async def close(self):
+        if self._compactor:
+            self._compactor.cancel()
+            await asyncio.gather(self._compactor, return_exceptions=True)
+            self._compactor = None
+        if self._flusher:
+            # Not cancelled: a partition it is writing is already out of the buffers
+            self._closing = True
+            self._wake.set()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+            self._closing = False
+        if self._buffers:
+            await self.flush()
+            logger.info("cosmos_buffer_flushed", **self.metrics())
+        for index in self._indexes.values():
+            index.close()
+        if isinstance(self._embed, AzureOpenAIEmbedder):
+            await self._embed.close()
+        if isinstance(self._summarize, AzureOpenAISummarizer):
+            await self._summarize.close()
         if self._client:
             await self._client.close()
 
 
+def _covered_until(summary: Optional[dict]) -> str:
+    return summary["content"]["covers_until_at"] if summary else ""
+
+
+def _is_hierarchical(properties: dict) -> bool:
+    return len(properties.get("partitionKey", {}).get("paths", [])) > 1
+
+
+def _partition_key(hierarchical: bool, agent_id: str, session_id: Optional[str] = None):
+    """Full key for one session, the agent_id prefix for all of an agent's sessions."""
+    if not hierarchical:
+        return agent_id
+    return [agent_id, session_id] if session_id else [agent_id]
+
+
 # Singleton
 cosmos_memory = CosmosMemoryService()
@@ -0,0 +1,46 @@
+"""
+Batched text embeddings for semantic memory.
+
+`EmbedFn(model, texts)` returns a (len(texts), dim) float32 array. The
+default implementation calls the Azure OpenAI embeddings API, sending up
+to `batch_size` inputs per request.
+"""
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+from openai import AsyncAzureOpenAI
+
+from app.core.config import settings
+
+EmbedFn = Callable[[str, list[str]], Awaitable[np.ndarray]]
+
+
+class AzureOpenAIEmbedder:
+    """Embeds texts with an Azure OpenAI embedding deployment."""
+
+    def __init__(self, batch_size: int = settings.memory_embedding_batch_size):
+        self._batch_size = batch_size
+        self._client: Optional[AsyncAzureOpenAI] = None
+
+    def _get_client(self) -> AsyncAzureOpenAI:
+        if self._client is None:
+            self._client = AsyncAzureOpenAI(
+                azure_endpoint=settings.azure_openai_endpoint,
+                api_key=settings.azure_openai_api_key,
+                api_version=settings.azure_openai_api_version,
+            )
+        return self._client
+
+    async def __call__(self, model: str, texts: list[str]) -> np.ndarray:
+        client = self._get_client()
+        rows: list[list[float]] = []
+        for start in range(0, len(texts), self._batch_size):
+            response = await client.embeddings.create(
+                model=model, input=texts[start:start + self._batch_size],
+            )
+            rows.extend(d.embedding for d in sorted(response.data, key=lambda d: d.index))
+        return np.asarray(rows, dtype=np.float32)
+
+    async def close(self):
+        if self._client:
+            await self._client.close()
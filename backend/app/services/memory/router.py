@@ -0,0 +1,83 @@
+"""
+Per-agent memory provider selection.
+
+Deploy calls `configure` with each agent's `MemoryConfig`; afterwards
+`store`, `query` and `search` go to the provider named by
+`MemoryConfig.provider`. Agents that were never configured use Cosmos DB.
+"""
+from typing import AsyncIterator, Optional
+
+from app.core.logging import logger
+from app.models.agent import MemoryConfig
+from app.services.memory.backend import (
+    InMemoryMemoryBackend, MemoryBackend, MemoryPage, RedisMemoryBackend,
+)
+from app.services.memory.cosmos import cosmos_memory
+
+
+class MemoryRouter:
+    """Dispatches memory calls to the provider configured for each agent."""
+
+    def __init__(self, providers: dict[str, MemoryBackend], default: str = "cosmos_db"):
+        self._providers = providers
+        self._default = providers[default]
+        self._assigned: dict[tuple[str, str], MemoryBackend] = {}
+
+    def configure(self, graph_id: str, agent_id: str, config: MemoryConfig):
+        provider = self._providers.get(config.provider)
+        if provider is None:
+            raise ValueError(
+                f"Unknown memory provider '{config.provider}', expected one of {sorted(self._providers)}"
+            )
+        provider.configure(graph_id, agent_id, config)
+        self._assigned[(graph_id, agent_id)] = provider
+        logger.info("memory_configured", graph_id=graph_id, agent_id=agent_id, provider=config.provider)
+
+    def backend(self, graph_id: str, agent_id: str) -> MemoryBackend:
+        return self._assigned.get((graph_id, agent_id), self._default)
+
+    async def ensure_container(self, graph_id: str):
+        """Provision storage in every provider used by the graph's agents."""
+        used = {id(p): p for (g, _), p in self._assigned.items() if g == graph_id}
+        for provider in used.values() or [self._default]:
+            await provider.ensure_container(graph_id)
+
+    async def store(
+        self, graph_id: str, agent_id: str, memory_type: str, content: dict,
+        session_id: Optional[str] = None,
+    ):
+        await self.backend(graph_id, agent_id).store(graph_id, agent_id, memory_type, content, session_id)
+
+    async def query(
+        self, graph_id: str, agent_id: str,
+        memory_type: Optional[str] = None, limit: int = 50,
+        before: Optional[str] = None, session_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> list[dict]:
+        return await self.backend(graph_id, agent_id).query(
+            graph_id, agent_id, memory_type, limit, before, session_id, max_tokens,
+        )
+
+    def pages(
+        self, graph_id: str, agent_id: str,
+        memory_type: Optional[str] = None, page_size: int = 100,
+        continuation: Optional[str] = None, session_id: Optional[str] = None,
+    ) -> AsyncIterator[MemoryPage]:
+        return self.backend(graph_id, agent_id).pages(
+            graph_id, agent_id, memory_type, page_size, continuation, session_id,
+        )
+
+    async def search(self, graph_id: str, agent_id: str, text: str, k: int = 5) -> list[dict]:
+        return await self.backend(graph_id, agent_id).search(graph_id, agent_id, text, k)
+
+    async def close(self):
+        for provider in self._providers.values():
+            await provider.close()
+
+
+# Singleton
+memory_router = MemoryRouter({
+    "cosmos_db": cosmos_memory,
+    "in_memory": InMemoryMemoryBackend(),
+    "redis": RedisMemoryBackend(),
+})
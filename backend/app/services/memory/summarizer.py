@@ -0,0 +1,74 @@
+"""
+Rolling summaries of conversation memory.
+
+`SummarizeFn(previous, turns)` folds conversation turns (oldest first) into
+the previous summary text, if any, and returns the new summary. The default
+implementation asks the Azure OpenAI chat deployment for it.
+
+Token counts are estimated at ~4 characters per token. That is close enough
+to keep a context window under budget without a tokenizer per model.
+"""
+import json
+from typing import Awaitable, Callable, Optional
+
+from openai import AsyncAzureOpenAI
+
+from app.core.config import settings
+
+SummarizeFn = Callable[[Optional[str], list[dict]], Awaitable[str]]
+
+_CHARS_PER_TOKEN = 4
+# Role and separator overhead per entry
+_ENTRY_TOKENS = 4
+
+_PROMPT = (
+    "You maintain the running summary of a conversation between a user and an AI agent. "
+    "Merge the new turns into the existing summary. Keep facts, decisions, open questions "
+    "and user preferences; drop pleasantries. Reply with the summary only."
+)
+
+
+def content_text(content: dict) -> str:
+    text = content.get("text")
+    return text if isinstance(text, str) else json.dumps(content, sort_keys=True)
+
+
+def estimate_tokens(entry: dict) -> int:
+    """Approximate prompt tokens taken by a memory entry."""
+    return len(content_text(entry["content"])) // _CHARS_PER_TOKEN + _ENTRY_TOKENS
+
+
+class AzureOpenAISummarizer:
+    """Summarizes with the Azure OpenAI chat deployment."""
+
+    def __init__(self, max_tokens: int = settings.memory_summary_max_tokens):
+        self._max_tokens = max_tokens
+        self._client: Optional[AsyncAzureOpenAI] = None
+
+    def _get_client(self) -> AsyncAzureOpenAI:
+        if self._client is None:
+            self._client = AsyncAzureOpenAI(
+                azure_endpoint=settings.azure_openai_endpoint,
+                api_key=settings.azure_openai_api_key,
+                api_version=settings.azure_openai_api_version,
+            )
+        return self._client
+
+    async def __call__(self, previous: Optional[str], turns: list[dict]) -> str:
+        transcript = "\n".join(
+            f"{turn['content'].get('role', 'agent')}: {content_text(turn['content'])}" for turn in turns
+        )
+        response = await self._get_client().chat.completions.create(
+            model=settings.azure_openai_deployment,
+            messages=[
+                {"role": "system", "content": _PROMPT},
+                {"role": "user", "content": f"Summary so far:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"},
+            ],
+            temperature=0.2,
+            max_tokens=self._max_tokens,
+        )
+        return response.choices[0].message.content.strip()
+
+    async def close(self):
+        if self._client:
+            await self._client.close()
@@ -0,0 +1,319 @@
+"""
+Memory-mapped vector index for semantic memory.
+
+One index per graph, stored under `MEMORY_VECTOR_DIR/<graph_id>/`:
+- vectors.f32   unit-normalised float32 rows, memory-mapped and grown by doubling
+- rows.tsv      one "entry_id<TAB>agent_id" line per row, appended on add
+- removed.tsv   one entry_id per line for rows removed since the last rebuild
+- meta.json     vector dimension and file generation
+
+Removed rows (entries deleted by compaction or expired by TTL) are
+tombstoned and skipped by searches. Once at least half of the rows are
+tombstones, `rebuild` rewrites the live rows into files of the next
+generation (`vectors.<n>.f32`, ...) and switches to them by rewriting
+meta.json, so a crash mid-rebuild leaves the previous generation intact.
+
+Searches for an agent with fewer than `ivf_threshold` rows are exact (one
+matrix-vector product over its rows). Larger sets use an IVF index:
+spherical k-means centroids with inverted lists, scanning only the
+`nprobe` lists closest to the query. The IVF structures live in memory;
+they are trained on first use and retrained once the index has doubled.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Rows per matrix product when assigning vectors to centroids
+_CHUNK = 16_384
+
+# Rebuild once this fraction of the rows is removed
+_REBUILD_FRACTION = 0.5
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so a dot product is cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` largest scores, best first."""
+    if len(scores) > k:
+        idx = np.argpartition(-scores, k)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid for each row, computed in chunks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _CHUNK):
+        chunk = np.asarray(vectors[start:start + _CHUNK])
+        out[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return out
+
+
+def kmeans(sample: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over unit vectors; returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = nearest(sample, centroids)
+        counts = np.bincount(assign, minlength=nlist)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[filled])[:-1]))
+        sums = np.add.reduceat(sample[np.argsort(assign, kind="stable")], starts, axis=0)
+        centroids[filled] = normalize(sums)
+    return centroids
+
+
+class _IVF:
+    """Centroids plus inverted lists of row numbers."""
+
+    def __init__(self, centroids: np.ndarray, assign: np.ndarray):
+        self.centroids = centroids
+        order = np.argsort(assign, kind="stable")
+        bounds = np.cumsum(np.bincount(assign, minlength=len(centroids)))[:-1]
+        self.lists = np.split(order, bounds)
+        self.extra: list[list[int]] = [[] for _ in centroids]
+        self.trained_size = len(assign)
+
+    def add(self, first_row: int, vectors: np.ndarray):
+        for offset, list_no in enumerate(nearest(vectors, self.centroids)):
+            self.extra[list_no].append(first_row + offset)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        probe = top_k(self.centroids @ query, nprobe)
+        parts = [self.lists[p] for p in probe]
+        parts += [np.asarray(self.extra[p], dtype=np.int64) for p in probe if self.extra[p]]
+        return np.sort(np.concatenate(parts))
+
+
+class VectorIndex:
+    """Append-mostly, memory-mapped vector index for one graph, with tombstoned removals."""
+
+    def __init__(self, directory: str, ivf_threshold: int = 50_000, nprobe: int = 16):
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._meta_path = self._dir / "meta.json"
+        self._ivf_threshold = ivf_threshold
+        self._nprobe = nprobe
+        self._lock = threading.Lock()
+        self._reset(0)
+        self._load()
+
+    def _reset(self, generation: int):
+        self.generation = generation
+        suffix = f".{generation}" if generation else ""
+        self._vectors_path = self._dir / f"vectors{suffix}.f32"
+        self._rows_path = self._dir / f"rows{suffix}.tsv"
+        self._removed_path = self._dir / f"removed{suffix}.tsv"
+        self.dim: Optional[int] = None
+        self.size = 0
+        self.removed = 0
+        self.ids: list[str] = []
+        self._row_of: dict[str, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._codes = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._agents: dict[str, int] = {}
+        self._ivf: Optional[_IVF] = None
+
+    @property
+    def live(self) -> int:
+        return self.size - self.removed
+
+    def add(self, ids: list[str], agent_ids: list[str], vectors: np.ndarray):
+        """Append rows; `vectors` is (len(ids), dim) and need not be normalised."""
+        if not ids:
+            return
+        vectors = normalize(vectors)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._write_meta()
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            start, end = self.size, self.size + len(ids)
+            self._reserve(end)
+            self._vectors[start:end] = vectors
+            self._codes[start:end] = [self._agent_code(a) for a in agent_ids]
+            self._alive[start:end] = True
+            with self._rows_path.open("a") as f:
+                f.writelines(f"{i}\t{a}\n" for i, a in zip(ids, agent_ids))
+            self.ids.extend(ids)
+            self._row_of.update(zip(ids, range(start, end)))
+            self.size = end
+
+            if self._ivf is not None:
+                if self.size >= 2 * self._ivf.trained_size:
+                    self._ivf = None  # retrained on the next large search
+                else:
+                    self._ivf.add(start, vectors)
+
+    def remove(self, ids: list[str]) -> int:
+        """Tombstone the rows of `ids` (unknown ids are ignored); returns how many were live."""
+        with self._lock:
+            rows = [self._row_of.pop(i) for i in ids if i in self._row_of]
+            if not rows:
+                return 0
+            self._alive[rows] = False
+            self.removed += len(rows)
+            with self._removed_path.open("a") as f:
+                f.writelines(f"{self.ids[r]}\n" for r in rows)
+            return len(rows)
+
+    def needs_rebuild(self) -> bool:
+        return self.removed > 0 and self.removed >= _REBUILD_FRACTION * self.size
+
+    def rebuild(self):
+        """Rewrite the live rows into a new generation of files and drop the old ones."""
+        with self._lock:
+            if not self.removed:
+                return
+            keep = np.flatnonzero(self._alive[:self.size])
+            agents = {code: agent for agent, code in self._agents.items()}
+            old_paths = (self._vectors_path, self._rows_path, self._removed_path)
+            old_vectors, old_ids, old_codes = self._vectors, self.ids, self._codes
+            dim = self.dim
+
+            self._reset(self.generation + 1)
+            self.dim = dim
+            if len(keep):
+                self._reserve(len(keep))
+                for start in range(0, len(keep), _CHUNK):
+                    rows = keep[start:start + _CHUNK]
+                    self._vectors[start:start + len(rows)] = old_vectors[rows]
+                self._vectors.flush()
+            ids = [old_ids[r] for r in keep]
+            agent_ids = [agents[int(c)] for c in old_codes[keep]]
+            with self._rows_path.open("w") as f:
+                f.writelines(f"{i}\t{a}\n" for i, a in zip(ids, agent_ids))
+            self._codes[:len(keep)] = [self._agent_code(a) for a in agent_ids]
+            self._alive[:len(keep)] = True
+            self.ids = ids
+            self._row_of = {entry_id: row for row, entry_id in enumerate(ids)}
+            self.size = len(keep)
+            self._write_meta()
+
+            del old_vectors
+            for path in old_paths:
+                path.unlink(missing_ok=True)
+
+    def search(self, query: np.ndarray, k: int = 5, agent_id: Optional[str] = None) -> list[tuple[str, float]]:
+        """Top-`k` (entry_id, cosine similarity) pairs of live rows, optionally for one agent."""
+        with self._lock:
+            if self.live == 0:
+                return []
+            query = normalize(query)
+            code = None
+            if agent_id is not None:
+                code = self._agents.get(agent_id)
+                if code is None:
+                    return []
+
+            if code is None:
+                rows = None if not self.removed else np.flatnonzero(self._alive[:self.size])
+            else:
+                rows = np.flatnonzero((self._codes[:self.size] == code) & self._alive[:self.size])
+            count = self.size if rows is None else len(rows)
+
+            if count < self._ivf_threshold:
+                vectors = self._vectors[:self.size] if rows is None else self._vectors[rows]
+                scores = np.asarray(vectors) @ query
+                best = top_k(scores, k)
+                found = best if rows is None else rows[best]
+                return [(self.ids[r], float(scores[b])) for r, b in zip(found, best)]
+
+            if self._ivf is None:
+                self._train()
+            candidates = self._ivf.candidates(query, self._nprobe)
+            candidates = candidates[self._alive[candidates]]
+            if code is not None:
+                candidates = candidates[self._codes[candidates] == code]
+            scores = np.asarray(self._vectors[candidates]) @ query
+            best = top_k(scores, k)
+            return [(self.ids[candidates[b]], float(scores[b])) for b in best]
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+
+    def _train(self):
+        nlist = max(1, int(np.sqrt(self.size)))
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(self.size, min(self.size, nlist * 64), replace=False))
+        nlist = min(nlist, len(sample_rows))
+        centroids = kmeans(np.asarray(self._vectors[sample_rows]), nlist)
+        self._ivf = _IVF(centroids, nearest(self._vectors[:self.size], centroids))
+
+    def _reserve(self, rows: int):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        capacity = max(capacity, 1024)
+        while capacity < rows:
+            capacity *= 2
+        if self._vectors is not None:
+            self._vectors.flush()
+        with self._vectors_path.open("ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        codes = np.zeros(capacity, dtype=np.int32)
+        codes[:self.size] = self._codes[:self.size]
+        self._codes = codes
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.size] = self._alive[:self.size]
+        self._alive = alive
+
+    def _write_meta(self):
+        temporary = self._meta_path.with_suffix(".tmp")
+        temporary.write_text(json.dumps({"dim": self.dim, "generation": self.generation}))
+        os.replace(temporary, self._meta_path)
+
+    def _agent_code(self, agent_id: str) -> int:
+        code = self._agents.get(agent_id)
+        if code is None:
+            code = self._agents[agent_id] = len(self._agents)
+        return code
+
+    def _load(self):
+        if not self._meta_path.exists():
+            return
+        meta = json.loads(self._meta_path.read_text())
+        self._reset(meta.get("generation", 0))
+        self.dim = meta["dim"]
+        agent_ids = []
+        if self._rows_path.exists():
+            with self._rows_path.open() as f:
+                for line in f:
+                    entry_id, agent_id = line.rstrip("\n").split("\t")
+                    self.ids.append(entry_id)
+                    agent_ids.append(agent_id)
+        capacity = self._vectors_path.stat().st_size // (self.dim * 4) if self._vectors_path.exists() else 0
+        # rows.tsv is appended after the vectors are written, so every listed row has one
+        self.size = len(self.ids)
+        if capacity:
+            self._vectors = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim),
+            )
+        self._codes = np.zeros(capacity, dtype=np.int32)
+        self._codes[:self.size] = [self._agent_code(a) for a in agent_ids]
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[:self.size] = True
+        self._row_of = {entry_id: row for row, entry_id in enumerate(self.ids)}
+        if self._removed_path.exists():
+            with self._removed_path.open() as f:
+                rows = [self._row_of.pop(line.rstrip("\n"), None) for line in f]
+            rows = [r for r in rows if r is not None]
+            self._alive[rows] = False
+            self.removed = len(rows)
@@ -0,0 +1,430 @@
+"""
+Pluggable state backend for service registries.
+
+The A2A directory, MCP server registry, eval pipelines and deployments live
+in module-level singletons. With several uvicorn workers or replicas each
+process would see only its own registrations, so their state is mirrored
+to a backend selected by `STATE_BACKEND_URL`:
+- memory://                 In-process only (default, no mirroring overhead)
+- sqlite:///path/state.db   SQLite in WAL mode, shared by workers on one node
+- redis://host:6379/0       Any Redis-protocol server, shared across nodes
+
+Values are strings (JSON) stored under (namespace, key). Every write also
+emits a change notification; other processes re-read the key and update
+their local copy, so no sticky sessions are needed. A listener that fails
+(a locked database, a dropped pub/sub connection) logs the error and
+retries with backoff; after reconnecting to Redis, whose pub/sub does not
+replay missed messages, the registered loaders run again to resync.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.core.logging import logger
+
+ChangeCallback = Callable[[str], Awaitable[None]]
+T = TypeVar("T")
+
+# Backoff between attempts of a failing change listener, in seconds
+_RETRY_MIN = 0.5
+_RETRY_MAX = 30.0
+
+
+class StateBackend(ABC):
+    """Namespaced string key-value store with cross-process change notifications."""
+
+    # Whether other processes can see this backend's state
+    shared = True
+
+    def __init__(self):
+        self.instance_id = uuid.uuid4().hex
+        self._watchers: dict[str, list[ChangeCallback]] = {}
+        self._loaders: list[Callable[[], Awaitable[None]]] = []
+        self._started = False
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    async def set(self, namespace: str, key: str, value: str): ...
+
+    @abstractmethod
+    async def delete(self, namespace: str, key: str): ...
+
+    @abstractmethod
+    async def items(self, namespace: str) -> dict[str, str]: ...
+
+    def watch(self, namespace: str, callback: ChangeCallback):
+        """Call `callback(key)` when another process changes a key in `namespace`."""
+        self._watchers.setdefault(namespace, []).append(callback)
+
+    def on_start(self, loader: Callable[[], Awaitable[None]]):
+        """Run `loader` once the backend starts, before change notifications flow."""
+        self._loaders.append(loader)
+
+    async def start(self):
+        """Load registered state and start listening for changes from other processes."""
+        if self._started:
+            return
+        self._started = True
+        for loader in self._loaders:
+            await loader()
+        await self._listen()
+        logger.info("state_backend_started", backend=type(self).__name__)
+
+    async def close(self):
+        self._started = False
+
+    async def _listen(self):
+        """Start delivering remote changes to `_dispatch`."""
+
+    async def _dispatch(self, namespace: str, key: str, origin: str):
+        if origin == self.instance_id:
+            return
+        for callback in self._watchers.get(namespace, ()):
+            try:
+                await callback(key)
+            except Exception as e:
+                logger.error("state_change_failed", namespace=namespace, key=key, error=str(e))
+
+
+class InMemoryStateBackend(StateBackend):
+    """Process-local state. Services skip mirroring entirely when this is selected."""
+
+    shared = False
+
+    def __init__(self):
+        super().__init__()
+        self._data: dict[str, dict[str, str]] = {}
+
+    async def get(self, namespace: str, key: str) -> Optional[str]:
+        return self._data.get(namespace, {}).get(key)
+
+    async def set(self, namespace: str, key: str, value: str):
+        self._data.setdefault(namespace, {})[key] = value
+
+    async def delete(self, namespace: str, key: str):
+        self._data.get(namespace, {}).pop(key, None)
+
+    async def items(self, namespace: str) -> dict[str, str]:
+        return dict(self._data.get(namespace, {}))
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    SQLite (WAL) state shared by processes on one node.
+
+    Writes append to a `changes` log in the same transaction; each process
+    polls the log for rows it has not seen yet.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.2, change_log_size: int = 10_000):
+        super().__init__()
+        self._path = path
+        self._poll_interval = poll_interval
+        self._change_log_size = change_log_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS state (
+                namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,
+                PRIMARY KEY (namespace, key)
+            );
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL, key TEXT NOT NULL, origin TEXT NOT NULL
+            );
+            """
+        )
+        self._last_seq = self._execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        self._poller: Optional[asyncio.Task] = None
+
+    async def get(self, namespace: str, key: str) -> Optional[str]:
+        row = await self._run(
+            "SELECT value FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+        return row[0][0] if row else None
+
+    async def set(self, namespace: str, key: str, value: str):
+        await asyncio.to_thread(self._write, namespace, key, value)
+
+    async def delete(self, namespace: str, key: str):
+        await asyncio.to_thread(self._write, namespace, key, None)
+
+    async def items(self, namespace: str) -> dict[str, str]:
+        rows = await self._run("SELECT key, value FROM state WHERE namespace = ?", (namespace,))
+        return dict(rows)
+
+    async def close(self):
+        await super().close()
+        if self._poller:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        self._conn.close()
+
+    async def _listen(self):
+        self._poller = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        delay = self._poll_interval
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                rows = await self._run(
+                    "SELECT seq, namespace, key, origin FROM changes WHERE seq > ? ORDER BY seq",
+                    (self._last_seq,),
+                )
+            except Exception as e:
+                delay = min(max(2 * delay, _RETRY_MIN), _RETRY_MAX)
+                logger.error("state_listener_failed", backend="sqlite", error=str(e), retry_in=delay)
+                continue
+            delay = self._poll_interval
+            for seq, namespace, key, origin in rows:
+                self._last_seq = seq
+                await self._dispatch(namespace, key, origin)
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    async def _run(self, sql: str, params: tuple = ()) -> list[tuple]:
+        return await asyncio.to_thread(lambda: self._execute(sql, params).fetchall())
+
+    def _write(self, namespace: str, key: str, value: Optional[str]):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if value is None:
+                    self._conn.execute(
+                        "DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+                    )
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO state (namespace, key, value) VALUES (?, ?, ?)",
+                        (namespace, key, value),
+                    )
+                cursor = self._conn.execute(
+                    "INSERT INTO changes (namespace, key, origin) VALUES (?, ?, ?)",
+                    (namespace, key, self.instance_id),
+                )
+                if cursor.lastrowid % 1000 == 0:
+                    self._conn.execute(
+                        "DELETE FROM changes WHERE seq <= ?",
+                        (cursor.lastrowid - self._change_log_size,),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+class RedisStateBackend(StateBackend):
+    """
+    State in a Redis-protocol server (Redis, Valkey, ...), shared across nodes.
+
+    Each namespace is a hash; change notifications go over pub/sub.
+    """
+
+    def __init__(
+        self, url: Optional[str] = None, client: Optional[redis.Redis] = None,
+        prefix: str = "agents-platform",
+    ):
+        super().__init__()
+        self._client = client or redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._channel = f"{prefix}:changes"
+        self._listener: Optional[asyncio.Task] = None
+        self._pubsub = None
+
+    async def get(self, namespace: str, key: str) -> Optional[str]:
+        value = await self._client.hget(self._hash(namespace), key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, namespace: str, key: str, value: str):
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._hash(namespace), key, value)
+            pipe.publish(self._channel, self._change(namespace, key))
+            await pipe.execute()
+
+    async def delete(self, namespace: str, key: str):
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.hdel(self._hash(namespace), key)
+            pipe.publish(self._channel, self._change(namespace, key))
+            await pipe.execute()
+
+    async def items(self, namespace: str) -> dict[str, str]:
+        raw = await self._client.hgetall(self._hash(namespace))
+        return {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in raw.items()
+        }
+
+    async def close(self):
+        await super().close()
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._pubsub:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        await self._client.aclose()
+
+    async def _listen(self):
+        await self._subscribe()
+        self._listener = asyncio.create_task(self._consume())
+
+    async def _subscribe(self):
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self._channel)
+
+    async def _consume(self):
+        delay = _RETRY_MIN
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                    # Changes published while disconnected are not replayed
+                    for loader in self._loaders:
+                        await loader()
+                    logger.info("state_listener_reconnected", backend="redis")
+                async for message in self._pubsub.listen():
+                    delay = _RETRY_MIN
+                    await self._handle(message)
+                raise ConnectionError("pub/sub subscription ended")
+            except Exception as e:
+                logger.error("state_listener_failed", backend="redis", error=str(e), retry_in=delay)
+                if self._pubsub is not None:
+                    pubsub, self._pubsub = self._pubsub, None
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+                await asyncio.sleep(delay)
+                delay = min(2 * delay, _RETRY_MAX)
+
+    async def _handle(self, message: dict):
+        if message.get("type") != "message":
+            return
+        try:
+            change = json.loads(message["data"])
+            namespace, key, origin = change["ns"], change["key"], change["origin"]
+        except (ValueError, TypeError, KeyError):
+            logger.warning("state_change_invalid", data=str(message.get("data"))[:200])
+            return
+        await self._dispatch(namespace, key, origin)
+
+    def _hash(self, namespace: str) -> str:
+        return f"{self._prefix}:{namespace}"
+
+    def _change(self, namespace: str, key: str) -> str:
+        return json.dumps({"ns": namespace, "key": key, "origin": self.instance_id})
+
+
+class SharedMap(Generic[T]):
+    """
+    A process-local dict mirrored to a state backend namespace.
+
+    Reads are always local. Writes update the local dict and, for shared
+    backends, the backend; changes made by other processes are applied to
+    the local dict and reported through `on_change(key, value_or_None)`.
+    """
+
+    def __init__(
+        self,
+        backend: StateBackend,
+        namespace: str,
+        encode: Callable[[T], str],
+        decode: Callable[[str], T],
+        on_change: Optional[Callable[[str, Optional[T]], None]] = None,
+    ):
+        self._backend = backend
+        self._namespace = namespace
+        self._encode = encode
+        self._decode = decode
+        self._on_change = on_change
+        self._local: dict[str, T] = {}
+        if backend.shared:
+            backend.watch(namespace, self._apply_remote)
+            backend.on_start(self.load)
+
+    def get(self, key: str) -> Optional[T]:
+        return self._local.get(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._local
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+    def keys(self):
+        return self._local.keys()
+
+    def values(self):
+        return self._local.values()
+
+    def items(self):
+        return self._local.items()
+
+    async def set(self, key: str, value: T):
+        self._local[key] = value
+        if self._backend.shared:
+            await self._backend.set(self._namespace, key, self._encode(value))
+
+    async def delete(self, key: str):
+        self._local.pop(key, None)
+        if self._backend.shared:
+            await self._backend.delete(self._namespace, key)
+
+    async def clear(self):
+        for key in list(self._local):
+            await self.delete(key)
+
+    async def load(self):
+        """Replace the local copy with the backend's contents, dropping keys it no longer has."""
+        remote = await self._backend.items(self._namespace)
+        for key in [k for k in self._local if k not in remote]:
+            del self._local[key]
+            if self._on_change:
+                self._on_change(key, None)
+        for key, raw in remote.items():
+            value = self._decode(raw)
+            self._local[key] = value
+            if self._on_change:
+                self._on_change(key, value)
+
+    async def _apply_remote(self, key: str):
+        raw = await self._backend.get(self._namespace, key)
+        value = self._decode(raw) if raw is not None else None
+        if value is None:
+            self._local.pop(key, None)
+        else:
+            self._local[key] = value
+        if self._on_change:
+            self._on_change(key, value)
+
+
+def create_state_backend(url: str) -> StateBackend:
+    """Build a backend from a `memory://`, `sqlite:///path` or `redis://` URL."""
+    if url.startswith("memory://"):
+        return InMemoryStateBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteStateBackend(url.removeprefix("sqlite:///"))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateBackend(url)
+    raise ValueError(f"Unsupported STATE_BACKEND_URL: {url}")
+
+
+# Singleton
+state_backend = create_state_backend(settings.state_backend_url)
@@ -0,0 +1,88 @@
+"""
+Throughput of A2A webhook push delivery against a local stand-in receiver.
+
+Starts a minimal keep-alive HTTP server on 127.0.0.1, registers webhooks
+for a number of agents, completes N tasks and reports delivered events/s.
+
+    python -m benchmarks.bench_a2a_push --tasks 20000 --agents 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import structlog
+
+from app.services.a2a.protocol import A2ADirectory, A2ATask
+from app.services.a2a.push import PushNotificationConfig, PushNotificationService
+
+
+class StandInReceiver:
+    """Bare-bones HTTP/1.1 server that counts events in webhook batches."""
+
+    def __init__(self):
+        self.events = 0
+        self.requests = 0
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break  # client closed the connection
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            body = await reader.readexactly(length)
+            self.events += len(json.loads(body)["events"])
+            self.requests += 1
+            writer.write(b"HTTP/1.1 204 No Content\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            if self.events >= self.expected:
+                self.done.set()
+
+
+async def main(tasks: int, agents: int, batch_size: int):
+    receiver = StandInReceiver()
+    receiver.expected = tasks * 2  # pending + completed per task
+    server = await asyncio.start_server(receiver.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    directory = A2ADirectory()
+    push = PushNotificationService(directory.events, batch_size=batch_size)
+    for i in range(agents):
+        push.register(PushNotificationConfig(url=f"http://127.0.0.1:{port}/hooks/{i}"), agent_id=f"agent-{i}")
+
+    started = time.perf_counter()
+    for i in range(tasks):
+        task = await directory.send_task(
+            A2ATask(from_agent="bench", to_agent=f"agent-{i % agents}", skill_id="s", input_text="x")
+        )
+        await directory.complete_task(task.id, "ok")
+    publish_s = time.perf_counter() - started
+    await asyncio.wait_for(receiver.done.wait(), timeout=120)
+    total_s = time.perf_counter() - started
+
+    print(f"tasks={tasks} agents={agents} batch_size={batch_size}")
+    print(f"  publish (complete_task loop): {publish_s:.3f}s  ({tasks / publish_s:,.0f} tasks/s)")
+    print(f"  delivered {receiver.events:,} events in {receiver.requests:,} requests")
+    print(f"  end-to-end: {total_s:.3f}s  ({receiver.events / total_s:,.0f} events/s)")
+
+    await push.shutdown()
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=20_000)
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    # Per-task info logs would dominate the measurement
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    asyncio.run(main(args.tasks, args.agents, args.batch_size))
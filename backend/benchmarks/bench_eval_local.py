@@ -0,0 +1,156 @@
+"""
+Local F1 and similarity evaluators against LLM-judged similarity.
+
+Writes a JSONL dataset of question/answer rows (ground truths drawn from a
+small pool, as in real eval sets) and scores it with `BatchEvaluator`:
+- f1_score and similarity computed locally (`local.py`), with embeddings
+  from a stand-in that takes --embed-ms per call;
+- similarity judged per row (F1 is never judged), by a stand-in judge
+  that takes --judge-ms per call, at the configured EVAL_MAX_CONCURRENCY
+  and EVAL_REQUESTS_PER_SECOND.
+Reports rows/s and the remote calls each made. The judged run only scores
+the first --judged-rows rows; its rate is what matters.
+
+    python -m benchmarks.bench_eval_local --rows 100000 --judged-rows 200
+    python -m benchmarks.bench_eval_local --rows 2000 --judged-rows 50 --live
+
+--live uses the Azure OpenAI judge and embedding deployments instead
+(AZURE_OPENAI_* settings), and does incur their cost.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import zlib
+
+import numpy as np
+import structlog
+
+from app.core.config import settings
+from app.services.evaluation.batch import AzureOpenAIJudge, BatchEvaluator
+from app.services.evaluation.local import EmbeddingSimilarity, token_f1_scores
+from app.services.memory.embeddings import AzureOpenAIEmbedder
+
+_WORDS = (
+    "the invoice was paid on march third after the customer confirmed delivery of "
+    "twelve pallets to the warehouse in rotterdam and the refund request was closed"
+).split()
+
+_JUDGED = {
+    "similarity": {"type": "builtin", "evaluator": "azure_ai_similarity"},
+}
+
+
+class SimulatedEmbedder:
+    """Hashed bag-of-words vectors after a fixed delay per call."""
+
+    def __init__(self, delay: float, dim: int = 1536):
+        self.delay = delay
+        self.dim = dim
+        self.calls = 0
+
+    async def __call__(self, model, texts):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.split():
+                vectors[i, zlib.crc32(word.encode()) % self.dim] += 1
+        return vectors
+
+
+class SimulatedJudge:
+    """A random 1-5 grade after a fixed delay per call."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, metric, config, row):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return random.randint(0, 4) / 4
+
+
+def _dataset(path: str, rows: int, answers: int):
+    rng = random.Random(0)
+    pool = [" ".join(rng.choices(_WORDS, k=rng.randint(3, 12))) for _ in range(answers)]
+    with open(path, "w") as f:
+        for i in range(rows):
+            truth = rng.choice(pool)
+            words = truth.split()
+            response = " ".join(rng.sample(words, k=max(1, len(words) - rng.randint(0, 3))) + rng.choices(_WORDS, k=2))
+            f.write(json.dumps({"id": i, "query": f"question {i}", "response": response, "ground_truth": truth}) + "\n")
+
+
+def _head(path: str, rows: int) -> str:
+    head = f"{path}.head"
+    with open(path) as source, open(head, "w") as sink:
+        for _, line in zip(range(rows), source):
+            sink.write(line)
+    return head
+
+
+async def _timed(label: str, evaluator: BatchEvaluator, input_path: str, output_path: str, calls) -> float:
+    start = time.perf_counter()
+    summary = await evaluator.run(input_path, output_path, resume=False)
+    elapsed = time.perf_counter() - start
+    rate = summary["rows"] / elapsed
+    means = "  ".join(f"{m}={v['mean']:.3f}" for m, v in summary["metrics"].items())
+    print(f"{label:<8} {summary['rows']:>9,} rows  {elapsed:8.2f}s  {rate:>10,.0f} rows/s  {calls():>7,} calls  {means}")
+    return rate
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        data = os.path.join(directory, "data.jsonl")
+        _dataset(data, args.rows, args.answers)
+
+        if args.live:
+            embed, judge = AzureOpenAIEmbedder(), AzureOpenAIJudge()
+        else:
+            embed, judge = SimulatedEmbedder(args.embed_ms / 1000), SimulatedJudge(args.judge_ms / 1000)
+
+        local = BatchEvaluator(
+            {}, local={"f1_score": token_f1_scores, "similarity": EmbeddingSimilarity(embed, args.embedding_model)},
+            batch_size=args.batch_size,
+        )
+        local_rate = await _timed(
+            "local", local, data, os.path.join(directory, "local.jsonl"), lambda: getattr(embed, "calls", 0),
+        )
+
+        judged = BatchEvaluator(_JUDGED, judge, batch_size=args.batch_size)
+        judged_rate = await _timed(
+            "judged", judged, _head(data, args.judged_rows), os.path.join(directory, "judged.jsonl"),
+            lambda: getattr(judge, "calls", 0),
+        )
+        print(f"local is {local_rate / judged_rate:,.0f}x faster")
+
+        if args.live:
+            await embed.close()
+            await judge.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--judged-rows", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=500, help="distinct ground truths")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--embed-ms", type=float, default=150)
+    parser.add_argument("--judge-ms", type=float, default=800)
+    parser.add_argument("--embedding-model", default="text-embedding-3-large")
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    print(f"judge: concurrency {settings.eval_max_concurrency}, {settings.eval_requests_per_second:g} calls/s")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Store and query latency of the memory providers.
+
+Runs the same conversation-memory workload — N agents each appending
+turns and reloading their recent history — against every selected
+provider and reports store throughput and query p50/p95 latency.
+
+    python -m benchmarks.bench_memory_providers --providers in_memory,redis --turns 2000
+    python -m benchmarks.bench_memory_providers --providers redis --redis-url redis://localhost:6379/0
+
+The Redis provider needs a reachable server; Cosmos DB uses the
+COSMOS_DB_* settings and is skipped when they are not configured.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import numpy as np
+import structlog
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core.config import settings
+from app.models.agent import MemoryConfig
+from app.services.memory.backend import InMemoryMemoryBackend, MemoryBackend, RedisMemoryBackend
+from app.services.memory.cosmos import CosmosMemoryService
+
+
+def _provider(name: str, redis_url: str) -> Optional[MemoryBackend]:
+    if name == "in_memory":
+        return InMemoryMemoryBackend()
+    if name == "redis":
+        return RedisMemoryBackend(url=redis_url)
+    if name == "cosmos_db":
+        return CosmosMemoryService() if settings.cosmos_db_endpoint else None
+    raise ValueError(f"Unknown provider '{name}'")
+
+
+async def run(name: str, provider: MemoryBackend, agents: int, turns: int, history: int):
+    graph_id = f"bench-{int(time.time())}"
+    await provider.ensure_container(graph_id)
+    for a in range(agents):
+        provider.configure(graph_id, f"agent-{a}", MemoryConfig(provider=name, max_entries=history * 4))
+
+    content = {"role": "user", "text": "Summarise the quarterly report and list open risks." * 4}
+    store_ms, query_ms = [], []
+    start = time.perf_counter()
+    for turn in range(turns):
+        agent_id = f"agent-{turn % agents}"
+        t0 = time.perf_counter()
+        await provider.store(graph_id, agent_id, "conversation", content)
+        t1 = time.perf_counter()
+        await provider.query(graph_id, agent_id, "conversation", limit=history)
+        t2 = time.perf_counter()
+        store_ms.append((t1 - t0) * 1000)
+        query_ms.append((t2 - t1) * 1000)
+    elapsed = time.perf_counter() - start
+    await provider.close()
+
+    print(
+        f"{name:<10} {turns / elapsed:9,.0f} turns/s  "
+        f"store p50 {np.percentile(store_ms, 50):7.3f}ms p95 {np.percentile(store_ms, 95):7.3f}ms  "
+        f"query p50 {np.percentile(query_ms, 50):7.3f}ms p95 {np.percentile(query_ms, 95):7.3f}ms"
+    )
+
+
+async def main(providers: list[str], redis_url: str, agents: int, turns: int, history: int):
+    for name in providers:
+        provider = _provider(name, redis_url)
+        if provider is None:
+            print(f"{name:<10} skipped (not configured)")
+            continue
+        try:
+            await run(name, provider, agents, turns, history)
+        except (RedisConnectionError, OSError) as e:
+            print(f"{name:<10} skipped ({e})")
+            await provider.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", default="in_memory,redis,cosmos_db")
+    parser.add_argument("--redis-url", default=settings.memory_redis_url)
+    parser.add_argument("--agents", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=20, help="Entries loaded per query")
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    asyncio.run(main(args.providers.split(","), args.redis_url, args.agents, args.turns, args.history))
@@ -0,0 +1,86 @@
+"""
+Recall and latency of the semantic memory vector index.
+
+For each index size, writes clustered random vectors to a memory-mapped
+index in a temporary directory, then runs the same queries with exact
+search and with the IVF index and reports build time, p50/p95 query
+latency and IVF recall@k against exact search.
+
+    python -m benchmarks.bench_memory_vectors --sizes 10000,100000,1000000 --dim 256
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.memory.vectors import VectorIndex
+
+CHUNK = 50_000
+
+
+def _clustered(rng: np.random.Generator, centers: np.ndarray, n: int, spread: float) -> np.ndarray:
+    picks = centers[rng.integers(len(centers), size=n)]
+    return (picks + spread * rng.normal(size=picks.shape)).astype(np.float32)
+
+
+def _latencies(index: VectorIndex, queries: np.ndarray, k: int) -> tuple[list[set[str]], np.ndarray]:
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k=k)
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append({entry_id for entry_id, _ in hits})
+    return results, np.asarray(timings)
+
+
+def run(size: int, dim: int, queries: int, k: int, nprobe: int, spread: float):
+    rng = np.random.default_rng(size)
+    centers = rng.normal(size=(max(16, size // 1000), dim))
+    with tempfile.TemporaryDirectory() as directory:
+        index = VectorIndex(directory)
+        start = time.perf_counter()
+        for offset in range(0, size, CHUNK):
+            n = min(CHUNK, size - offset)
+            ids = [f"m{i}" for i in range(offset, offset + n)]
+            index.add(ids, ["agent"] * n, _clustered(rng, centers, n, spread))
+        build_s = time.perf_counter() - start
+        index.close()
+
+        query_vectors = _clustered(rng, centers, queries, spread)
+        exact = VectorIndex(directory, ivf_threshold=size + 1)
+        truth, exact_ms = _latencies(exact, query_vectors, k)
+        exact.close()
+
+        ivf = VectorIndex(directory, ivf_threshold=0, nprobe=nprobe)
+        start = time.perf_counter()
+        ivf.search(query_vectors[0], k=k)
+        train_s = time.perf_counter() - start
+        found, ivf_ms = _latencies(ivf, query_vectors, k)
+        ivf.close()
+
+    recall = np.mean([len(t & f) / len(t) for t, f in zip(truth, found)])
+    print(
+        f"{size:>9,}  build {build_s:6.1f}s  "
+        f"exact p50 {np.percentile(exact_ms, 50):7.2f}ms p95 {np.percentile(exact_ms, 95):7.2f}ms  "
+        f"ivf train {train_s:5.1f}s p50 {np.percentile(ivf_ms, 50):6.2f}ms "
+        f"p95 {np.percentile(ivf_ms, 95):6.2f}ms  recall@{k} {recall:.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--spread", type=float, default=2.0, help="Noise around cluster centres")
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args.dim, args.queries, args.k, args.nprobe, args.spread)
+
+
+if __name__ == "__main__":
+    main()
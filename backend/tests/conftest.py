@@ -0,0 +1,8 @@
+"""Helpers shared across the test modules."""
+from app.services.a2a.protocol import A2ATask
+
+
+def make_task(**kwargs) -> A2ATask:
+    fields = {"from_agent": "a", "to_agent": "worker", "skill_id": "s", "input_text": "hello"}
+    fields.update(kwargs)
+    return A2ATask(**fields)
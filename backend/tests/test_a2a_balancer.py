@@ -0,0 +1,98 @@
+"""Tests for skill-addressed A2A routing."""
+import asyncio
+
+import pytest
+
+from app.models.agent import A2AAgentCard, A2ASkill
+from app.services.a2a.balancer import NoAgentAvailableError, SkillRouter
+from app.services.a2a.engine import A2ATaskEngine
+from app.services.a2a.protocol import A2ADirectory, A2ATask
+
+
+def _card(name: str) -> A2AAgentCard:
+    return A2AAgentCard(
+        name=name, description=name, url=f"/a2a/{name}",
+        skills=[A2ASkill(id="summarize", name="Summarize", description="Summaries")],
+    )
+
+
+def _task() -> A2ATask:
+    return A2ATask(from_agent="orchestrator", to_agent="", skill_id="summarize", input_text="text")
+
+
+async def _setup(*agents: str, **router_kwargs):
+    directory = A2ADirectory()
+    engine = A2ATaskEngine(directory, concurrency=1)
+    for agent_id in agents:
+        await directory.register_agent(agent_id, _card(agent_id))
+    return directory, engine, SkillRouter(directory, engine, **router_kwargs)
+
+
+@pytest.mark.asyncio
+async def test_routes_to_least_outstanding_agent():
+    directory, engine, router = await _setup("s1", "s2")
+    gate = asyncio.Event()
+
+    async def handler(task: A2ATask) -> str:
+        await gate.wait()
+        return "ok"
+
+    engine.register_handler("s1", handler)
+    engine.register_handler("s2", handler)
+
+    targets = [(await router.submit("summarize", _task())).to_agent for _ in range(4)]
+    assert sorted(targets) == ["s1", "s1", "s2", "s2"]
+    assert directory.agents_with_skill("Summarize") == ["s1", "s2"]
+    gate.set()
+    await engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_failing_agent_excluded_until_cooldown():
+    directory, engine, router = await _setup("bad", "good", failure_threshold=2, cooldown_seconds=60)
+    engine.register_handler("good", lambda task: asyncio.sleep(0, result="ok"))
+
+    async def broken(task: A2ATask) -> str:
+        raise RuntimeError("boom")
+
+    engine.register_handler("bad", broken)
+    for _ in range(2):
+        task = await engine.submit(_task().model_copy(update={"to_agent": "bad"}))
+        while (await directory.get_task(task.id)).status != "failed":
+            await asyncio.sleep(0.01)
+
+    assert router.candidates("summarize") == ["good"]
+    assert (await router.submit("summarize", _task())).to_agent == "good"
+    assert router.health()["bad"]["excluded_for_seconds"] > 0
+    await engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cold_agent_with_backlog_not_preferred_under_ewma():
+    directory, engine, router = await _setup("warm", "cold", strategy="ewma_latency")
+    gate = asyncio.Event()
+
+    async def handler(task: A2ATask) -> str:
+        await gate.wait()
+        return "ok"
+
+    engine.register_handler("warm", handler)
+    engine.register_handler("cold", handler)
+    engine._get_queue("warm").record_run(100.0)
+    for _ in range(3):
+        await engine.submit(A2ATask(from_agent="orchestrator", to_agent="cold", skill_id="summarize", input_text="x"))
+
+    # cold has never finished a task: assumed as slow as its peers, so its backlog counts
+    assert router.pick("summarize") == "warm"
+    assert (await router.submit("summarize", _task())).to_agent == "warm"
+    gate.set()
+    await engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_unknown_skill_raises():
+    _, engine, router = await _setup("s1")
+    with pytest.raises(NoAgentAvailableError) as exc:
+        await router.submit("translate", _task())
+    assert exc.value.reason == "unknown_skill"
+    await engine.shutdown()
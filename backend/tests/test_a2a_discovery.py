@@ -0,0 +1,58 @@
+"""Tests for cached A2A discovery routes."""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.agent import A2AAgentCard, A2ASkill
+from app.services.a2a.protocol import a2a_directory
+
+client = TestClient(app)
+
+
+def _card(version: str = "1.0.0") -> A2AAgentCard:
+    return A2AAgentCard(
+        name="Researcher",
+        description="Finds sources",
+        url="/a2a/researcher",
+        skills=[A2ASkill(id="search", name="search", description="Web search")],
+        version=version,
+    )
+
+
+def test_agent_card_etag_and_304():
+    asyncio.run(a2a_directory.register_agent("researcher", _card()))
+    try:
+        first = client.get("/a2a/researcher/agent.json")
+        assert first.status_code == 200
+        assert first.json()["name"] == "Researcher"
+        etag = first.headers["etag"]
+        assert "must-revalidate" in first.headers["cache-control"]
+
+        cached = client.get("/a2a/researcher/agent.json", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        asyncio.run(a2a_directory.register_agent("researcher", _card(version="2.0.0")))
+        changed = client.get("/a2a/researcher/agent.json", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+    finally:
+        asyncio.run(a2a_directory.unregister_agent("researcher"))
+
+
+def test_directory_listing_invalidated_on_mutation():
+    empty = client.get("/a2a/directory")
+    asyncio.run(a2a_directory.register_agent("researcher", _card()))
+    try:
+        listing = client.get("/a2a/directory", headers={"If-None-Match": empty.headers["etag"]})
+        assert listing.status_code == 200
+        assert [a["name"] for a in listing.json()["agents"]] == ["Researcher"]
+
+        by_skill = client.get("/a2a/directory?skill=search")
+        assert by_skill.json() == listing.json()
+        assert client.get("/a2a/directory?skill=missing").json() == {"agents": []}
+    finally:
+        asyncio.run(a2a_directory.unregister_agent("researcher"))
+
+    assert client.get("/a2a/directory").headers["etag"] == empty.headers["etag"]
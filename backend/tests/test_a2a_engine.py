@@ -0,0 +1,109 @@
+"""Tests for the A2A task execution engine."""
+import asyncio
+
+import pytest
+
+from app.services.a2a.engine import A2ATaskEngine, QueueFullError
+from app.services.a2a.protocol import A2ADirectory, A2ATask
+from tests.conftest import make_task
+
+
+async def _wait_for_status(directory: A2ADirectory, task_id: str, status: str):
+    for _ in range(100):
+        task = await directory.get_task(task_id)
+        if task.status == status:
+            return task
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"task {task_id} never reached {status}: {task.status}")
+
+
+@pytest.mark.asyncio
+async def test_tasks_run_in_priority_order():
+    directory = A2ADirectory()
+    engine = A2ATaskEngine(directory, concurrency=1)
+    order: list[str] = []
+    gate = asyncio.Event()
+
+    async def handler(task: A2ATask) -> str:
+        await gate.wait()
+        order.append(task.input_text)
+        return task.input_text.upper()
+
+    engine.register_handler("worker", handler)
+    await engine.submit(make_task(input_text="first"))
+    await asyncio.sleep(0)  # first task is picked up before the others are queued
+    low = await engine.submit(make_task(input_text="low", metadata={"priority": "low"}))
+    high = await engine.submit(make_task(input_text="high", metadata={"priority": "high"}))
+    gate.set()
+
+    await _wait_for_status(directory, low.id, "completed")
+    assert (await directory.get_task(high.id)).output_text == "HIGH"
+    assert order == ["first", "high", "low"]
+    assert engine.metrics()["worker"]["completed"] == 3
+    await engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_submissions():
+    engine = A2ATaskEngine(A2ADirectory(), concurrency=1, max_queue_depth=1)
+    engine.register_handler("worker", lambda task: asyncio.sleep(1, result=""))
+
+    await engine.submit(make_task())
+    await asyncio.sleep(0)  # first task moves from the queue to the worker
+    await engine.submit(make_task())
+    with pytest.raises(QueueFullError):
+        await engine.submit(make_task())
+    assert engine.metrics()["worker"]["rejected"] == 1
+    await engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_lowered_concurrency_retires_only_extra_workers():
+    directory = A2ADirectory()
+    engine = A2ATaskEngine(directory, concurrency=4)
+    gate = asyncio.Event()
+
+    async def handler(task: A2ATask) -> str:
+        await gate.wait()
+        return ""
+
+    engine.register_handler("worker", handler)
+    tasks = [await engine.submit(make_task()) for _ in range(8)]
+    await asyncio.sleep(0.01)
+    assert engine.metrics()["worker"]["running"] == 4
+
+    engine.configure_agent("worker", concurrency=2)
+    gate.set()
+    for task in tasks:
+        await _wait_for_status(directory, task.id, "completed")
+    assert engine.metrics()["worker"]["workers"] == 2
+    await engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued_and_running_tasks():
+    directory = A2ADirectory()
+    engine = A2ATaskEngine(directory, concurrency=1)
+    engine.register_handler("worker", lambda task: asyncio.sleep(10, result=""))
+
+    running = await engine.submit(make_task())
+    queued = await engine.submit(make_task())
+    await _wait_for_status(directory, running.id, "in_progress")
+
+    assert (await engine.cancel(queued.id)).status == "cancelled"
+    assert (await engine.cancel(running.id)).status == "cancelled"
+    await asyncio.sleep(0.01)
+    assert engine.metrics()["worker"]["cancelled"] == 2
+    assert engine.metrics()["worker"]["running"] == 0
+    await engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_task_without_handler_fails():
+    directory = A2ADirectory()
+    engine = A2ATaskEngine(directory)
+
+    task = await engine.submit(make_task())
+    failed = await _wait_for_status(directory, task.id, "failed")
+    assert "No handler" in failed.metadata["error"]
+    await engine.shutdown()
@@ -0,0 +1,66 @@
+"""Tests for A2A task event streaming."""
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.a2a.engine import A2ATaskEngine
+from app.services.a2a.events import TaskEventBus
+from app.services.a2a.protocol import A2ADirectory, A2ATask, a2a_directory
+from tests.conftest import make_task
+
+client = TestClient(app)
+
+
+@pytest.mark.asyncio
+async def test_streams_status_and_partial_output():
+    directory = A2ADirectory()
+    engine = A2ATaskEngine(directory)
+
+    async def handler(task: A2ATask):
+        yield "hel"
+        yield "lo"
+
+    engine.register_handler("worker", handler)
+    agent_sub = directory.events.subscribe(agent_id="worker")
+    task = await engine.submit(make_task())
+    task_sub = directory.events.subscribe(task_id=task.id)
+
+    received = [(e.event, json.loads(e.data)) async for e in task_sub.events()]
+    assert [name for name, _ in received] == ["status", "output", "output", "status"]
+    assert received[-1][1]["status"] == "completed"
+    assert received[-1][1]["output_text"] == "hello"
+    assert agent_sub.queue.qsize() == 5  # pending, in_progress, 2 chunks, completed
+    await engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_dropped():
+    bus = TaskEventBus(buffer_size=2)
+    slow = bus.subscribe(agent_id="worker")
+    for _ in range(3):
+        bus.publish_output("t1", "a", "worker", "x")
+
+    events = [e.event async for e in slow.events()]
+    assert events == ["dropped"]
+    assert bus.dropped == 1
+    assert not bus.active
+
+
+def test_subscribe_to_finished_task_returns_snapshot():
+    task = asyncio.run(a2a_directory.send_task(make_task()))
+    asyncio.run(a2a_directory.complete_task(task.id, "done"))
+
+    with client.stream("GET", f"/a2a/tasks/{task.id}/subscribe") as response:
+        body = response.read().decode()
+    assert response.status_code == 200
+    assert "event: snapshot" in body
+    assert '"output_text":"done"' in body
+
+
+def test_subscribe_to_unknown_task_404():
+    response = client.get("/a2a/tasks/task-missing/subscribe")
+    assert response.status_code == 404
+    assert not a2a_directory.events.active
@@ -0,0 +1,109 @@
+"""Tests for A2A webhook push notifications."""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.main import app
+from app.services.a2a.protocol import A2ADirectory
+from app.services.a2a.push import PushNotificationConfig, PushNotificationService
+from tests.conftest import make_task
+
+
+class Receiver:
+    """Stand-in webhook receiver that fails the first `failures` requests."""
+
+    def __init__(self, failures: int = 0, status: int = 503, delay: float = 0.0):
+        self.failures = failures
+        self.status = status
+        self.delay = delay
+        self.batches: list[dict] = []
+        self.headers: list[httpx.Headers] = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            return httpx.Response(self.status)
+        self.batches.append(json.loads(request.content))
+        self.headers.append(request.headers)
+        return httpx.Response(204)
+
+
+def _service(directory: A2ADirectory, receiver: Receiver, **kwargs) -> PushNotificationService:
+    return PushNotificationService(
+        directory.events, transport=httpx.MockTransport(receiver),
+        linger=0.01, backoff_base=0.001, **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_agent_events_coalesced_into_batches():
+    directory = A2ADirectory()
+    receiver = Receiver()
+    push = _service(directory, receiver)
+    push.register(PushNotificationConfig(url="http://hooks.test/a2a", token="secret"), agent_id="worker")
+
+    tasks = [await directory.send_task(make_task()) for _ in range(5)]
+    for task in tasks:
+        await directory.complete_task(task.id, "ok")
+    await push.shutdown()
+
+    events = [e for batch in receiver.batches for e in batch["events"]]
+    assert len(events) == 10
+    assert len(receiver.batches) == 1
+    assert receiver.headers[0]["X-A2A-Notification-Token"] == "secret"
+
+
+@pytest.mark.asyncio
+async def test_task_webhook_retries_then_retires_after_final_event():
+    directory = A2ADirectory()
+    receiver = Receiver(failures=2)
+    push = _service(directory, receiver)
+    task = await directory.send_task(make_task())
+    push.register(PushNotificationConfig(url="http://hooks.test/a2a"), task_id=task.id)
+
+    await directory.complete_task(task.id, "ok")
+    await push.shutdown()
+
+    assert receiver.batches[0]["events"][0]["status"] == "completed"
+    assert push.metrics()["webhooks"] == 0
+    assert not directory.events.active
+
+
+@pytest.mark.asyncio
+async def test_permanent_failure_goes_to_dead_letters():
+    directory = A2ADirectory()
+    push = _service(directory, Receiver(failures=10, status=400))
+    push.register(PushNotificationConfig(url="http://hooks.test/a2a"), agent_id="worker")
+
+    await directory.send_task(make_task())
+    await push.shutdown()
+
+    assert len(push.dead_letters) == 1
+    assert push.dead_letters[0]["error"] == "HTTP 400"
+
+
+@pytest.mark.asyncio
+async def test_slow_receiver_does_not_block_complete_task():
+    directory = A2ADirectory()
+    push = _service(directory, Receiver(delay=1.0))
+    push.register(PushNotificationConfig(url="http://hooks.test/a2a"), agent_id="worker")
+    task = await directory.send_task(make_task())
+
+    await asyncio.wait_for(directory.complete_task(task.id, "ok"), timeout=0.05)
+    await push.shutdown(timeout=0)
+
+
+@pytest.mark.parametrize("url", ["ftp://hooks.example.com/in", "hooks.example.com/in", "http://", "http://host:port/x"])
+def test_webhook_urls_must_be_http(url):
+    with pytest.raises(ValidationError):
+        PushNotificationConfig(url=url)
+
+
+def test_invalid_webhook_url_rejected_by_api():
+    response = TestClient(app).post("/a2a/writer/webhooks", json={"url": "file:///etc/passwd"})
+    assert response.status_code == 422
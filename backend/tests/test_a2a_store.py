@@ -0,0 +1,83 @@
+"""Tests for the compact A2A task store."""
+import threading
+import time
+
+import pytest
+
+from app.services.a2a.protocol import A2ADirectory
+from app.services.a2a.store import CompactTask, TaskStore, _SpillStore
+from tests.conftest import make_task
+
+
+def test_compact_task_round_trip():
+    task = make_task(metadata={"priority": "high"})
+    fields = CompactTask.from_task(task).as_fields()
+    assert fields["id"] == task.id
+    assert fields["metadata"] == {"priority": "high"}
+    assert fields["created_at"][:23] == task.created_at[:23]
+
+
+def test_finished_tasks_evicted_by_count():
+    store = TaskStore(max_age_seconds=None, max_finished=2)
+    for i in range(4):
+        store.put(CompactTask.from_task(make_task(id=f"t{i}")))
+        store.update(f"t{i}", status="completed", output_text="ok")
+    store.put(CompactTask.from_task(make_task(id="live")))
+
+    assert store.get("t0") is None
+    assert store.get("t1") is None
+    assert store.get("t3").output_text == "ok"
+    assert store.get("live").status == "pending"
+
+
+def test_finished_tasks_evicted_by_age():
+    store = TaskStore(max_age_seconds=60, max_finished=None)
+    store.put(CompactTask.from_task(make_task(id="old")))
+    store.put(CompactTask.from_task(make_task(id="recent")))
+    store.update("old", status="failed", completed_at=0)
+    store.update("recent", status="failed")
+    assert store.get("old") is None
+    assert store.get("recent").status == "failed"
+
+
+@pytest.mark.asyncio
+async def test_spilled_tasks_readable_through_directory(tmp_path):
+    directory = A2ADirectory(
+        TaskStore(max_age_seconds=None, max_finished=1, spill_path=str(tmp_path / "tasks.db"))
+    )
+    first = await directory.send_task(make_task())
+    second = await directory.send_task(make_task())
+    await directory.complete_task(first.id, "one")
+    await directory.complete_task(second.id, "two")
+
+    assert [t.id for t in await directory.list_tasks()] == [second.id]
+    spilled = await directory.get_task(first.id)
+    assert spilled.status == "completed"
+    assert spilled.output_text == "one"
+
+
+def test_spill_written_off_the_calling_thread(tmp_path, monkeypatch):
+    writers = []
+    flush = _SpillStore.flush
+
+    def recording_flush(self):
+        writers.append(threading.current_thread())
+        flush(self)
+
+    monkeypatch.setattr(_SpillStore, "flush", recording_flush)
+    store = TaskStore(max_age_seconds=None, max_finished=0, spill_path=str(tmp_path / "tasks.db"))
+    for i in range(50):
+        store.put(CompactTask(f"t{i}", "a", "b", "s", "hello", status="completed"))
+
+    # Queued tasks are readable before the writer commits them
+    assert store.get("t49").status == "completed"
+    deadline = time.monotonic() + 5
+    while store._spill._queued and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not store._spill._queued
+    assert writers and all(t is not threading.current_thread() for t in writers)
+    store.close()
+
+    reopened = _SpillStore(str(tmp_path / "tasks.db"))
+    assert reopened.get("t0").input_text == "hello" and reopened.get("t49") is not None
+    reopened.close()
@@ -0,0 +1,304 @@
+"""Tests for batch evaluation."""
+import asyncio
+import json
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+from app.models.agent import CustomEvaluator, EvalConfig, EvalMetric
+from app.services.evaluation import batch
+from app.services.evaluation.batch import AzureOpenAIJudge, BatchEvaluator, RateLimiter
+from app.services.evaluation.evaluator import EvaluationService
+from app.services.evaluation.local import EmbeddingSimilarity, token_f1, token_f1_scores
+from app.services.memory.embeddings import AzureOpenAIEmbedder
+from app.services.state.backend import InMemoryStateBackend
+
+
+class Crash(BaseException):
+    """Stands in for the process dying mid-run."""
+
+
+class FakeJudge:
+    """Scores a row by the length of its response; tracks calls in flight."""
+
+    def __init__(self, delay: float = 0.0, fail: tuple = (), crash_after: int = 0):
+        self.delay = delay
+        self.fail = fail
+        self.crash_after = crash_after
+        self.calls = []
+        self.inflight = 0
+        self.max_inflight = 0
+
+    async def __call__(self, metric, config, row):
+        self.calls.append((metric, row.get("id")))
+        if self.crash_after and len(self.calls) > self.crash_after:
+            raise Crash()
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.inflight -= 1
+        if row.get("id") in self.fail:
+            raise RuntimeError("judge unavailable")
+        return min(1.0, len(row["response"]) / 10)
+
+
+def _dataset(path, rows: int, invalid: tuple = ()):
+    with open(path, "w") as f:
+        for i in range(rows):
+            row = {"id": i, "query": "q", "response": "x" * (i % 11)}
+            f.write("not json\n" if i in invalid else json.dumps(row) + "\n")
+        f.write("\n")
+
+
+def _results(path) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+async def _non_empty(rows):
+    return np.array([1.0 if row["response"] else 0.0 for row in rows])
+
+
+@pytest.mark.asyncio
+async def test_batch_run_scores_every_row_in_order(tmp_path):
+    _dataset(tmp_path / "data.jsonl", 50, invalid=(7,))
+    judge = FakeJudge(delay=0.01, fail=(3,))
+    evaluator = BatchEvaluator(
+        {"relevance": {"type": "builtin"}}, judge, local={"non_empty": _non_empty},
+        batch_size=8, concurrency=4, requests_per_second=0, max_attempts=2, backoff_base=0.01,
+    )
+
+    summary = await evaluator.run(str(tmp_path / "data.jsonl"), str(tmp_path / "out.jsonl"))
+
+    results = _results(tmp_path / "out.jsonl")
+    assert [r["row"] for r in results] == list(range(50))
+    assert results[7]["errors"] == {"row": "invalid JSON object"} and results[7]["scores"]["non_empty"] is None
+    assert results[3]["errors"] == {"relevance": "judge unavailable"}
+    assert results[3]["scores"] == {"relevance": None, "non_empty": 1.0}
+    assert results[5]["scores"] == {"relevance": 0.5, "non_empty": 1.0}
+    assert judge.max_inflight == 4
+    # Failed calls are retried once
+    assert judge.calls.count(("relevance", 3)) == 2
+
+    expected = [min(1.0, (i % 11) / 10) for i in range(50) if i not in (3, 7)]
+    assert summary["rows"] == 50 and summary["errors"] == 2
+    assert summary["metrics"]["relevance"]["scored"] == 48
+    assert summary["metrics"]["relevance"]["mean"] == pytest.approx(np.mean(expected), abs=1e-4)
+    assert summary["metrics"]["relevance"]["pass_rate"] == pytest.approx(np.mean([s >= 0.7 for s in expected]), abs=1e-4)
+
+
+@pytest.mark.asyncio
+async def test_interrupted_run_resumes_from_checkpoint(tmp_path):
+    _dataset(tmp_path / "data.jsonl", 40)
+    args = (str(tmp_path / "data.jsonl"), str(tmp_path / "out.jsonl"))
+    options = {"batch_size": 5, "concurrency": 5, "requests_per_second": 0}
+
+    crashing = FakeJudge(crash_after=17)
+    with pytest.raises(Crash):
+        await BatchEvaluator({"relevance": {"type": "builtin"}}, crashing, **options).run(*args)
+    partial = _results(tmp_path / "out.jsonl")
+    assert 0 < len(partial) < 40
+
+    judge = FakeJudge()
+    summary = await BatchEvaluator({"relevance": {"type": "builtin"}}, judge, **options).run(*args)
+
+    assert [r["row"] for r in _results(tmp_path / "out.jsonl")] == list(range(40))
+    assert len(judge.calls) == 40 - len(partial)
+    assert summary["rows"] == 40 and summary["metrics"]["relevance"]["scored"] == 40
+
+    # A finished run resumes to its summary; resume=False starts over
+    assert await BatchEvaluator({"relevance": {"type": "builtin"}}, judge, **options).run(*args) == summary
+    assert len(judge.calls) == 40 - len(partial)
+    await BatchEvaluator({"relevance": {"type": "builtin"}}, judge, **options).run(*args, resume=False)
+    assert len(_results(tmp_path / "out.jsonl")) == 40
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_ahead_of_output_ignored(tmp_path):
+    _dataset(tmp_path / "data.jsonl", 10)
+    args = (str(tmp_path / "data.jsonl"), str(tmp_path / "out.jsonl"))
+    options = {"batch_size": 4, "requests_per_second": 0}
+    await BatchEvaluator({"relevance": {"type": "builtin"}}, FakeJudge(), **options).run(*args)
+
+    # The output was replaced by a shorter file: resuming would pad it with NULs
+    with open(tmp_path / "out.jsonl", "w") as f:
+        f.write("{}\n")
+    judge = FakeJudge()
+    summary = await BatchEvaluator({"relevance": {"type": "builtin"}}, judge, **options).run(*args)
+
+    assert len(judge.calls) == 10 and summary["rows"] == 10
+    assert [r["row"] for r in _results(tmp_path / "out.jsonl")] == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_file_io_off_the_event_loop(tmp_path, monkeypatch):
+    writes, reads = [], []
+    real_fsync, real_read_rows = os.fsync, batch._read_rows
+
+    def fsync(fd):
+        writes.append(threading.get_ident())
+        real_fsync(fd)
+
+    def read_rows(source, count):
+        reads.append(threading.get_ident())
+        return real_read_rows(source, count)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    monkeypatch.setattr(batch, "_read_rows", read_rows)
+    _dataset(tmp_path / "data.jsonl", 6)
+    await BatchEvaluator(
+        {"relevance": {"type": "builtin"}}, FakeJudge(), batch_size=2, requests_per_second=0,
+    ).run(str(tmp_path / "data.jsonl"), str(tmp_path / "out.jsonl"))
+
+    assert len(writes) == 3 and len(reads) == 4
+    assert threading.get_ident() not in writes + reads
+
+
+def test_invalid_settings_rejected_up_front():
+    with pytest.raises(ValueError):
+        BatchEvaluator({"relevance": {"type": "builtin"}}, FakeJudge(), max_attempts=0)
+    with pytest.raises(ValueError):
+        BatchEvaluator({"tone": {"type": "custom", "prompt_template": "{response}", "scoring": "pass/fail"}}, FakeJudge())
+    with pytest.raises(ValueError):
+        BatchEvaluator({"tone": {"type": "custom", "prompt_template": "{response}", "scoring": "5-5"}}, FakeJudge())
+    BatchEvaluator({"tone": {"type": "custom", "prompt_template": "{response}", "scoring": "0 - 10"}}, FakeJudge())
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(100)
+    start = time.perf_counter()
+    await asyncio.gather(*(limiter.acquire() for _ in range(11)))
+    assert time.perf_counter() - start >= 0.095
+
+
+@pytest.mark.asyncio
+async def test_run_batch_uses_pipeline_evaluators(tmp_path):
+    judge = FakeJudge()
+    service = EvaluationService(InMemoryStateBackend(), judge=judge)
+    pipeline_id = await service.create_pipeline("g1", EvalConfig(
+        metrics=[EvalMetric.RELEVANCE],
+        custom_evaluators=[CustomEvaluator(name="tone", prompt_template="{response}")],
+        threshold=0.5,
+    ))
+    _dataset(tmp_path / "data.jsonl", 4)
+
+    summary = await service.run_batch(pipeline_id, str(tmp_path / "data.jsonl"), str(tmp_path / "out.jsonl"))
+
+    assert set(summary["metrics"]) == {"relevance", "tone"}
+    assert summary["threshold"] == 0.5
+    assert {metric for metric, _ in judge.calls} == {"relevance", "tone"}
+    assert await service.run_batch("eval-missing", "in", "out") is None
+
+
+class FakeEmbedder:
+    """Bag-of-words vectors: cosine similarity tracks shared words."""
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+        self.calls = []
+
+    async def __call__(self, model, texts):
+        self.calls.append(list(texts))
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, zlib.crc32(word.encode()) % self.dim] += 1
+        return vectors
+
+
+def test_token_f1_normalizes_and_takes_best_reference():
+    assert token_f1("The Eiffel Tower!", "eiffel tower") == 1.0
+    assert token_f1("in Paris, France", "Paris") == pytest.approx(2 * (1 / 3) / (1 / 3 + 1))
+    assert token_f1("", "") == 1.0 and token_f1("a", "Paris") == 0.0
+
+    scores = asyncio.run(token_f1_scores([
+        {"response": "Paris", "ground_truth": ["London", "Paris"]},
+        {"response": "Paris"},
+        {"ground_truth": "Paris"},
+    ]))
+    assert scores[0] == 1.0 and np.isnan(scores[1]) and scores[2] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_similarity_embeds_each_text_once_per_batch():
+    embed = FakeEmbedder()
+    rows = [
+        {"response": "red apple pie", "ground_truth": ["green pear", "apple pie"]},
+        {"response": "red apple pie", "ground_truth": "apple pie"},
+        {"response": "", "ground_truth": "apple pie"},
+        {"response": "anything"},
+    ]
+
+    scores = await EmbeddingSimilarity(embed, "model")(rows)
+
+    assert embed.calls == [["red apple pie", "green pear", "apple pie"]]
+    vectors = await FakeEmbedder()("model", ["red apple pie", "apple pie"])
+    expected = vectors[0] @ vectors[1] / np.linalg.norm(vectors[0]) / np.linalg.norm(vectors[1])
+    assert scores[:2] == pytest.approx([expected, expected])
+    assert scores[2] == 0.0 and np.isnan(scores[3])
+
+
+@pytest.mark.asyncio
+async def test_local_metrics_selected_from_eval_config(tmp_path):
+    judge, embed = FakeJudge(), FakeEmbedder()
+    service = EvaluationService(InMemoryStateBackend(), judge=judge, embed=embed)
+    metrics = [EvalMetric.RELEVANCE, EvalMetric.SIMILARITY, EvalMetric.F1_SCORE]
+
+    remote_id = await service.create_pipeline("g1", EvalConfig(metrics=metrics, local_metrics=False))
+    remote = (await service.get_pipeline(remote_id))["evaluators"]
+    assert remote["relevance"]["type"] == remote["similarity"]["type"] == "builtin"
+    assert remote["f1_score"] == {"type": "local", "evaluator": "token_f1"}
+
+    pipeline_id = await service.create_pipeline("g1", EvalConfig(metrics=metrics))
+    evaluators = (await service.get_pipeline(pipeline_id))["evaluators"]
+    assert evaluators["similarity"]["type"] == evaluators["f1_score"]["type"] == "local"
+
+    with open(tmp_path / "data.jsonl", "w") as f:
+        for i in range(6):
+            f.write(json.dumps({"id": i, "query": "q", "response": "apple pie", "ground_truth": "apple pie"}) + "\n")
+    summary = await service.run_batch(pipeline_id, str(tmp_path / "data.jsonl"), str(tmp_path / "out.jsonl"))
+
+    assert {metric for metric, _ in judge.calls} == {"relevance"}
+    assert len(embed.calls) == 1
+    assert summary["metrics"]["f1_score"]["mean"] == summary["metrics"]["similarity"]["mean"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_run_evaluation_scores_against_ground_truth():
+    judge, embed = FakeJudge(), FakeEmbedder()
+    service = EvaluationService(InMemoryStateBackend(), judge=judge, embed=embed)
+    metrics = [EvalMetric.RELEVANCE, EvalMetric.SIMILARITY, EvalMetric.F1_SCORE]
+    pipeline_id = await service.create_pipeline("g1", EvalConfig(metrics=metrics))
+
+    scores = await service.run_evaluation(pipeline_id, "q", "apple pie", ground_truth=["pear", "apple pie"])
+    assert scores == {"relevance": 0.9, "similarity": 1.0, "f1_score": 1.0}
+    assert [metric for metric, _ in judge.calls] == ["relevance"]
+
+    scores = await service.run_evaluation(pipeline_id, "q", "apple pie")
+    assert scores == {"relevance": 0.9, "similarity": None, "f1_score": None}
+    assert await service.run_evaluation("eval-missing", "q", "apple pie") == {}
+
+
+class Client:
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_service_closes_the_clients_it_created():
+    service = EvaluationService(InMemoryStateBackend())
+    assert isinstance(service._judge, AzureOpenAIJudge) and isinstance(service._embed, AzureOpenAIEmbedder)
+    service._judge._client, service._embed._client = Client(), Client()
+    judge, embed = service._judge._client, service._embed._client
+
+    await service.close()
+    assert judge.closed and embed.closed
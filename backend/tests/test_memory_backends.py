@@ -0,0 +1,108 @@
+"""Tests for the in-memory and Redis memory providers."""
+import pytest
+
+from app.models.agent import MemoryConfig
+from app.services.memory import backend as memory_backend
+from app.services.memory.backend import InMemoryMemoryBackend, RedisMemoryBackend, new_id
+from app.services.memory.router import MemoryRouter
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _providers() -> list:
+    return [InMemoryMemoryBackend(), RedisMemoryBackend(client=fakeredis.FakeAsyncRedis())]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("provider", _providers(), ids=["in_memory", "redis"])
+async def test_provider_caps_entries_and_filters_by_type(provider):
+    provider.configure("g1", "writer", MemoryConfig(max_entries=3))
+    for i in range(5):
+        await provider.store("g1", "writer", "conversation" if i % 2 == 0 else "episodic", {"turn": i})
+
+    assert [e["content"]["turn"] for e in await provider.query("g1", "writer")] == [4, 3, 2]
+    assert [e["content"]["turn"] for e in await provider.query("g1", "writer", "conversation", limit=2)] == [4, 2]
+    assert await provider.query("g1", "editor") == []
+    await provider.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("provider", _providers(), ids=["in_memory", "redis"])
+async def test_provider_session_scoped_queries(provider):
+    for i in range(4):
+        await provider.store("g1", "writer", "conversation" if i < 3 else "episodic", {"turn": i}, session_id=f"s{i % 2}")
+
+    assert [e["content"]["turn"] for e in await provider.query("g1", "writer", session_id="s1")] == [3, 1]
+    assert [e["content"]["turn"] for e in await provider.query("g1", "writer", "conversation", session_id="s1")] == [1]
+    assert len(await provider.query("g1", "writer")) == 4
+    await provider.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("provider", _providers(), ids=["in_memory", "redis"])
+async def test_pages_resume_from_continuation(provider):
+    for i in range(7):
+        await provider.store("g1", "writer", "conversation", {"turn": i})
+
+    pages = [page async for page in provider.pages("g1", "writer", page_size=3)]
+    assert [[e["content"]["turn"] for e in p.items] for p in pages] == [[6, 5, 4], [3, 2, 1], [0]]
+    assert pages[-1].continuation is None
+
+    resumed = [page async for page in provider.pages("g1", "writer", page_size=10, continuation=pages[0].continuation)]
+    assert [e["content"]["turn"] for e in resumed[0].items] == [3, 2, 1, 0]
+    await provider.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("provider", _providers(), ids=["in_memory", "redis"])
+async def test_context_window_fits_newest_turns_in_budget(provider):
+    # 36 characters: 13 estimated tokens per turn
+    for i in range(4):
+        await provider.store("g1", "writer", "conversation", {"text": f"{i}" * 36}, session_id="s1")
+    await provider.store("g1", "writer", "episodic", {"text": "e"}, session_id="s1")
+    await provider.store("g1", "writer", "conversation", {"text": "other session"}, session_id="s2")
+
+    window = await provider.query("g1", "writer", session_id="s1", max_tokens=30)
+    assert [e["content"]["text"][0] for e in window] == ["3", "2"]
+    assert len(await provider.query("g1", "writer", limit=3, session_id="s1", max_tokens=1000)) == 3
+    assert await provider.query("g1", "writer", session_id="s1", max_tokens=10) == []
+    await provider.close()
+
+
+def test_ids_are_sortable_and_strictly_increasing():
+    ids = [new_id() for _ in range(10_000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert all(len(i) == 26 for i in ids)
+
+
+@pytest.mark.asyncio
+async def test_in_memory_entries_expire_after_ttl(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(memory_backend.time, "monotonic", lambda: now)
+    provider = InMemoryMemoryBackend()
+    provider.configure("g1", "writer", MemoryConfig(ttl_hours=1))
+
+    await provider.store("g1", "writer", "conversation", {"turn": 0})
+    now += 1800
+    await provider.store("g1", "writer", "conversation", {"turn": 1})
+    now += 1800
+    assert [e["content"]["turn"] for e in await provider.query("g1", "writer")] == [1]
+
+
+@pytest.mark.asyncio
+async def test_router_dispatches_per_agent_config():
+    fast, durable = InMemoryMemoryBackend(), InMemoryMemoryBackend()
+    router = MemoryRouter({"in_memory": fast, "cosmos_db": durable})
+    router.configure("g1", "chat", MemoryConfig(provider="in_memory"))
+
+    await router.store("g1", "chat", "conversation", {"text": "hi"})
+    await router.store("g1", "archivist", "episodic", {"text": "event"})
+    assert len(await fast.query("g1", "chat")) == 1
+    assert len(await durable.query("g1", "archivist")) == 1
+    assert await router.search("g1", "chat", "hi") == []
+    assert len(await router.query("g1", "chat", max_tokens=100)) == 1
+    assert await router.query("g1", "chat", max_tokens=1) == []
+
+    with pytest.raises(ValueError):
+        router.configure("g1", "chat", MemoryConfig(provider="sqlite"))
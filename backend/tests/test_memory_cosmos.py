@@ -0,0 +1,485 @@
+"""Tests for the Cosmos memory service."""
+import asyncio
+import zlib
+
+import numpy as np
+import pytest
+
+from app.models.agent import MemoryConfig
+from app.services.memory.cosmos import ORDER_INDEX, CosmosMemoryService
+
+
+class Container:
+    """
+    Records transactional batches and charges 1 RU per request; optionally
+    slow, failing, or partitioned on /agent_id only (a legacy container).
+    """
+
+    def __init__(self, failures: int = 0, delay: float = 0.0, hierarchical: bool = True):
+        self.failures = failures
+        self.delay = delay
+        self.paths = ["/agent_id", "/session_id"] if hierarchical else ["/agent_id"]
+        self.name = "memory-g1"
+        self.indexing_policy: dict = {}
+        self.queries: list[str] = []
+        self.batches: list[tuple[object, list[dict]]] = []
+        self.items: dict[str, dict] = {}
+        self.reads = 0
+
+    async def execute_item_batch(self, batch_operations, partition_key, response_hook=None):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("503 service unavailable")
+        docs = [args[0] for _, args in batch_operations]
+        self.batches.append((partition_key, docs))
+        self.items.update((doc["id"], doc) for doc in docs)
+        response_hook({"x-ms-request-charge": "1.0"}, None)
+
+    async def query_items(self, query, parameters, partition_key=None, max_item_count=None, response_hook=None):
+        response_hook({"x-ms-request-charge": "1.0"}, None)
+        self.queries.append(query)
+        params = {p["name"]: p["value"] for p in parameters}
+        docs = [
+            doc for doc in self.items.values()
+            if doc["agent_id"] == params["@agent_id"]
+            and params.get("@session_id", doc.get("session_id")) == doc.get("session_id")
+        ]
+        if "@ids" in params:
+            for doc in docs:
+                if doc["id"] in params["@ids"]:
+                    yield doc
+            return
+        if "@id" in params:
+            for doc in docs:
+                if doc["id"] == params["@id"]:
+                    yield doc["created_at"]
+            return
+        before = (params.get("@before_at", "~"), params.get("@before", "~"))
+        # Ties keep insertion order unless the query orders them by id
+        by_id = "c.created_at DESC, c.id DESC" in query
+        docs = sorted(
+            (
+                d for d in docs
+                if params.get("@type", d["type"]) == d["type"] and (d["created_at"], d["id"]) < before
+            ),
+            key=lambda d: (d["created_at"], d["id"] if by_id else ""), reverse=True,
+        )
+        offset = params.get("@offset", 0)
+        for doc in docs[offset:offset + params["@limit"]]:
+            yield {"id": doc["id"], "session_id": doc.get("session_id")} if "@offset" in params else doc
+
+    async def read_all_items(self, max_item_count=None):
+        for doc in list(self.items.values()):
+            yield {**doc, "_rid": "x", "_ts": 0}
+
+    async def upsert_item(self, body):
+        self.items[body["id"]] = body
+
+    async def delete_item(self, item, partition_key, response_hook=None):
+        response_hook({"x-ms-request-charge": "1.0"}, None)
+        self.items.pop(item, None)
+
+    async def read(self, populate_quota_info=False, response_hook=None):
+        self.reads += 1
+        if response_hook:
+            response_hook({"x-ms-resource-usage": f"documentsSize=1;documentsCount={len(self.items)}"}, {})
+        return {"id": self.name, "partitionKey": {"paths": self.paths}, "indexingPolicy": self.indexing_policy}
+
+
+class Database:
+    """Containers by name; the first one passed is returned for any unknown name."""
+
+    def __init__(self, container: Container, existing: tuple[str, ...] = ()):
+        self.container = container
+        self.containers = {name: container for name in existing}
+        self.resolved: list[str] = []
+        self.created: list[str] = []
+        self.replaced: list[str] = []
+        self.deleted: list[str] = []
+
+    def get_container_client(self, name: str) -> Container:
+        self.resolved.append(name)
+        return self.containers.get(name, self.container)
+
+    async def list_containers(self):
+        for name, container in self.containers.items():
+            yield {"id": name, "partitionKey": {"paths": container.paths}, "indexingPolicy": container.indexing_policy}
+
+    async def create_container_if_not_exists(self, id: str, indexing_policy=None, **kwargs) -> Container:
+        self.created.append(id)
+        if id not in self.containers:
+            self.containers[id] = Container() if self.containers else self.container
+            self.containers[id].name = id
+            self.containers[id].indexing_policy = indexing_policy
+        return self.containers[id]
+
+    async def replace_container(self, container, partition_key, indexing_policy=None, **kwargs):
+        self.replaced.append(container)
+        self.containers.get(container, self.container).indexing_policy = indexing_policy
+
+    async def delete_container(self, name: str):
+        self.deleted.append(name)
+        self.containers.pop(name)
+
+
+class Client:
+    async def close(self):
+        pass
+
+
+async def _embed(model: str, texts: list[str]) -> np.ndarray:
+    """Bag-of-words hashing embedding, enough to rank overlapping texts first."""
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, zlib.crc32(word.encode()) % 64] += 1
+    return vectors
+
+
+def _service(container: Container, **kwargs) -> CosmosMemoryService:
+    kwargs.setdefault("embed", _embed)
+    service = CosmosMemoryService(**kwargs)
+    service._client = Client()
+    service._database = Database(container)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_entries_batched_per_partition_and_flushed_on_close():
+    container = Container()
+    service = _service(container, batch_size=3, flush_interval=60)
+
+    for i in range(7):
+        await service.store("g1", "writer", "conversation", {"turn": i})
+    await service.store("g1", "editor", "conversation", {"turn": 0})
+    await asyncio.sleep(0.01)
+
+    # The full writer buffer is flushed in batches of 3; the editor entry waits
+    assert [len(docs) for _, docs in container.batches] == [3, 3, 1]
+    assert service.metrics()["pending"] == 1
+    await service.close()
+
+    by_agent: dict[str, list[int]] = {}
+    for _, docs in container.batches:
+        by_agent.setdefault(docs[0]["agent_id"], []).extend(d["content"]["turn"] for d in docs)
+    assert by_agent == {"writer": list(range(7)), "editor": [0]}
+    assert service.metrics()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_close_finishes_writes_in_flight():
+    container = Container(delay=0.02)
+    service = _service(container, batch_size=2, flush_interval=0.01)
+
+    for i in range(6):
+        await service.store("g1", "writer", "conversation", {"turn": i})
+    await asyncio.sleep(0.015)
+    assert service._buffers == {}  # taken by the flusher, first batch in flight
+    await service.close()
+
+    assert len(container.items) == 6
+    assert service.metrics()["pending"] == 0 and service.metrics()["dropped"] == 0
+
+
+@pytest.mark.asyncio
+async def test_query_flushes_pending_writes_first():
+    container = Container()
+    service = _service(container, flush_interval=60)
+
+    await service.store("g1", "writer", "conversation", {"turn": 0})
+    items = await service.query("g1", "writer")
+    assert [i["content"] for i in items] == [{"turn": 0}]
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_flush_state_bounded_by_partitions_in_flight():
+    container = Container(delay=0.02)
+    service = _service(container, flush_interval=60)
+
+    for session in range(50):
+        await service.store("g1", "writer", "conversation", {"turn": 0}, session_id=f"s{session}")
+    background = asyncio.create_task(service.flush())
+    await asyncio.sleep(0.005)
+    assert service._buffers == {} and len(service._flush_locks) == 50
+
+    # A second flush waits for the writes already in progress
+    await service.flush()
+    assert len(container.items) == 50
+    await background
+    assert service._flush_locks == {}
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_store_blocks_when_buffer_full_and_retries_failed_batches():
+    container = Container(failures=1, delay=0.02)
+    service = _service(container, batch_size=2, flush_interval=60, max_pending=2)
+
+    await service.store("g1", "writer", "conversation", {"turn": 0})
+    await service.store("g1", "writer", "conversation", {"turn": 1})
+    blocked = asyncio.create_task(service.store("g1", "writer", "conversation", {"turn": 2}))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    await asyncio.wait_for(blocked, timeout=2)
+    await service.close()
+    assert service.metrics()["flushed"] == 3
+    assert service.metrics()["dropped"] == 0
+
+
+@pytest.mark.asyncio
+async def test_query_served_from_cache_and_updated_by_store():
+    container = Container()
+    service = _service(container, flush_interval=60)
+    for i in range(3):
+        await service.store("g1", "writer", "conversation", {"turn": i})
+
+    first = await service.query("g1", "writer", "conversation", limit=10)
+    assert [i["content"]["turn"] for i in first] == [2, 1, 0]
+
+    queries = 0
+    original = container.query_items
+
+    def counting(**kwargs):
+        nonlocal queries
+        queries += 1
+        return original(**kwargs)
+
+    container.query_items = counting
+    await service.store("g1", "writer", "conversation", {"turn": 3})
+    again = await service.query("g1", "writer", "conversation", limit=2)
+    assert [i["content"]["turn"] for i in again] == [3, 2]
+    assert queries == 0
+    assert service.metrics()["cache"]["hits"] == 1
+
+    # A different type, or the untyped history, is a separate cache key
+    await service.query("g1", "writer", limit=10)
+    assert queries == 1
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_container_handles_and_provisioning_cached():
+    container = Container()
+    service = _service(container, flush_interval=60)
+    database = service._database = Database(container, existing=("memory-g1",))
+
+    await service.warm()
+    await service.ensure_container("g1")
+    await service.ensure_container("g2")
+    await service.ensure_container("g2")
+    assert database.created == ["memory-g2"]
+    # The existing container gets the (created_at, id) index; the new one has it already
+    assert database.replaced == ["memory-g1"]
+    assert all(ORDER_INDEX in c.indexing_policy["compositeIndexes"] for c in database.containers.values())
+
+    for graph_id in ("g1", "g2"):
+        await service.store(graph_id, "writer", "conversation", {"turn": 0})
+        await service.query(graph_id, "writer")
+    assert database.resolved == ["memory-g1"]
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_semantic_search_over_embedded_entries(tmp_path):
+    container = Container()
+    service = _service(container, flush_interval=60, vector_dir=str(tmp_path))
+    service.configure("g1", "researcher", MemoryConfig(type="semantic", semantic_search=True))
+
+    facts = ["the capital of france is paris", "cats sleep most of the day", "paris hosts the louvre"]
+    for fact in facts:
+        await service.store("g1", "researcher", "semantic", {"text": fact})
+    await service.store("g1", "researcher", "conversation", {"text": "paris paris paris"})
+
+    results = await service.search("g1", "researcher", "what is in paris", k=2)
+    assert {r["content"]["text"] for r in results} == {facts[0], facts[2]}
+    assert results[0]["score"] >= results[1]["score"]
+
+    # Agents without semantic search configured get nothing
+    assert await service.search("g1", "writer", "paris") == []
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_deleted_entries_leave_the_vector_index(tmp_path):
+    container = Container()
+    service = _service(container, flush_interval=60, vector_dir=str(tmp_path))
+    service.configure("g1", "researcher", MemoryConfig(type="semantic", semantic_search=True, max_entries=4))
+
+    for i in range(8):
+        await service.store("g1", "researcher", "semantic", {"text": f"paris fact {i}"})
+    await service.compact()
+
+    index = service._indexes["g1"]
+    assert index.live == 4 and index.size == 4  # half removed, so rebuilt
+    results = await service.search("g1", "researcher", "paris fact", k=3)
+    assert {r["content"]["text"] for r in results} <= {f"paris fact {i}" for i in range(4, 8)}
+
+    # Entries expired by TTL are dropped from the index as searches find them
+    for doc in list(container.items.values())[:3]:
+        del container.items[doc["id"]]
+    results = await service.search("g1", "researcher", "paris fact", k=3)
+    assert len(results) == 1 and index.live == 1
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_item_ttl_and_compaction_to_max_entries():
+    container = Container()
+    service = _service(container, flush_interval=60)
+    service.configure("g1", "writer", MemoryConfig(ttl_hours=2, max_entries=3))
+
+    for i in range(6):
+        await service.store("g1", "writer", "conversation", {"turn": i})
+    await service.store("g1", "writer", "episodic", {"event": "deployed"})
+    await service.compact()
+
+    remaining = await service.query("g1", "writer", "conversation")
+    assert [e["content"]["turn"] for e in remaining] == [5, 4, 3]
+    assert all(e["ttl"] == 7200 for e in remaining)
+    assert len(await service.query("g1", "writer", "episodic")) == 1
+
+    metrics = service.metrics()
+    assert metrics["compacted"] == 3
+    assert metrics["containers"]["g1"]["documentsCount"] == 4
+    assert metrics["request_charge"]["compaction"] > 0
+    assert metrics["request_charge"]["write"] > 0
+
+    # Nothing new was written, so the next pass does no work
+    await service.compact()
+    assert service.metrics()["compacted"] == 3
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_pages_walk_history_newest_first():
+    service = _service(Container(), flush_interval=60)
+    for i in range(5):
+        await service.store("g1", "writer", "conversation", {"turn": i})
+
+    turns = [[e["content"]["turn"] for e in page.items] async for page in service.pages("g1", "writer", page_size=2)]
+    assert turns == [[4, 3], [2, 1], [0]]
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_pages_break_timestamp_ties_by_id():
+    container = Container()
+    ids = [f"01J{n:023d}" for n in (4, 1, 5, 0, 3, 2)]
+    for item_id in ids:
+        # Written by different workers within the same microsecond
+        container.items[item_id] = {
+            "id": item_id, "agent_id": "writer", "session_id": "default", "type": "conversation",
+            "content": {}, "created_at": "2026-01-01T00:00:00.000000+00:00",
+        }
+    service = _service(container, flush_interval=60)
+
+    pages = [page async for page in service.pages("g1", "writer", page_size=2)]
+    assert [e["id"] for page in pages for e in page.items] == sorted(ids, reverse=True)
+    # Tokens carry created_at, so no page looks up the entry it resumes after
+    assert pages[0].continuation == f"2026-01-01T00:00:00.000000+00:00|{sorted(ids)[-2]}"
+    assert not any("c.id = @id" in q for q in container.queries)
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_legacy_ids_ordered_by_creation_time():
+    container = Container(hierarchical=False)
+    for i in range(3):
+        # Ids as written before ULIDs; they sort above every ULID
+        legacy_id = f"writer-{1_700_000_000 + i}.5"
+        container.items[legacy_id] = {
+            "id": legacy_id, "agent_id": "writer", "type": "conversation", "content": {"turn": i},
+            "created_at": f"2023-11-14T22:13:2{i}.500000+00:00",
+        }
+    service = _service(container, flush_interval=60)
+    service.configure("g1", "writer", MemoryConfig(max_entries=4))
+    for i in range(3, 5):
+        await service.store("g1", "writer", "conversation", {"turn": i})
+
+    assert [e["content"]["turn"] for e in await service.query("g1", "writer", limit=2)] == [4, 3]
+    turns = [[e["content"]["turn"] for e in page.items] async for page in service.pages("g1", "writer", page_size=2)]
+    assert turns == [[4, 3], [2, 1], [0]]
+
+    # Compaction drops the oldest (legacy) entry, not the newest
+    await service.compact()
+    assert [e["content"]["turn"] for e in await service.query("g1", "writer")] == [4, 3, 2, 1]
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_session_scoped_reads_use_full_hierarchical_key():
+    container = Container()
+    service = _service(container, flush_interval=60)
+    for session_id in ("s1", "s2"):
+        for i in range(2):
+            await service.store("g1", "orchestrator", "conversation", {"turn": i}, session_id=session_id)
+    await service.flush()
+
+    assert {tuple(key) for key, _ in container.batches} == {("orchestrator", "s1"), ("orchestrator", "s2")}
+    session = await service.query("g1", "orchestrator", session_id="s2")
+    assert [(e["session_id"], e["content"]["turn"]) for e in session] == [("s2", 1), ("s2", 0)]
+    assert len(await service.query("g1", "orchestrator")) == 4
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_legacy_container_migrated_to_hierarchical_keys():
+    legacy = Container(hierarchical=False)
+    service = _service(legacy, flush_interval=60)
+    database = service._database = Database(legacy, existing=("memory-g1",))
+    await service.warm()
+
+    await service.store("g1", "writer", "conversation", {"turn": 0})
+    await service.flush()
+    assert legacy.batches[0][0] == "writer"
+
+    assert await service.migrate_container("g1", delete_legacy=True) == 1
+    await service.store("g1", "writer", "conversation", {"turn": 1}, session_id="s1")
+    assert [e["content"]["turn"] for e in await service.query("g1", "writer")] == [1, 0]
+    assert database.deleted == ["memory-g1"]
+
+    migrated = database.containers["memory-g1-v2"]
+    assert all(not k.startswith("_") for doc in migrated.items.values() for k in doc)
+    assert await service.migrate_container("g1") == 0
+    await service.close()
+
+
+async def _summarize(previous, turns):
+    return " ".join(filter(None, [previous, f"[{turns[0]['content']['turn']}-{turns[-1]['content']['turn']}]"]))
+
+
+@pytest.mark.asyncio
+async def test_rolling_summary_caps_context_window():
+    container = Container()
+    service = _service(container, flush_interval=60, summarize=_summarize)
+    service.configure("g1", "writer", MemoryConfig(summary_token_budget=100))
+    # Each turn is 14 estimated tokens: 40 characters + 4
+    for i in range(10):
+        await service.store("g1", "writer", "conversation", {"turn": i, "text": "x" * 40}, session_id="s1")
+    await service.compact()
+
+    summary = (await service.query("g1", "writer", "summary", session_id="s1"))[0]
+    assert summary["content"]["text"] == "[0-6]"
+    assert summary["content"]["turns"] == 7
+    # Originals stay retrievable
+    assert len(await service.query("g1", "writer", "conversation", session_id="s1")) == 10
+
+    window = await service.query("g1", "writer", session_id="s1", max_tokens=200)
+    assert [e["type"] for e in window] == ["conversation"] * 3 + ["summary"]
+    assert [e["content"]["turn"] for e in window[:3]] == [9, 8, 7]
+    assert [e["content"]["turn"] for e in (await service.query("g1", "writer", session_id="s1", max_tokens=30))[:-1]] == [9]
+
+    # The next summary folds the previous one in; under budget nothing happens
+    await service.compact()
+    assert service.metrics()["summarized"] == 7
+    for i in range(10, 15):
+        await service.store("g1", "writer", "conversation", {"turn": i, "text": "x" * 40}, session_id="s1")
+    await service.compact()
+    window = await service.query("g1", "writer", session_id="s1", max_tokens=1000)
+    assert window[-1]["content"]["text"] == "[0-6] [7-11]"
+    assert window[-1]["content"]["covers_from"] == summary["content"]["covers_from"]
+    assert [e["content"]["turn"] for e in window[:-1]] == [14, 13, 12]
+    await service.close()
@@ -0,0 +1,74 @@
+"""Tests for the memory-mapped semantic memory vector index."""
+import numpy as np
+
+from app.services.memory.vectors import VectorIndex, normalize
+
+
+def _clustered(n: int, dim: int = 32, clusters: int = 50, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def test_exact_search_filters_by_agent_and_reloads(tmp_path):
+    vectors = _clustered(200)
+    index = VectorIndex(str(tmp_path))
+    agents = ["a" if i % 2 else "b" for i in range(200)]
+    index.add([f"m{i}" for i in range(200)], agents, vectors)
+
+    assert index.search(vectors[7], k=1)[0][0] == "m7"
+    hits = index.search(vectors[7], k=5, agent_id="b")
+    assert all(int(entry_id[1:]) % 2 == 0 for entry_id, _ in hits)
+    assert index.search(vectors[7], agent_id="nobody") == []
+    index.close()
+
+    reopened = VectorIndex(str(tmp_path))
+    assert reopened.size == 200
+    assert reopened.search(vectors[8], k=1, agent_id="b")[0][0] == "m8"
+    reopened.add(["m200"], ["b"], vectors[:1] * 2)
+    assert reopened.size == 201
+
+
+def test_ivf_search_recall_against_exact(tmp_path):
+    vectors = _clustered(5000)
+    ids = [f"m{i}" for i in range(5000)]
+    exact = VectorIndex(str(tmp_path / "exact"), ivf_threshold=10**9)
+    ivf = VectorIndex(str(tmp_path / "ivf"), ivf_threshold=1000, nprobe=8)
+    for index in (exact, ivf):
+        index.add(ids[:4000], ["a"] * 4000, vectors[:4000])
+    ivf.search(vectors[0], k=1)  # trains the IVF lists
+    for index in (exact, ivf):
+        index.add(ids[4000:], ["a"] * 1000, vectors[4000:])
+
+    queries = normalize(_clustered(50, seed=1))
+    recall = np.mean([
+        len({i for i, _ in exact.search(q, k=10)} & {i for i, _ in ivf.search(q, k=10)}) / 10
+        for q in queries
+    ])
+    assert recall >= 0.9
+    assert ivf.search(vectors[4500], k=1)[0][0] == "m4500"
+
+
+def test_removed_rows_skipped_and_rebuilt_away(tmp_path):
+    vectors = _clustered(100)
+    index = VectorIndex(str(tmp_path))
+    index.add([f"m{i}" for i in range(100)], ["a"] * 100, vectors)
+
+    assert index.remove([f"m{i}" for i in range(0, 100, 2)] + ["unknown"]) == 50
+    assert index.remove(["m0"]) == 0
+    assert index.search(vectors[4], k=1)[0][0] != "m4"
+    assert all(int(i[1:]) % 2 for i, _ in index.search(vectors[4], k=50, agent_id="a"))
+    index.close()
+
+    # Removals survive a reload; the rebuild keeps only the live rows
+    reopened = VectorIndex(str(tmp_path))
+    assert reopened.live == 50 and reopened.needs_rebuild()
+    reopened.rebuild()
+    assert reopened.size == 50 and reopened.removed == 0
+    assert reopened.search(vectors[5], k=1)[0][0] == "m5"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["meta.json", "rows.1.tsv", "vectors.1.f32"]
+    reopened.close()
+
+    rebuilt = VectorIndex(str(tmp_path))
+    assert rebuilt.ids == [f"m{i}" for i in range(1, 100, 2)]
+    assert rebuilt.search(vectors[7], k=1, agent_id="a")[0][0] == "m7"
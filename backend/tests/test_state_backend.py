@@ -0,0 +1,159 @@
+"""Tests for shared state across workers."""
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.models.agent import A2AAgentCard, MCPServerConfig
+from app.services.a2a.protocol import A2ADirectory, A2ATask
+from app.services.mcp.server import MCPServerManager
+from app.services.state import backend as state_backend
+from app.services.state.backend import RedisStateBackend, SharedMap, SQLiteStateBackend
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+async def _eventually(check, timeout: float = 2.0):
+    for _ in range(int(timeout / 0.02)):
+        if await check():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("condition not met before timeout")
+
+
+def _card() -> A2AAgentCard:
+    return A2AAgentCard(name="Writer", description="Writes", url="/a2a/writer")
+
+
+@pytest.mark.asyncio
+async def test_sqlite_directory_shared_between_workers(tmp_path):
+    path = str(tmp_path / "state.db")
+    state_a = SQLiteStateBackend(path, poll_interval=0.02)
+    state_b = SQLiteStateBackend(path, poll_interval=0.02)
+    worker_a, worker_b = A2ADirectory(state=state_a), A2ADirectory(state=state_b)
+    await state_a.start()
+    await state_b.start()
+
+    listing_before = await worker_b.get_directory_payload()
+    await worker_a.register_agent("writer", _card())
+    await _eventually(lambda: worker_b.get_agent_card("writer"))
+    assert (await worker_b.get_directory_payload()).etag != listing_before.etag
+
+    task = await worker_a.send_task(
+        A2ATask(from_agent="a", to_agent="writer", skill_id="s", input_text="draft")
+    )
+    sub = worker_b.events.subscribe(task_id=task.id)
+    assert (await worker_b.get_task(task.id)).status == "pending"
+    await worker_a.complete_task(task.id, "done")
+
+    statuses = []
+    async for event in sub.events():
+        statuses.append(event.data)
+    assert '"status":"completed"' in statuses[-1]
+    assert (await worker_b.get_task(task.id)).output_text == "done"
+
+    await state_a.close()
+    await state_b.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_mcp_registry_shared_between_workers():
+    server = fakeredis.FakeServer()
+    state_a = RedisStateBackend(client=fakeredis.FakeAsyncRedis(server=server))
+    state_b = RedisStateBackend(client=fakeredis.FakeAsyncRedis(server=server))
+    manager_a, manager_b = MCPServerManager(state=state_a), MCPServerManager(state=state_b)
+    await state_a.start()
+    await state_b.start()
+
+    await manager_a.create_server(MCPServerConfig(name="search", description="Search tools"))
+
+    async def visible():
+        return await manager_b.list_servers() == ["search"]
+
+    await _eventually(visible)
+    assert await manager_b.get_server("search") is not None
+
+    await state_a.close()
+    await state_b.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_listener_survives_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(state_backend, "_RETRY_MIN", 0.01)
+    path = str(tmp_path / "state.db")
+    state_a = SQLiteStateBackend(path, poll_interval=0.02)
+    state_b = SQLiteStateBackend(path, poll_interval=0.02)
+    worker_a, worker_b = A2ADirectory(state=state_a), A2ADirectory(state=state_b)
+    await state_a.start()
+    await state_b.start()
+
+    run, failures = state_b._run, [sqlite3.OperationalError("database is locked")] * 2
+
+    async def flaky(sql, params=()):
+        if failures:
+            raise failures.pop()
+        return await run(sql, params)
+
+    monkeypatch.setattr(state_b, "_run", flaky)
+    await worker_a.register_agent("writer", _card())
+    await _eventually(lambda: worker_b.get_agent_card("writer"))
+    assert not failures
+
+    await state_a.close()
+    await state_b.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_listener_reconnects_and_resyncs(monkeypatch):
+    monkeypatch.setattr(state_backend, "_RETRY_MIN", 0.01)
+    server = fakeredis.FakeServer()
+    state_a = RedisStateBackend(client=fakeredis.FakeAsyncRedis(server=server))
+    state_b = RedisStateBackend(client=fakeredis.FakeAsyncRedis(server=server))
+    manager_a, manager_b = MCPServerManager(state=state_a), MCPServerManager(state=state_b)
+    await state_a.start()
+    await state_b.start()
+
+    # A malformed notification is skipped
+    await state_a._client.publish(state_a._channel, "not json")
+
+    handle, dropped = state_b._handle, []
+
+    async def dropping(message):
+        if message.get("type") == "message" and not dropped:
+            dropped.append(message)
+            raise ConnectionError("connection reset by peer")
+        await handle(message)
+
+    monkeypatch.setattr(state_b, "_handle", dropping)
+    await manager_a.create_server(MCPServerConfig(name="search", description="Search tools"))
+
+    async def visible():
+        return await manager_b.list_servers() == ["search"]
+
+    # The notification was lost with the connection; the reload after reconnecting finds the server
+    await _eventually(visible)
+    assert dropped and not state_b._listener.done()
+
+    await manager_a.create_server(MCPServerConfig(name="files", description="File tools"))
+
+    async def both():
+        return sorted(await manager_b.list_servers()) == ["files", "search"]
+
+    await _eventually(both)
+    await state_a.close()
+    await state_b.close()
+
+
+@pytest.mark.asyncio
+async def test_load_drops_keys_missing_from_backend(tmp_path):
+    state = SQLiteStateBackend(str(tmp_path / "state.db"))
+    changes = []
+    shared = SharedMap(state, "things", str, str, on_change=lambda key, value: changes.append((key, value)))
+    await shared.set("kept", "1")
+    shared._local["stale"] = "2"
+
+    await shared.load()
+
+    assert dict(shared.items()) == {"kept": "1"}
+    assert ("stale", None) in changes
+    await state.close()